@@ -1,12 +1,20 @@
 from flask import Flask
 from flask_cors import CORS
 from app.config.database import init_db
-from app.config.websocket import socketio
+from app.config.json_provider import FastJSONProvider
+from app.config.catalog_cache import catalog_cache
+from app.config.stats_counters import stats_counters
+from app.config.write_behind import init_write_behind
+from app.config.websocket import socketio, init_websocket
+from app.config.execution_engine import init_execution_engine
 from app.routes.api_routes import api_bp
 
 def create_app():
     app = Flask(__name__)
     
+    # Mismo codificador JSON para REST y Socket.IO (fechas ISO 8601)
+    app.json = FastJSONProvider(app)
+    
     # Configuración CORS para permitir peticiones desde el frontend
     CORS(app, resources={
         r"/api/*": {
@@ -22,8 +30,28 @@ def create_app():
     # Inicializar base de datos
     init_db(app)
     
+    # Cargar catálogos en memoria (operaciones y obstáculos)
+    with app.app_context():
+        try:
+            catalog_cache.load()
+        except Exception as e:
+            print(f'⚠️ No se pudieron precargar los catálogos: {e}')
+        
+        # Sembrar los contadores de /api/stats (si falla, se reintenta al consultarlos)
+        try:
+            stats_counters.seed()
+        except Exception as e:
+            print(f'⚠️ No se pudieron sembrar los contadores: {e}')
+    
+    # Escritura diferida (group-commit) del historial, si está activada
+    init_write_behind(app)
+    
     # Inicializar SocketIO
     socketio.init_app(app)
+    init_websocket(app)
+    
+    # Motor de ejecución de secuencias en el servidor, si está activado
+    init_execution_engine(app)
     
     # Registrar blueprints
     app.register_blueprint(api_bp, url_prefix='/api')
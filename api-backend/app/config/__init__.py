@@ -1,4 +1,4 @@
-from .database import get_db_connection, close_db_connection, init_db
+from .database import get_db_connection, close_db_connection, init_db, get_pool, get_pool_stats
 from .websocket import socketio
 
-__all__ = ['get_db_connection', 'close_db_connection', 'init_db', 'socketio']
\ No newline at end of file
+__all__ = ['get_db_connection', 'close_db_connection', 'init_db', 'get_pool', 'get_pool_stats', 'socketio']
\ No newline at end of file
@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class CatalogCache:
+    """Caché en memoria de los catálogos operaciones, obstaculos y dispositivos"""
+
+    # Tiempo mínimo entre recargas forzadas por un dispositivo desconocido
+    MISS_RELOAD_INTERVAL = 2.0
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # nombre -> {'data': {codigo: texto}, 'codes': frozenset, 'loaded_at': float}
+        self._entries = {}
+        self._loaders = {
+            'operaciones': self._load_operations,
+            'obstaculos': self._load_obstacles,
+            'dispositivos': self._load_devices
+        }
+        # Un lock de carga por catálogo: una recarga lenta no bloquea a los demás
+        self._load_locks = {name: threading.Lock() for name in self._loaders}
+        # Se incrementa al invalidar: descarta cargas que empezaron antes
+        self._generations = dict.fromkeys(self._loaders, 0)
+
+    # ---------- Cargadores (import diferido para evitar ciclos con los modelos) ----------
+
+    @staticmethod
+    def _load_operations():
+        from app.models.car_model import CarModel
+        rows = CarModel.get_operations_catalog()
+        return {row['status_operacion']: row['status_texto'] for row in rows}
+
+    @staticmethod
+    def _load_obstacles():
+        from app.models.sensor_model import SensorModel
+        rows = SensorModel.get_obstacles_catalog()
+        return {row['status_obstaculo']: row['status_texto'] for row in rows}
+
+    @staticmethod
+    def _load_devices():
+        from app.models.car_model import CarModel
+        rows = CarModel.get_devices()
+        return {row['id_dispositivo']: row['nombre_dispositivo'] for row in rows}
+
+    # ---------- Acceso ----------
+
+    def _fresh(self, name):
+        entry = self._entries.get(name)
+        if entry is not None and time.monotonic() - entry['loaded_at'] < self.ttl:
+            return entry
+        return None
+
+    def _get(self, name):
+        entry = self._fresh(name)
+        if entry is not None:
+            return entry
+
+        # Solo un hilo por catálogo consulta la BD; el resto espera su resultado
+        with self._load_locks[name]:
+            # Otro hilo pudo recargarlo mientras esperábamos el lock
+            entry = self._fresh(name)
+            if entry is not None:
+                return entry
+
+            with self._lock:
+                generation = self._generations[name]
+            data = self._loaders[name]()
+            entry = {
+                'data': data,
+                'codes': frozenset(data),
+                'loaded_at': time.monotonic()
+            }
+            with self._lock:
+                # Si se invalidó durante la carga, no guardamos datos que pueden ser viejos
+                if self._generations[name] == generation:
+                    self._entries[name] = entry
+            return entry
+
+    def load(self):
+        """Cargar todos los catálogos (se llama al arrancar la app)"""
+        self.invalidate()
+        for name in self._loaders:
+            self._get(name)
+
+    def invalidate(self, name=None):
+        """Invalidar un catálogo concreto o todos"""
+        names = list(self._loaders) if name is None else [name]
+        with self._lock:
+            for catalog in names:
+                if catalog in self._generations:
+                    self._generations[catalog] += 1
+                self._entries.pop(catalog, None)
+
+    # ---------- Operaciones ----------
+
+    def get_operations(self):
+        data = self._get('operaciones')['data']
+        return [{'status_operacion': code, 'status_texto': text} for code, text in data.items()]
+
+    def operation_codes(self):
+        return self._get('operaciones')['codes']
+
+    def is_valid_operation(self, status_operacion):
+        return status_operacion in self._get('operaciones')['codes']
+
+    def operation_text(self, status_operacion):
+        return self._get('operaciones')['data'].get(status_operacion)
+
+    # ---------- Obstáculos ----------
+
+    def get_obstacles(self):
+        data = self._get('obstaculos')['data']
+        return [{'status_obstaculo': code, 'status_texto': text} for code, text in data.items()]
+
+    def obstacle_codes(self):
+        return self._get('obstaculos')['codes']
+
+    def is_valid_obstacle(self, status_obstaculo):
+        return status_obstaculo in self._get('obstaculos')['codes']
+
+    def obstacle_text(self, status_obstaculo):
+        return self._get('obstaculos')['data'].get(status_obstaculo)
+
+    # ---------- Dispositivos ----------
+
+    def _get_device_entry(self, id_dispositivo):
+        entry = self._get('dispositivos')
+        if id_dispositivo in entry['codes']:
+            return entry
+        # Dispositivo creado desde otro proceso: recargar, pero sin martillar la BD
+        if time.monotonic() - entry['loaded_at'] >= self.MISS_RELOAD_INTERVAL:
+            self.invalidate('dispositivos')
+            entry = self._get('dispositivos')
+        return entry
+
+    def device_exists(self, id_dispositivo):
+        return id_dispositivo in self._get_device_entry(id_dispositivo)['codes']
+
+    def device_name(self, id_dispositivo):
+        return self._get_device_entry(id_dispositivo)['data'].get(id_dispositivo)
+
+    def device_count(self):
+        return len(self._get('dispositivos')['codes'])
+
+
+catalog_cache = CatalogCache(ttl=float(os.getenv('CATALOG_CACHE_TTL', 300)))
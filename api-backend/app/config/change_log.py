@@ -0,0 +1,87 @@
+import os
+import threading
+import uuid
+from collections import deque
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class ChangeLog:
+    """Registro en memoria de los cambios emitidos, con una secuencia monótona.
+    Permite responder /sync/status con solo lo ocurrido desde un token.
+    Con pub/sub en memoria la secuencia es local; con redis llega con cada
+    evento desde un contador compartido, así el token vale en cualquier worker."""
+
+    def __init__(self, max_entries=5000):
+        # El epoch cambia en cada arranque: los tokens anteriores fuerzan sync completo
+        self.epoch = uuid.uuid4().hex[:8]
+        self._entries = deque(maxlen=max_entries)  # (seq, event, device_id, payload)
+        self._seq = 0
+        self._complete_from = 0  # los eventos posteriores a esta secuencia están todos
+        self._lock = threading.Lock()
+
+    def _is_gap(self, epoch, seq):
+        return epoch != self.epoch or not self._entries or seq != self._seq + 1
+
+    def is_gap(self, epoch, seq):
+        """True si el evento del contador compartido no sigue al último registrado:
+        se perdieron eventos (arranque, reconexión o contador reiniciado)"""
+        with self._lock:
+            return self._is_gap(epoch, seq)
+
+    def record(self, event, device_id, payload, epoch=None, seq=None):
+        with self._lock:
+            if seq is None:
+                self._seq += 1
+                seq = self._seq
+            else:
+                if self._is_gap(epoch, seq):
+                    # Hueco (arranque o reconexión): lo anterior puede faltar
+                    self._complete_from = seq - 1
+                if epoch != self.epoch:
+                    # Contador compartido nuevo (o primer evento recibido)
+                    self.epoch = epoch
+                    self._entries.clear()
+                self._seq = seq
+            self._entries.append((seq, event, device_id, payload))
+            return seq
+
+    def current_token(self):
+        return f'{self.epoch}-{self._seq}'
+
+    def _parse_token(self, token):
+        """Devolver la secuencia del token o None si no es de este proceso"""
+        try:
+            epoch, seq = token.rsplit('-', 1)
+            seq = int(seq)
+        except (AttributeError, ValueError):
+            return None
+        if epoch != self.epoch or seq < 0 or seq > self._seq:
+            return None
+        return seq
+
+    def changes_since(self, token, device_id=None, global_events=()):
+        """Devolver (eventos, token_nuevo) o (None, token_actual) si hace falta sync completo.
+        Se incluyen los eventos del dispositivo pedido y los de global_events de cualquiera."""
+        seq = self._parse_token(token)
+        with self._lock:
+            current = f'{self.epoch}-{self._seq}'
+            if seq is None:
+                return None, current
+            if seq == self._seq:
+                return [], current
+            # El token es más antiguo que lo que conserva el buffer (o cae en un hueco)
+            if not self._entries or seq < max(self._entries[0][0] - 1, self._complete_from):
+                return None, current
+            entries = [entry for entry in self._entries if entry[0] > seq]
+
+        return [
+            {'seq': entry_seq, 'event': event, 'device_id': entry_device, 'payload': payload}
+            for entry_seq, event, entry_device, payload in entries
+            if device_id is None or entry_device is None
+            or entry_device == device_id or event in global_events
+        ], current
+
+
+change_log = ChangeLog(max_entries=int(os.getenv('SYNC_LOG_SIZE', 5000)))
@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Políticas por tipo de evento: 'all' conserva todos en orden, 'latest' solo el último
+DEFAULT_POLICIES = {
+    'command_update': 'all',
+    'obstacle_update': 'all',
+    'sequence_update': 'all',
+    'execution_update': 'all',
+    'monitoring_sync': 'latest'
+}
+
+def _parse_policies(raw):
+    """'obstacle_update:latest,command_update:all' -> dict"""
+    policies = dict(DEFAULT_POLICIES)
+    for item in filter(None, (part.strip() for part in (raw or '').split(','))):
+        event, _, policy = item.partition(':')
+        if policy in ('all', 'latest'):
+            policies[event.strip()] = policy
+    return policies
+
+
+class RoomCoalescer:
+    """Agrupa los eventos de cada sala durante una ventana corta y los emite
+    como un único frame 'batch_update' con la lista ordenada de eventos"""
+
+    def __init__(self, enabled=False, window=0.05, max_batch=100, policies=None):
+        self.enabled = enabled
+        self.window = window
+        self.max_batch = max(max_batch, 1)
+        self.policies = policies or dict(DEFAULT_POLICIES)
+        self._lock = threading.Lock()
+        self._rooms = {}  # sala -> {'deadline': float, 'events': [(evento, datos)]}
+        self._emit = None
+
+        # Estadísticas
+        self._events_in = 0
+        self._frames_out = 0
+        self._replaced = 0
+
+    def start(self, emit, start_background_task, sleep):
+        self._emit = emit
+        if self.enabled:
+            start_background_task(self._run, sleep)
+
+    def add(self, room, event, data):
+        ready = None
+        with self._lock:
+            self._events_in += 1
+            buffer = self._rooms.get(room)
+            if buffer is None:
+                buffer = {'deadline': time.monotonic() + self.window, 'events': []}
+                self._rooms[room] = buffer
+
+            events = buffer['events']
+            if self.policies.get(event, 'all') == 'latest':
+                # Solo interesa el estado más reciente: sustituir el pendiente
+                for index, (pending_event, _) in enumerate(events):
+                    if pending_event == event:
+                        del events[index]
+                        self._replaced += 1
+                        break
+            events.append((event, data))
+
+            # Tope de lote: vaciar sin esperar a la ventana
+            if len(events) >= self.max_batch:
+                ready = self._rooms.pop(room)['events']
+
+        if ready:
+            self._send(room, ready)
+
+    def _send(self, room, events):
+        with self._lock:
+            self._frames_out += 1
+        if len(events) == 1:
+            # Un solo evento: se envía tal cual, compatible con clientes antiguos
+            event, data = events[0]
+            self._emit(event, data, room)
+        else:
+            self._emit('batch_update', {
+                'events': [{'event': event, 'data': data} for event, data in events]
+            }, room)
+
+    def flush_due(self, force=False):
+        now = time.monotonic()
+        with self._lock:
+            due = [room for room, buffer in self._rooms.items() if force or buffer['deadline'] <= now]
+            ready = [(room, self._rooms.pop(room)['events']) for room in due]
+        for room, events in ready:
+            self._send(room, events)
+
+    def _run(self, sleep):
+        # Resolución de la mitad de la ventana: ningún evento espera más de 1.5x
+        tick = max(self.window / 2, 0.005)
+        while True:
+            sleep(tick)
+            try:
+                self.flush_due()
+            except Exception as e:
+                print(f'⚠️ Error al emitir eventos agrupados: {e}')
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'window_ms': round(self.window * 1000, 3),
+                'max_batch': self.max_batch,
+                'pending_rooms': len(self._rooms),
+                'events_in': self._events_in,
+                'frames_out': self._frames_out,
+                'replaced_latest': self._replaced
+            }
+
+
+coalescer = RoomCoalescer(
+    enabled=os.getenv('COALESCE_ENABLED', 'false').lower() == 'true',
+    window=float(os.getenv('COALESCE_WINDOW_MS', 50)) / 1000,
+    max_batch=int(os.getenv('COALESCE_MAX_BATCH', 100)),
+    policies=_parse_policies(os.getenv('COALESCE_POLICIES'))
+)
@@ -1,29 +1,324 @@
 import pymysql
 from flask import g
 import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
 load_dotenv()
 
+
+class PoolTimeoutError(Exception):
+    """No se obtuvo una conexión libre del pool dentro del tiempo de espera"""
+    pass
+
+
+class ConnectionPool:
+    """Pool de conexiones PyMySQL acotado y seguro entre hilos"""
+
+    def __init__(self, min_size=2, max_size=10, timeout=5.0, max_lifetime=3600,
+                 max_idle=300, ping_interval=5.0, **connect_kwargs):
+        self.max_size = max(max_size, 1)
+        self.min_size = min(max(min_size, 0), self.max_size)
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.ping_interval = ping_interval
+        self.connect_kwargs = connect_kwargs
+
+        self._idle = deque()  # (conexion, creada_en, devuelta_en)
+        self._created_at = {}  # id(conexion) -> creada_en
+        self._in_use = 0
+        self._opening = 0  # conexiones que se están abriendo para reponer min_size
+        self._refilling = False
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+
+        # Estadísticas
+        self._total_created = 0
+        self._total_recycled = 0
+        self._total_checkouts = 0
+        self._total_rollbacks = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+
+    # ---------- Ciclo de vida de conexiones ----------
+
+    def _connect(self):
+        return pymysql.connect(**self.connect_kwargs)
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_expired(self, created_at, returned_at, now):
+        if self.max_lifetime and now - created_at > self.max_lifetime:
+            return True
+        if self.max_idle and now - returned_at > self.max_idle:
+            return True
+        return False
+
+    def _is_healthy(self, conn, returned_at):
+        # Solo hacemos ping si la conexión lleva un rato ociosa
+        if not conn.open:
+            return False
+        if time.monotonic() - returned_at < self.ping_interval:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def _reset(self, conn):
+        """Deshacer una transacción que se quedó abierta (begin() sin commit ni
+        rollback) para que el siguiente usuario no herede sus cambios ni bloqueos"""
+        try:
+            if conn.get_transaction_status():
+                conn.rollback()
+                with self._lock:
+                    self._total_rollbacks += 1
+            return True
+        except Exception:
+            return False
+
+    def _missing(self):
+        # Llamar con el lock tomado
+        return self.min_size - len(self._idle) - self._in_use - self._opening
+
+    def _top_up(self):
+        """Abrir las conexiones que faltan para llegar a min_size"""
+        with self._lock:
+            missing = max(self._missing(), 0)
+            self._opening += missing
+        opened = 0
+        try:
+            for _ in range(missing):
+                conn = self._connect()
+                now = time.monotonic()
+                with self._lock:
+                    self._opening -= 1
+                    self._created_at[id(conn)] = now
+                    self._total_created += 1
+                    self._idle.append((conn, now, now))
+                    self._available.notify()
+                opened += 1
+        finally:
+            if opened < missing:
+                with self._lock:
+                    self._opening -= missing - opened
+                    self._available.notify_all()
+        return opened
+
+    def _refill(self):
+        try:
+            self._top_up()
+        except Exception as e:
+            print(f'⚠️ No se pudo reponer el pool de conexiones: {e}')
+        finally:
+            with self._lock:
+                self._refilling = False
+
+    def _schedule_top_up(self):
+        """Reponer min_size en segundo plano tras reciclar o descartar conexiones"""
+        with self._lock:
+            if self._refilling or self._missing() <= 0:
+                return
+            self._refilling = True
+        threading.Thread(target=self._refill, daemon=True).start()
+
+    def warm_up(self):
+        """Abrir min_size conexiones por adelantado"""
+        self._top_up()
+
+    def acquire(self):
+        """Obtener una conexión del pool, esperando si está lleno"""
+        conn = None
+        returned_at = None
+        expired = []
+        wait_started = None
+
+        with self._lock:
+            while True:
+                now = time.monotonic()
+
+                # Reutilizar una conexión ociosa (LIFO: la más caliente primero)
+                while self._idle:
+                    candidate, created_at, candidate_returned_at = self._idle.pop()
+                    if self._is_expired(created_at, candidate_returned_at, now):
+                        self._created_at.pop(id(candidate), None)
+                        self._total_recycled += 1
+                        expired.append(candidate)
+                        continue
+                    conn, returned_at = candidate, candidate_returned_at
+                    break
+
+                if conn is not None or self._in_use + len(self._idle) + self._opening < self.max_size:
+                    # Conexión reutilizada o hueco libre para abrir una nueva
+                    self._in_use += 1
+                    break
+
+                # Pool lleno: esperar a que alguien devuelva una conexión
+                if wait_started is None:
+                    wait_started = now
+                    self._waits += 1
+                remaining = wait_started + self.timeout - now
+                if remaining <= 0:
+                    self._timeouts += 1
+                    self._wait_time += now - wait_started
+                    raise PoolTimeoutError(
+                        f'No hay conexiones disponibles tras {self.timeout}s '
+                        f'(max_size={self.max_size})'
+                    )
+                self._available.wait(remaining)
+
+            if wait_started is not None:
+                self._wait_time += time.monotonic() - wait_started
+            self._total_checkouts += 1
+
+        # La E/S de red (cierre, ping, conexión) se hace fuera del lock
+        for old in expired:
+            self._close_quietly(old)
+        if expired:
+            self._schedule_top_up()
+
+        try:
+            if conn is not None:
+                if self._is_healthy(conn, returned_at):
+                    return conn
+                with self._lock:
+                    self._created_at.pop(id(conn), None)
+                    self._total_recycled += 1
+                self._close_quietly(conn)
+
+            conn = self._connect()
+            with self._lock:
+                self._created_at[id(conn)] = time.monotonic()
+                self._total_created += 1
+            return conn
+        except Exception:
+            with self._lock:
+                self._in_use -= 1
+                self._available.notify()
+            raise
+
+    def release(self, conn, discard=False):
+        """Devolver una conexión al pool"""
+        if not discard and conn.open:
+            discard = not self._reset(conn)
+        now = time.monotonic()
+        with self._lock:
+            self._in_use -= 1
+            created_at = self._created_at.get(id(conn), now)
+            keep = not discard and conn.open and not self._is_expired(created_at, now, now)
+            if keep:
+                self._idle.append((conn, created_at, now))
+            else:
+                self._created_at.pop(id(conn), None)
+                self._total_recycled += 1
+            self._available.notify()
+
+        if not keep:
+            self._close_quietly(conn)
+            self._schedule_top_up()
+
+    @contextmanager
+    def connection(self):
+        """Context manager para usar una conexión fuera del contexto de Flask"""
+        conn = self.acquire()
+        failed = False
+        try:
+            yield conn
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.release(conn, discard=failed)
+
+    def close(self):
+        """Cerrar todas las conexiones ociosas"""
+        with self._lock:
+            idle = [conn for conn, _, _ in self._idle]
+            self._idle.clear()
+            for conn in idle:
+                self._created_at.pop(id(conn), None)
+        for conn in idle:
+            self._close_quietly(conn)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'total_created': self._total_created,
+                'total_recycled': self._total_recycled,
+                'checkouts': self._total_checkouts,
+                'rollbacks': self._total_rollbacks,
+                'waits': self._waits,
+                'wait_time_ms': round(self._wait_time * 1000, 3),
+                'timeouts': self._timeouts
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    min_size=int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+                    max_size=int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+                    timeout=float(os.getenv('DB_POOL_TIMEOUT', 5)),
+                    max_lifetime=float(os.getenv('DB_POOL_MAX_LIFETIME', 3600)),
+                    max_idle=float(os.getenv('DB_POOL_MAX_IDLE', 300)),
+                    ping_interval=float(os.getenv('DB_POOL_PING_INTERVAL', 5)),
+                    host=os.getenv('DB_HOST', 'localhost'),
+                    user=os.getenv('DB_USER', 'root'),
+                    password=os.getenv('DB_PASSWORD', 'Admin12345#!'),
+                    database=os.getenv('DB_NAME', 'IoT'),
+                    port=int(os.getenv('DB_PORT', 3306)),
+                    charset='utf8mb4',
+                    cursorclass=pymysql.cursors.DictCursor,
+                    ssl=None,
+                    autocommit=True
+                )
+    return _pool
+
+def get_pool_stats():
+    return get_pool().stats()
+
 def get_db_connection():
     if 'db' not in g:
-        g.db = pymysql.connect(
-            host=os.getenv('DB_HOST', 'localhost'),
-            user=os.getenv('DB_USER', 'root'),
-            password=os.getenv('DB_PASSWORD', 'Admin12345#!'),
-            database=os.getenv('DB_NAME', 'IoT'),
-            port=int(os.getenv('DB_PORT', 3306)),
-            charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor,
-            ssl=None,
-            autocommit=True
-        )
+        g.db = get_pool().acquire()
     return g.db
 
 def close_db_connection(e=None):
     db = g.pop('db', None)
     if db is not None:
-        db.close()
+        # Si la petición falló, no devolvemos una conexión en estado dudoso
+        get_pool().release(db, discard=e is not None)
+
+def discard_db_connection():
+    """Cerrar la conexión de la petición actual sin devolverla al pool"""
+    db = g.pop('db', None)
+    if db is not None:
+        get_pool().release(db, discard=True)
 
 def init_db(app):
     app.teardown_appcontext(close_db_connection)
+
+    # Precalentar el pool; si la BD no está disponible se abrirán bajo demanda
+    try:
+        get_pool().warm_up()
+    except Exception as e:
+        print(f'⚠️ No se pudo precalentar el pool de conexiones: {e}')
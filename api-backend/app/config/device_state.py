@@ -0,0 +1,118 @@
+import os
+import threading
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from app.config.recent_events import recent_events
+
+load_dotenv()
+
+
+class DeviceStateRegistry:
+    """Estado vivo por dispositivo: último comando, último obstáculo,
+    última actividad, número de suscriptores Socket.IO y último estado
+    reportado por la app de control (monitoring_sync).
+    El historial reciente vive en recent_events."""
+
+    def __init__(self, online_timeout=60):
+        self.online_timeout = timedelta(seconds=online_timeout)
+        self._lock = threading.Lock()
+        self._states = {}
+
+    def _state(self, device_id):
+        state = self._states.get(device_id)
+        if state is None:
+            state = {
+                'last_command': None,
+                'last_obstacle': None,
+                'last_seen': None,
+                'subscribers': 0,
+                'control': None,
+                'warm': False
+            }
+            self._states[device_id] = state
+        return state
+
+    @staticmethod
+    def _is_newer(event, current):
+        if current is None:
+            return True
+        return (event['fecha_hora'], event['id_evento']) >= (current['fecha_hora'], current['id_evento'])
+
+    def _record(self, kind, event):
+        with self._lock:
+            state = self._state(event['id_dispositivo'])
+            # fecha_hora (la envía el dispositivo) solo decide cuál es el último evento
+            if self._is_newer(event, state[f'last_{kind}']):
+                state[f'last_{kind}'] = event
+            # La actividad es la hora de recepción: un reloj del dispositivo
+            # adelantado o eventos atrasados no deben falsear online/offline
+            state['last_seen'] = datetime.now()
+        recent_events.record(kind, event)
+
+    def record_command(self, event):
+        self._record('command', event)
+
+    def record_obstacle(self, event):
+        self._record('obstacle', event)
+
+    def record_commands(self, events):
+        for event in events:
+            self._record('command', event)
+
+    def record_obstacles(self, events):
+        for event in events:
+            self._record('obstacle', event)
+
+    def warm(self, device_id, last_command, last_obstacle):
+        """Cargar el estado leído de la BD tras un fallo de caché"""
+        with self._lock:
+            state = self._state(device_id)
+            for key, event in (('last_command', last_command), ('last_obstacle', last_obstacle)):
+                if event is not None and self._is_newer(event, state[key]):
+                    state[key] = event
+                    # Sin hora de recepción en la BD: fecha_hora, nunca en el futuro
+                    seen = min(event['fecha_hora'], datetime.now())
+                    if state['last_seen'] is None or seen > state['last_seen']:
+                        state['last_seen'] = seen
+            state['warm'] = True
+
+    def record_control(self, device_id, status, reported_at):
+        """Guardar el estado enviado por la app de control"""
+        with self._lock:
+            self._state(device_id)['control'] = dict(status, reported_at=reported_at)
+
+    def set_subscribers(self, device_id, count):
+        with self._lock:
+            self._state(device_id)['subscribers'] = count
+
+    def forget(self, device_id):
+        with self._lock:
+            self._states.pop(device_id, None)
+        recent_events.forget(device_id)
+
+    def invalidate_all(self):
+        """Tras perder eventos de otros workers: el último comando/obstáculo puede
+        faltar, así que cada dispositivo se vuelve a cargar de la BD al consultarlo"""
+        with self._lock:
+            for state in self._states.values():
+                state['warm'] = False
+        recent_events.clear()
+
+    def status_of(self, last_seen):
+        if last_seen is None:
+            return 'offline'
+        return 'online' if datetime.now() - last_seen <= self.online_timeout else 'offline'
+
+    def get(self, device_id, allow_cold=False):
+        """Devolver una copia del estado o None si aún no se ha cargado de la BD.
+        allow_cold devuelve lo que haya en memoria aunque no se haya cargado."""
+        with self._lock:
+            state = self._states.get(device_id)
+            if state is None or not (state['warm'] or allow_cold):
+                return None
+            snapshot = {key: state[key] for key in ('last_command', 'last_obstacle', 'last_seen', 'subscribers', 'control')}
+        snapshot['current_status'] = self.status_of(snapshot['last_seen'])
+        return snapshot
+
+
+device_state = DeviceStateRegistry(online_timeout=float(os.getenv('DEVICE_ONLINE_TIMEOUT', 60)))
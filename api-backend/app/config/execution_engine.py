@@ -0,0 +1,302 @@
+import atexit
+import heapq
+import itertools
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class Execution:
+    """Estado en memoria de una ejecución de secuencia dirigida por el servidor"""
+    __slots__ = ('id_ejecucion', 'id_secuencia', 'id_dispositivo', 'operaciones',
+                 'interval', 'step', 'estado', 'generation', 'due', 'remaining')
+
+    def __init__(self, id_ejecucion, id_secuencia, id_dispositivo, operaciones, interval):
+        self.id_ejecucion = id_ejecucion
+        self.id_secuencia = id_secuencia
+        self.id_dispositivo = id_dispositivo
+        self.operaciones = list(operaciones)
+        self.interval = interval
+        self.step = 0           # siguiente paso a despachar
+        self.estado = 'pendiente'
+        self.generation = 0     # invalida las entradas del heap tras pausar o cancelar
+        self.due = None         # vencimiento del siguiente paso programado
+        self.remaining = None   # tiempo que faltaba al pausar
+
+    def to_dict(self):
+        return {
+            'id_ejecucion': self.id_ejecucion,
+            'id_secuencia': self.id_secuencia,
+            'id_dispositivo': self.id_dispositivo,
+            'estado': self.estado,
+            'paso': self.step,
+            'total_pasos': len(self.operaciones),
+            'intervalo_ms': round(self.interval * 1000)
+        }
+
+
+class ExecutionEngine:
+    """Ejecuta secuencias en el servidor: despacha cada paso a la sala del
+    dispositivo con el intervalo configurado. Un único heap de temporizadores y
+    una sola tarea de fondo atienden todas las ejecuciones; los cambios de estado
+    se escriben en la BD por lotes.
+    El estado vive en el worker que creó la ejecución: con varios workers las
+    órdenes de control llegan al resto por pub/sub (ver apply_control)."""
+
+    def __init__(self, enabled=False, step_interval=1.0, tick=0.05, flush_interval=0.5, max_pause=600.0):
+        self.enabled = enabled
+        self.step_interval = step_interval
+        self.max_pause = max_pause
+        self.tick = tick
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._heap = []  # (vencimiento, desempate, id_ejecucion, generación)
+        self._counter = itertools.count()
+        self._executions = {}
+        self._pending_states = {}  # id_ejecucion -> estado pendiente de escribir
+        self._app = None
+        self._started = False
+
+        # Estadísticas
+        self._steps_dispatched = 0
+        self._state_writes = 0
+        self._write_batches = 0
+        self._write_errors = 0
+        self._completed = 0
+        self._cancelled = 0
+        self._expired = 0
+
+    # ---------- Ciclo de vida ----------
+
+    def start(self, app, start_background_task, sleep):
+        if not self.enabled or self._started:
+            return
+        self._app = app
+        self._started = True
+        start_background_task(self._run, sleep)
+        atexit.register(self.shutdown)
+
+    def shutdown(self):
+        """Al apagar el proceso: sus ejecuciones no pueden seguir en otro worker,
+        se marcan canceladas y se escriben todos los estados pendientes"""
+        with self._lock:
+            for execution in self._executions.values():
+                execution.generation += 1
+                self._transition(execution, 'cancelado')
+                self._cancelled += 1
+            self._executions.clear()
+            self._heap.clear()
+        self._flush_states()
+
+    # ---------- API ----------
+
+    def _schedule(self, execution, delay):
+        execution.due = time.monotonic() + delay
+        heapq.heappush(self._heap, (execution.due, next(self._counter),
+                                    execution.id_ejecucion, execution.generation))
+
+    def _transition(self, execution, estado, persist=True):
+        execution.estado = estado
+        if persist:
+            self._pending_states[execution.id_ejecucion] = estado
+
+    def submit(self, id_ejecucion, id_secuencia, id_dispositivo, operaciones, interval=None):
+        """Programar una ejecución recién creada; el primer paso sale tras un intervalo"""
+        interval = self.step_interval if interval is None else interval
+        execution = Execution(id_ejecucion, id_secuencia, id_dispositivo, operaciones, interval)
+        with self._lock:
+            self._executions[id_ejecucion] = execution
+            self._schedule(execution, interval)
+            return execution.to_dict()
+
+    def pause(self, id_ejecucion):
+        with self._lock:
+            execution = self._executions.get(id_ejecucion)
+            if execution is None or execution.estado not in ('pendiente', 'progreso'):
+                return None
+            execution.generation += 1
+            execution.remaining = max(execution.due - time.monotonic(), 0)
+            # 'pausado' solo existe en memoria: en la BD sigue en progreso
+            self._transition(execution, 'pausado', persist=False)
+            # Con la nueva generación, esta entrada solo vence si nadie la reanuda
+            heapq.heappush(self._heap, (time.monotonic() + self.max_pause, next(self._counter),
+                                        id_ejecucion, execution.generation))
+            snapshot = execution.to_dict()
+        self._notify(snapshot)
+        return snapshot
+
+    def resume(self, id_ejecucion):
+        with self._lock:
+            execution = self._executions.get(id_ejecucion)
+            if execution is None or execution.estado != 'pausado':
+                return None
+            execution.generation += 1
+            self._transition(execution, 'progreso' if execution.step else 'pendiente', persist=False)
+            self._schedule(execution, execution.remaining)
+            snapshot = execution.to_dict()
+        self._notify(snapshot)
+        return snapshot
+
+    def cancel(self, id_ejecucion):
+        with self._lock:
+            execution = self._executions.pop(id_ejecucion, None)
+            if execution is None:
+                return None
+            execution.generation += 1
+            self._transition(execution, 'cancelado')
+            self._cancelled += 1
+            snapshot = execution.to_dict()
+        self._notify(snapshot)
+        return snapshot
+
+    def get(self, id_ejecucion):
+        with self._lock:
+            execution = self._executions.get(id_ejecucion)
+            return execution.to_dict() if execution is not None else None
+
+    def apply_control(self, id_ejecucion, action):
+        """pause/resume/cancel; None si la ejecución no es de este worker o su
+        estado no lo permite"""
+        actions = {'pause': self.pause, 'resume': self.resume, 'cancel': self.cancel}
+        return actions[action](id_ejecucion)
+
+    # ---------- Planificador ----------
+
+    def _run(self, sleep):
+        last_flush = time.monotonic()
+        while True:
+            with self._lock:
+                next_due = self._heap[0][0] if self._heap else None
+            now = time.monotonic()
+            wait = self.tick if next_due is None else min(max(next_due - now, 0), self.tick)
+            if wait:
+                sleep(wait)
+
+            try:
+                self._dispatch_due()
+
+                if time.monotonic() - last_flush >= self.flush_interval:
+                    last_flush = time.monotonic()
+                    self._flush_states()
+            except Exception as e:
+                print(f'⚠️ Error en el planificador de ejecuciones: {e}')
+
+    def _dispatch_due(self):
+        now = time.monotonic()
+        steps = []
+        updates = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, _, id_ejecucion, generation = heapq.heappop(self._heap)
+                execution = self._executions.get(id_ejecucion)
+                if execution is None or execution.generation != generation:
+                    continue  # cancelada o pausada después de programarse
+
+                if execution.estado == 'pausado':
+                    # Pausa más larga que max_pause: se cancela y se libera
+                    self._transition(execution, 'cancelado')
+                    del self._executions[id_ejecucion]
+                    self._expired += 1
+                    updates.append(execution.to_dict())
+                    continue
+
+                if execution.step >= len(execution.operaciones):
+                    # El último paso ya tuvo su intervalo: ejecución terminada
+                    self._transition(execution, 'completado')
+                    del self._executions[id_ejecucion]
+                    self._completed += 1
+                    updates.append(execution.to_dict())
+                    continue
+
+                if execution.estado == 'pendiente':
+                    self._transition(execution, 'progreso')
+                    updates.append(execution.to_dict())
+
+                steps.append((execution.id_dispositivo, {
+                    'id_ejecucion': id_ejecucion,
+                    'id_secuencia': execution.id_secuencia,
+                    'paso': execution.step + 1,
+                    'total_pasos': len(execution.operaciones),
+                    'status_operacion': execution.operaciones[execution.step]
+                }))
+                execution.step += 1
+                self._steps_dispatched += 1
+                self._schedule(execution, execution.interval)
+
+        for snapshot in updates:
+            if snapshot['estado'] == 'progreso':
+                self._notify(snapshot)
+        for id_dispositivo, step in steps:
+            self._emit(id_dispositivo, {'type': 'execution_step', 'data': step})
+        for snapshot in updates:
+            if snapshot['estado'] != 'progreso':
+                self._notify(snapshot)
+
+    def _flush_states(self):
+        """Escribir todos los cambios de estado acumulados en un solo UPDATE"""
+        with self._lock:
+            pending, self._pending_states = self._pending_states, {}
+        if not pending:
+            return
+
+        try:
+            # Import diferido: los modelos dependen de la configuración
+            from app.models.sequence_model import SequenceModel
+            with self._app.app_context():
+                SequenceModel.update_execution_statuses(pending)
+            with self._lock:
+                self._state_writes += len(pending)
+                self._write_batches += 1
+        except Exception as e:
+            with self._lock:
+                self._write_errors += 1
+                # Reintentar en el siguiente ciclo sin pisar estados más nuevos
+                for id_ejecucion, estado in pending.items():
+                    self._pending_states.setdefault(id_ejecucion, estado)
+            print(f'❌ Error al guardar estados de ejecución ({len(pending)}): {e}')
+
+    # ---------- Notificaciones ----------
+
+    @staticmethod
+    def _emit(id_dispositivo, payload):
+        from app.config.websocket import emit_execution_update
+        emit_execution_update(id_dispositivo, payload)
+
+    def _notify(self, snapshot):
+        self._emit(snapshot['id_dispositivo'], {'type': 'execution_status_updated', 'data': snapshot})
+
+    def stats(self):
+        with self._lock:
+            states = {}
+            for execution in self._executions.values():
+                states[execution.estado] = states.get(execution.estado, 0) + 1
+            return {
+                'enabled': self.enabled,
+                'active': len(self._executions),
+                'by_state': states,
+                'timers': len(self._heap),
+                'steps_dispatched': self._steps_dispatched,
+                'completed': self._completed,
+                'cancelled': self._cancelled,
+                'expired_pauses': self._expired,
+                'pending_state_writes': len(self._pending_states),
+                'state_writes': self._state_writes,
+                'write_batches': self._write_batches,
+                'write_errors': self._write_errors
+            }
+
+
+execution_engine = ExecutionEngine(
+    enabled=os.getenv('EXECUTION_ENGINE_ENABLED', 'false').lower() == 'true',
+    step_interval=float(os.getenv('EXECUTION_STEP_MS', 1000)) / 1000,
+    tick=float(os.getenv('EXECUTION_TICK_MS', 50)) / 1000,
+    flush_interval=float(os.getenv('EXECUTION_FLUSH_MS', 500)) / 1000,
+    max_pause=float(os.getenv('EXECUTION_MAX_PAUSE_S', 600))
+)
+
+def init_execution_engine(app):
+    from app.config.websocket import socketio
+    execution_engine.start(app, socketio.start_background_task, socketio.sleep)
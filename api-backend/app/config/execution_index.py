@@ -0,0 +1,83 @@
+import os
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class ExecutionIndex:
+    """Índice en memoria id_ejecucion -> (id_secuencia, id_dispositivo).
+    Se llena al crear cada ejecución y, si falta una entrada (reinicio, otro
+    worker), se reconstruye desde la BD con una sola consulta por lote.
+    La relación nunca cambia, así que solo hace falta olvidar entradas al
+    borrar secuencias o dispositivos."""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max(max_entries, 1)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+        # Estadísticas
+        self._hits = 0
+        self._misses = 0
+        self._loads = 0
+
+    def put(self, id_ejecucion, id_secuencia, id_dispositivo):
+        with self._lock:
+            self._entries[id_ejecucion] = (id_secuencia, id_dispositivo)
+            self._entries.move_to_end(id_ejecucion)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def resolve(self, ids):
+        """{id_ejecucion: (id_secuencia, id_dispositivo)} de las ejecuciones que existen"""
+        found = {}
+        missing = []
+        with self._lock:
+            for id_ejecucion in ids:
+                entry = self._entries.get(id_ejecucion)
+                if entry is None:
+                    missing.append(id_ejecucion)
+                else:
+                    self._entries.move_to_end(id_ejecucion)
+                    found[id_ejecucion] = entry
+            self._hits += len(found)
+            self._misses += len(missing)
+
+        if missing:
+            # Import diferido: los modelos dependen de la configuración
+            from app.models.sequence_model import SequenceModel
+            rows = SequenceModel.get_execution_targets(missing)
+            with self._lock:
+                self._loads += 1
+            for row in rows:
+                self.put(row['id_ejecucion'], row['id_secuencia'], row['id_dispositivo'])
+                found[row['id_ejecucion']] = (row['id_secuencia'], row['id_dispositivo'])
+        return found
+
+    def get(self, id_ejecucion):
+        return self.resolve([id_ejecucion]).get(id_ejecucion)
+
+    def forget_sequence(self, id_secuencia):
+        with self._lock:
+            for id_ejecucion in [k for k, v in self._entries.items() if v[0] == id_secuencia]:
+                del self._entries[id_ejecucion]
+
+    def forget_device(self, id_dispositivo):
+        with self._lock:
+            for id_ejecucion in [k for k, v in self._entries.items() if v[1] == id_dispositivo]:
+                del self._entries[id_ejecucion]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self._hits,
+                'misses': self._misses,
+                'db_loads': self._loads
+            }
+
+
+execution_index = ExecutionIndex(max_entries=int(os.getenv('EXECUTION_INDEX_SIZE', 10000)))
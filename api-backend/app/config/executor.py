@@ -0,0 +1,89 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from flask import current_app
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class QueryTimeoutError(Exception):
+    """Alguna consulta paralela no terminó dentro del tiempo de la petición"""
+    pass
+
+
+def _default_workers():
+    """Cada hilo ocupa una conexión del pool mientras consulta: por defecto se usa
+    la mitad del pool y nunca todo, para que las peticiones normales (y la consulta
+    que el propio llamador ejecuta) sigan teniendo conexiones libres"""
+    pool_size = int(os.getenv('DB_POOL_MAX_SIZE', 10))
+    workers = int(os.getenv('QUERY_FANOUT_WORKERS', max(pool_size // 2, 1)))
+    return max(min(workers, pool_size - 1), 1)
+
+# Cada hilo abre su propio contexto de app, así get_db_connection le asigna
+# una conexión distinta del pool y la devuelve al terminar
+_executor = ThreadPoolExecutor(
+    max_workers=_default_workers(),
+    thread_name_prefix='query-fanout'
+)
+DEFAULT_TIMEOUT = float(os.getenv('QUERY_FANOUT_TIMEOUT', 5))
+
+def _run_in_context(app, fn, args, kwargs):
+    with app.app_context():
+        return fn(*args, **kwargs)
+
+def _unpack(query):
+    fn, args = query[0], query[1]
+    kwargs = query[2] if len(query) > 2 else {}
+    return fn, args, kwargs
+
+def fan_out(queries, timeout=None):
+    """Ejecutar consultas independientes de los modelos en paralelo.
+    queries: {nombre: (funcion, args)} o {nombre: (funcion, args, kwargs)}
+    La primera consulta se ejecuta en el hilo del llamador (con su conexión) y
+    el resto en el pool de hilos.
+    Devuelve {nombre: resultado}; relanza la primera excepción o QueryTimeoutError.
+    Al vencer el plazo se cancelan las consultas que aún no empezaron; las que ya
+    están en marcha no se pueden interrumpir y mantienen su hilo y su conexión
+    hasta que MySQL responde (el tamaño del pool de hilos acota ese coste)."""
+    app = current_app._get_current_object()
+    timeout = DEFAULT_TIMEOUT if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+
+    items = list(queries.items())
+    if not items:
+        return {}
+    inline_name, inline_query = items[0]
+
+    futures = {}
+    for name, query in items[1:]:
+        fn, args, kwargs = _unpack(query)
+        futures[name] = _executor.submit(_run_in_context, app, fn, args, kwargs)
+
+    def cancel_all():
+        for future in futures.values():
+            future.cancel()
+
+    results = {}
+    try:
+        fn, args, kwargs = _unpack(inline_query)
+        results[inline_name] = fn(*args, **kwargs)
+    except Exception:
+        cancel_all()
+        raise
+
+    remaining = max(deadline - time.monotonic(), 0)
+    done, pending = wait(futures.values(), timeout=remaining, return_when=FIRST_EXCEPTION)
+
+    for future in done:
+        if future.exception() is not None:
+            cancel_all()
+            raise future.exception()
+
+    if pending:
+        cancel_all()
+        raise QueryTimeoutError(f'Las consultas no terminaron en {timeout}s')
+
+    for name, future in futures.items():
+        results[name] = future.result()
+    return {name: results[name] for name in queries}
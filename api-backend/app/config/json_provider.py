@@ -0,0 +1,82 @@
+import base64
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from flask.json.provider import JSONProvider
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Codificación JSON única para respuestas REST, Socket.IO y pub/sub.
+# Las fechas salen siempre en ISO 8601 sin microsegundos (2024-05-01T13:45:10),
+# tanto con orjson como con la librería estándar.
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if os.getenv('JSON_FAST_ENCODER', 'true').lower() != 'true':
+    orjson = None
+
+JSON_BACKEND = 'orjson' if orjson is not None else 'json'
+
+
+def _default(value):
+    """Tipos que ninguno de los dos codificadores resuelve por sí solo"""
+    if isinstance(value, Decimal):
+        # Como texto: float perdería precisión en columnas DECIMAL
+        return str(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(value).decode('ascii')
+    if isinstance(value, datetime):
+        # Solo llega aquí con la librería estándar (orjson las codifica en C)
+        return value.isoformat(timespec='seconds')
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f'Tipo no serializable a JSON: {type(value).__name__}')
+
+
+if orjson is not None:
+    # OPT_NON_STR_KEYS: los contadores por dispositivo usan claves enteras
+    _OPTIONS = orjson.OPT_OMIT_MICROSECONDS | orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj):
+        return orjson.dumps(obj, default=_default, option=_OPTIONS)
+
+    def dumps(obj, **kwargs):
+        # Socket.IO pasa separators=...; la salida de orjson ya es compacta
+        return orjson.dumps(obj, default=_default, option=_OPTIONS).decode('utf-8')
+
+    def loads(s, **kwargs):
+        return orjson.loads(s)
+else:
+    # Un solo encoder reutilizado: evita construirlo en cada llamada
+    _encoder = json.JSONEncoder(default=_default, separators=(',', ':'), ensure_ascii=False)
+
+    def dumps_bytes(obj):
+        return _encoder.encode(obj).encode('utf-8')
+
+    def dumps(obj, **kwargs):
+        return _encoder.encode(obj)
+
+    def loads(s, **kwargs):
+        return json.loads(s)
+
+
+class FastJSONProvider(JSONProvider):
+    """Proveedor JSON de Flask: jsonify y request.get_json usan el mismo
+    codificador que los eventos Socket.IO"""
+
+    mimetype = 'application/json'
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
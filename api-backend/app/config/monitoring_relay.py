@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CONNECTION_STATUSES = ('connected', 'disconnected', 'error')
+STATUS_FIELDS = ('total_commands', 'total_obstacles', 'is_demo_running', 'connection_status')
+
+
+class MonitoringRelay:
+    """Filtro de los mensajes 'monitoring_sync' de la app de control antes de
+    reenviarlos: valida, descarta repetidos y limita la frecuencia por emisor.
+    Lo que llega dentro del intervalo no se pierde: se guarda el último estado
+    de cada dispositivo y se reenvía al vencer el intervalo."""
+
+    def __init__(self, min_interval=1.0):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        # sid -> {'at': float, 'last': {id_dispositivo: dict},
+        #         'trailing': {id_dispositivo: dict}, 'scheduled': bool}
+        self._senders = {}
+
+        # Estadísticas
+        self._relayed = 0
+        self._deduped = 0
+        self._throttled = 0
+        self._trailing = 0
+        self._invalid = 0
+
+    @staticmethod
+    def _int(value):
+        if isinstance(value, bool):
+            raise ValueError
+        value = int(value)
+        if value < 0:
+            raise ValueError
+        return value
+
+    def validate(self, message):
+        """Devolver (id_dispositivo, estado normalizado) o lanzar ValueError"""
+        if not isinstance(message, dict) or message.get('type') != 'status_update':
+            raise ValueError('Se esperaba un mensaje status_update')
+        data = message.get('data')
+        if not isinstance(data, dict):
+            raise ValueError('data es requerido')
+        try:
+            device_id = self._int(message.get('device_id'))
+            status = {
+                'total_commands': self._int(data.get('total_commands', 0)),
+                'total_obstacles': self._int(data.get('total_obstacles', 0)),
+                'is_demo_running': bool(data.get('is_demo_running', False)),
+                'connection_status': data.get('connection_status', 'disconnected')
+            }
+        except (TypeError, ValueError):
+            raise ValueError('device_id y los totales deben ser enteros no negativos')
+        if status['connection_status'] not in CONNECTION_STATUSES:
+            raise ValueError(f'connection_status inválido. Valores válidos: {list(CONNECTION_STATUSES)}')
+        return device_id, status
+
+    def accept(self, sid, device_id, status):
+        """Devolver (resultado, espera): 'relay' si hay que reenviar ya, 'duplicate'
+        si se descarta o 'throttled' si queda retenido hasta el fin del intervalo.
+        espera solo viene informada cuando hay que programar take_trailing(sid)."""
+        now = time.monotonic()
+        with self._lock:
+            sender = self._senders.setdefault(sid, {'at': None, 'last': {}, 'trailing': {}, 'scheduled': False})
+            if sender['last'].get(device_id) == status:
+                # El estado volvió a lo último reenviado: lo retenido ya no vale
+                sender['trailing'].pop(device_id, None)
+                self._deduped += 1
+                return 'duplicate', None
+            if sender['at'] is not None and now - sender['at'] < self.min_interval:
+                sender['trailing'][device_id] = status
+                self._throttled += 1
+                if sender['scheduled']:
+                    return 'throttled', None
+                sender['scheduled'] = True
+                return 'throttled', sender['at'] + self.min_interval - now
+            sender['at'] = now
+            sender['last'][device_id] = status
+            sender['trailing'].pop(device_id, None)
+            self._relayed += 1
+            return 'relay', None
+
+    def take_trailing(self, sid):
+        """Estados retenidos de un emisor al vencer su intervalo: [(id_dispositivo, estado)]"""
+        with self._lock:
+            sender = self._senders.get(sid)
+            if sender is None:
+                return []
+            sender['scheduled'] = False
+            pending, sender['trailing'] = sender['trailing'], {}
+            if pending:
+                sender['at'] = time.monotonic()
+                sender['last'].update(pending)
+                self._relayed += len(pending)
+                self._trailing += len(pending)
+            return list(pending.items())
+
+    def reject(self):
+        with self._lock:
+            self._invalid += 1
+
+    def remove_sender(self, sid):
+        """Olvidar al emisor; devuelve sus estados retenidos para reenviarlos ya"""
+        with self._lock:
+            sender = self._senders.pop(sid, None)
+            if sender is None or not sender['trailing']:
+                return []
+            self._relayed += len(sender['trailing'])
+            self._trailing += len(sender['trailing'])
+            return list(sender['trailing'].items())
+
+    def stats(self):
+        with self._lock:
+            return {
+                'min_interval_s': self.min_interval,
+                'senders': len(self._senders),
+                'relayed': self._relayed,
+                'deduped': self._deduped,
+                'throttled': self._throttled,
+                'trailing_relayed': self._trailing,
+                'invalid': self._invalid
+            }
+
+
+monitoring_relay = MonitoringRelay(min_interval=float(os.getenv('MONITORING_SYNC_MIN_INTERVAL', 1)))
@@ -0,0 +1,121 @@
+import os
+import time
+import uuid
+from dotenv import load_dotenv
+from app.config import json_provider
+
+load_dotenv()
+
+
+class InProcessPubSub:
+    """Backend local: entrega los eventos directamente en este proceso"""
+
+    name = 'memory'
+
+    def __init__(self):
+        self._handler = None
+
+    def start(self, handler, start_background_task):
+        self._handler = handler
+
+    def publish(self, event, device_id, payload, sequenced=True):
+        self._handler(event, device_id, payload, True, None)
+
+    def stats(self):
+        return {'backend': self.name}
+
+
+class RedisPubSub:
+    """Backend multi-proceso sobre Redis PUB/SUB.
+    Cada worker publica en el canal y todos (incluido él mismo) entregan
+    el evento a sus propios suscriptores Socket.IO."""
+
+    name = 'redis'
+
+    # Secuencia global y publicación en un solo paso atómico: el orden de la
+    # secuencia coincide con el de entrega y todos los workers comparten tokens
+    # de /sync/status. Si el hash desaparece se crea un epoch nuevo.
+    PUBLISH_SCRIPT = """
+    redis.call('HSETNX', KEYS[1], 'epoch', ARGV[2])
+    local epoch = redis.call('HGET', KEYS[1], 'epoch')
+    local seq = redis.call('HINCRBY', KEYS[1], 'seq', 1)
+    redis.call('PUBLISH', ARGV[1], epoch .. '|' .. seq .. '|' .. ARGV[3])
+    return seq
+    """
+
+    def __init__(self, url, channel):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('PUBSUB_BACKEND=redis requiere el paquete redis (pip install redis)')
+        self._redis = redis
+        self.url = url
+        self.channel = channel
+        self.worker_id = uuid.uuid4().hex[:8]
+        self._client = redis.Redis.from_url(url)
+        self._publish = self._client.register_script(self.PUBLISH_SCRIPT)
+        self._sequence_key = f'{channel}:sequence'
+        self._handler = None
+        self._published = 0
+        self._received = 0
+        self._errors = 0
+
+    def start(self, handler, start_background_task):
+        self._handler = handler
+        # start_background_task respeta el modo de concurrencia (hilo o greenlet)
+        start_background_task(self._listen)
+
+    def publish(self, event, device_id, payload, sequenced=True):
+        """sequenced=False para mensajes internos entre workers: no consumen
+        secuencia, así no abren huecos en los tokens de /sync/status"""
+        message = json_provider.dumps({
+            'origin': self.worker_id,
+            'event': event,
+            'device_id': device_id,
+            'payload': payload
+        })
+        if sequenced:
+            self._publish(keys=[self._sequence_key], args=[self.channel, uuid.uuid4().hex[:8], message])
+        else:
+            self._client.publish(self.channel, '||' + message)
+        self._published += 1
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    if message.get('type') != 'message':
+                        continue
+                    epoch, seq, body = message['data'].split(b'|', 2)
+                    data = json_provider.loads(body)
+                    self._received += 1
+                    # local: el evento lo publicó este mismo worker
+                    self._handler(data['event'], data['device_id'], data['payload'],
+                                  data.get('origin') == self.worker_id,
+                                  (epoch.decode('ascii'), int(seq)) if seq else None)
+            except Exception as e:
+                self._errors += 1
+                print(f'⚠️ Error en suscripción pub/sub ({self.url}): {e}. Reintentando...')
+                time.sleep(1)
+
+    def stats(self):
+        return {
+            'backend': self.name,
+            'channel': self.channel,
+            'worker_id': self.worker_id,
+            'published': self._published,
+            'received': self._received,
+            'errors': self._errors
+        }
+
+
+def create_pubsub():
+    backend = os.getenv('PUBSUB_BACKEND', 'memory')
+    if backend == 'redis':
+        return RedisPubSub(
+            url=os.getenv('PUBSUB_REDIS_URL', 'redis://localhost:6379/0'),
+            channel=os.getenv('PUBSUB_CHANNEL', 'iot_events')
+        )
+    return InProcessPubSub()
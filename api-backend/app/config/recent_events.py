@@ -0,0 +1,219 @@
+import os
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+from app.config.catalog_cache import catalog_cache
+
+load_dotenv()
+
+
+class CommandRecord:
+    """Fila compacta de historial_operaciones (los textos salen del catálogo)"""
+    __slots__ = ('id_evento', 'id_dispositivo', 'status_operacion', 'fecha_hora')
+
+    def __init__(self, event):
+        self.id_evento = event['id_evento']
+        self.id_dispositivo = event['id_dispositivo']
+        self.status_operacion = event['status_operacion']
+        self.fecha_hora = event['fecha_hora']
+
+    def to_dict(self):
+        return {
+            'id_evento': self.id_evento,
+            'id_dispositivo': self.id_dispositivo,
+            'status_operacion': self.status_operacion,
+            'fecha_hora': self.fecha_hora,
+            'status_texto': catalog_cache.operation_text(self.status_operacion),
+            'nombre_dispositivo': catalog_cache.device_name(self.id_dispositivo)
+        }
+
+
+class ObstacleRecord:
+    """Fila compacta de historial_obstaculos (los textos salen del catálogo)"""
+    __slots__ = ('id_evento', 'id_dispositivo', 'status_obstaculo', 'ubicacion', 'descripcion', 'tipo', 'fecha_hora')
+
+    def __init__(self, event):
+        self.id_evento = event['id_evento']
+        self.id_dispositivo = event['id_dispositivo']
+        self.status_obstaculo = event['status_obstaculo']
+        self.ubicacion = event['ubicacion']
+        self.descripcion = event['descripcion']
+        self.tipo = event['tipo']
+        self.fecha_hora = event['fecha_hora']
+
+    def to_dict(self):
+        return {
+            'id_evento': self.id_evento,
+            'id_dispositivo': self.id_dispositivo,
+            'status_obstaculo': self.status_obstaculo,
+            'ubicacion': self.ubicacion,
+            'descripcion': self.descripcion,
+            'tipo': self.tipo,
+            'fecha_hora': self.fecha_hora,
+            'status_texto': catalog_cache.obstacle_text(self.status_obstaculo),
+            'nombre_dispositivo': catalog_cache.device_name(self.id_dispositivo)
+        }
+
+
+RECORD_TYPES = {'command': CommandRecord, 'obstacle': ObstacleRecord}
+
+
+class RingBuffer:
+    """Buffer circular de tamaño fijo con los eventos más recientes de un dispositivo.
+    complete indica que contiene todo el historial (la BD devolvió menos filas que
+    la capacidad), así que cualquier limit se puede servir desde aquí."""
+    __slots__ = ('slots', 'head', 'size', 'warm', 'complete', 'pending')
+
+    def __init__(self, capacity):
+        self.slots = [None] * capacity
+        self.head = 0       # posición donde se escribirá el siguiente registro
+        self.size = 0
+        self.warm = False
+        self.complete = False
+        self.pending = []   # escrituras que llegan mientras se carga desde la BD
+
+    def push(self, record):
+        capacity = len(self.slots)
+        newest = self.slots[(self.head - 1) % capacity] if self.size else None
+        if newest is not None and (record.fecha_hora, record.id_evento) < (newest.fecha_hora, newest.id_evento):
+            # Llegó desordenado (escrituras concurrentes): reconstruir ordenado
+            self.fill(self.newest_first() + [record])
+            return
+        self.slots[self.head] = record
+        self.head = (self.head + 1) % capacity
+        if self.size < capacity:
+            self.size += 1
+        else:
+            # Se pisa el más antiguo: ya no es todo el historial
+            self.complete = False
+
+    def fill(self, records):
+        """Cargar registros en cualquier orden, sin duplicados, conservando los más recientes"""
+        unique = {record.id_evento: record for record in records}
+        ordered = sorted(unique.values(), key=lambda record: (record.fecha_hora, record.id_evento))
+        capacity = len(self.slots)
+        if len(ordered) > capacity:
+            self.complete = False
+        ordered = ordered[-capacity:]
+        self.slots = ordered + [None] * (capacity - len(ordered))
+        self.size = len(ordered)
+        self.head = self.size % capacity
+
+    def newest_first(self, limit=None):
+        capacity = len(self.slots)
+        count = self.size if limit is None else min(limit, self.size)
+        return [self.slots[(self.head - 1 - offset) % capacity] for offset in range(count)]
+
+
+class RecentEventsCache:
+    """Caché acotada de los últimos comandos y obstáculos por dispositivo.
+    Se alimenta en cada escritura y se carga de la BD solo al primer acceso;
+    mantiene como mucho max_devices dispositivos (LRU)."""
+
+    def __init__(self, enabled=True, capacity=50, max_devices=1000):
+        self.enabled = enabled
+        self.capacity = max(capacity, 1)
+        self.max_devices = max(max_devices, 1)
+        self._lock = threading.Lock()
+        self._devices = OrderedDict()  # id_dispositivo -> {'command': RingBuffer, 'obstacle': RingBuffer}
+
+        # Estadísticas
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def _rings(self, device_id, create=False):
+        rings = self._devices.get(device_id)
+        if rings is not None:
+            self._devices.move_to_end(device_id)
+        elif create:
+            rings = {kind: RingBuffer(self.capacity) for kind in RECORD_TYPES}
+            self._devices[device_id] = rings
+            while len(self._devices) > self.max_devices:
+                self._devices.popitem(last=False)
+                self._evictions += 1
+        return rings
+
+    def get(self, kind, device_id, limit):
+        """Eventos más recientes primero, o None si hay que leerlos de la BD"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            rings = self._rings(device_id)
+            ring = rings[kind] if rings is not None else None
+            if ring is None or not ring.warm or (limit > ring.size and not ring.complete):
+                self._misses += 1
+                return None
+            self._hits += 1
+            records = ring.newest_first(limit)
+        return [record.to_dict() for record in records]
+
+    def begin_warm(self, device_id):
+        """Registrar el dispositivo antes de leer la BD: lo escrito mientras tanto va a pending"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._rings(device_id, create=True)
+
+    def warm(self, kind, device_id, rows):
+        """Cargar las filas leídas de la BD (como mucho capacity, en cualquier orden)"""
+        if not self.enabled:
+            return
+        record_type = RECORD_TYPES[kind]
+        records = [record_type(row) for row in rows]
+        with self._lock:
+            ring = self._rings(device_id, create=True)[kind]
+            if ring.warm:
+                return
+            ring.complete = len(records) < self.capacity
+            ring.fill(records + ring.pending)
+            ring.pending = []
+            ring.warm = True
+
+    def record(self, kind, event):
+        if not self.enabled:
+            return
+        with self._lock:
+            rings = self._rings(event['id_dispositivo'])
+            if rings is None:
+                # Dispositivo no cacheado: se cargará de la BD cuando alguien lo lea
+                return
+            ring = rings[kind]
+            record = RECORD_TYPES[kind](event)
+            if ring.warm:
+                ring.push(record)
+            else:
+                # Solo hacen falta las más recientes: la carga conserva capacity filas
+                if len(ring.pending) >= self.capacity:
+                    ring.pending.pop(0)
+                ring.pending.append(record)
+
+    def forget(self, device_id):
+        with self._lock:
+            self._devices.pop(device_id, None)
+
+    def clear(self):
+        """Vaciar la caché: cada dispositivo se recargará de la BD al leerlo"""
+        with self._lock:
+            self._devices.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'enabled': self.enabled,
+                'capacity_per_device': self.capacity,
+                'max_devices': self.max_devices,
+                'devices': len(self._devices),
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': round(self._hits / lookups, 4) if lookups else 0.0,
+                'evictions': self._evictions
+            }
+
+
+recent_events = RecentEventsCache(
+    enabled=os.getenv('RECENT_CACHE_ENABLED', 'true').lower() == 'true',
+    capacity=int(os.getenv('RECENT_CACHE_SIZE', 50)),
+    max_devices=int(os.getenv('RECENT_CACHE_MAX_DEVICES', 1000))
+)
@@ -0,0 +1,158 @@
+import os
+import threading
+from collections import deque
+from dotenv import load_dotenv
+
+load_dotenv()
+
+POLICIES = ('drop_oldest', 'coalesce_latest', 'disconnect')
+
+# Eventos que son una foto completa del estado de un dispositivo: con la política
+# coalesce_latest, en la cola de un cliente lento solo se conserva el último
+SNAPSHOT_EVENTS = ('monitoring_sync',)
+
+
+class ClientSendQueues:
+    """Colas de salida acotadas por cliente Socket.IO.
+    Mientras el transporte de un cliente tenga poco pendiente los eventos se envían
+    directamente; si se queda atrás se guardan en su cola, que nunca supera max_queue
+    y se desborda según la política configurada. Un cliente lento no frena al resto.
+    Los paquetes llegan ya codificados: se serializan una vez por emisión a la sala,
+    no una vez por cliente."""
+
+    def __init__(self, enabled=False, max_queue=100, policy='drop_oldest',
+                 high_watermark=50, drain_interval=0.02):
+        self.enabled = enabled
+        self.max_queue = max(max_queue, 1)
+        self.policy = policy if policy in POLICIES else 'drop_oldest'
+        self.high_watermark = max(high_watermark, 1)
+        self.drain_interval = drain_interval
+        self._lock = threading.Lock()
+        self._queues = {}  # sid -> {'eio_sid': str, 'pending': deque[(clave, paquete)]}
+        self._send = None
+        self._backlog = None
+        self._disconnect = None
+
+        # Estadísticas
+        self._sent_direct = 0
+        self._queued = 0
+        self._drained = 0
+        self._dropped = 0
+        self._coalesced = 0
+        self._disconnected = 0
+        self._max_depth = 0
+
+    def start(self, send, backlog, disconnect, start_background_task, sleep):
+        """send(eio_sid, paquete) con el paquete ya codificado, backlog(eio_sid) ->
+        paquetes pendientes en el transporte, disconnect(sid) para la política 'disconnect'"""
+        self._send = send
+        self._backlog = backlog
+        self._disconnect = disconnect
+        if self.enabled:
+            start_background_task(self._run, sleep)
+
+    def send(self, sid, eio_sid, event, encoded, key=None):
+        """Enviar un paquete codificado; key (p. ej. la sala del dispositivo)
+        identifica las fotos de estado que se pueden sustituir en la cola"""
+        to_disconnect = False
+        with self._lock:
+            entry = self._queues.get(sid)
+            # Camino rápido: sin cola propia y con el transporte al día
+            if entry is None and self._backlog(eio_sid) < self.high_watermark:
+                self._sent_direct += 1
+                direct = True
+            else:
+                direct = False
+                if entry is None:
+                    entry = {'eio_sid': eio_sid, 'pending': deque()}
+                    self._queues[sid] = entry
+                coalesce_key = (event, key) if event in SNAPSHOT_EVENTS else None
+                to_disconnect = self._enqueue(entry['pending'], coalesce_key, encoded)
+                if to_disconnect:
+                    self._queues.pop(sid, None)
+
+        if direct:
+            self._send(eio_sid, encoded)
+        elif to_disconnect:
+            print(f'⚠️ Cliente {sid} desconectado: cola de salida llena ({self.max_queue})')
+            self._disconnect(sid)
+
+    def _enqueue(self, pending, coalesce_key, encoded):
+        """Añadir a la cola aplicando la política; True si hay que desconectar al cliente"""
+        self._queued += 1
+        if self.policy == 'coalesce_latest' and coalesce_key is not None:
+            # Una foto de estado más reciente del mismo dispositivo deja obsoleta la anterior
+            for index, (pending_key, _) in enumerate(pending):
+                if pending_key == coalesce_key:
+                    del pending[index]
+                    self._coalesced += 1
+                    break
+        if len(pending) >= self.max_queue:
+            if self.policy == 'disconnect':
+                self._disconnected += 1
+                return True
+            # El resto de eventos (historial) nunca se fusiona: se descarta el más antiguo
+            pending.popleft()
+            self._dropped += 1
+        pending.append((coalesce_key, encoded))
+        if len(pending) > self._max_depth:
+            self._max_depth = len(pending)
+        return False
+
+    def remove(self, sid):
+        with self._lock:
+            self._queues.pop(sid, None)
+
+    def drain(self):
+        """Enviar lo pendiente de cada cliente hasta su marca de agua"""
+        ready = []
+        with self._lock:
+            for sid in list(self._queues):
+                entry = self._queues[sid]
+                room_left = self.high_watermark - self._backlog(entry['eio_sid'])
+                pending = entry['pending']
+                while room_left > 0 and pending:
+                    ready.append((entry['eio_sid'], pending.popleft()[1]))
+                    room_left -= 1
+                # Cola vacía: el cliente vuelve al camino rápido
+                if not pending:
+                    del self._queues[sid]
+            self._drained += len(ready)
+
+        for eio_sid, encoded in ready:
+            self._send(eio_sid, encoded)
+
+    def _run(self, sleep):
+        while True:
+            sleep(self.drain_interval)
+            try:
+                self.drain()
+            except Exception as e:
+                print(f'⚠️ Error al vaciar colas de salida: {e}')
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'policy': self.policy,
+                'max_queue': self.max_queue,
+                'high_watermark': self.high_watermark,
+                'slow_clients': len(self._queues),
+                'pending': sum(len(entry['pending']) for entry in self._queues.values()),
+                'max_depth': self._max_depth,
+                'sent_direct': self._sent_direct,
+                'queued': self._queued,
+                'drained': self._drained,
+                'dropped': self._dropped,
+                'coalesced': self._coalesced,
+                'disconnected': self._disconnected
+            }
+
+
+send_queues = ClientSendQueues(
+    enabled=os.getenv('SEND_QUEUE_ENABLED', 'false').lower() == 'true',
+    max_queue=int(os.getenv('SEND_QUEUE_MAX', 100)),
+    policy=os.getenv('SEND_QUEUE_POLICY', 'drop_oldest'),
+    high_watermark=int(os.getenv('SEND_QUEUE_HIGH_WATERMARK', 50)),
+    drain_interval=float(os.getenv('SEND_QUEUE_DRAIN_MS', 20)) / 1000
+)
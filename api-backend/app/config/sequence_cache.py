@@ -0,0 +1,136 @@
+import os
+import threading
+from collections import OrderedDict
+from flask import g, has_app_context
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Distingue "no está en caché" de una secuencia inexistente (None)
+MISSING = object()
+
+
+class SequenceCache:
+    """Caché de lecturas de secuencias en tres niveles:
+    memo por petición (flask.g), LRU entre peticiones por id_secuencia y
+    listados de get_sequences bajo una versión que cambia con cada escritura"""
+
+    def __init__(self, enabled=True, max_entries=500, max_lists=16):
+        self.enabled = enabled
+        self.max_entries = max(max_entries, 1)
+        self.max_lists = max(max_lists, 1)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # id_secuencia -> secuencia
+        self._lists = OrderedDict()    # limit -> listado de la versión actual
+        self.version = 0
+
+        # Estadísticas
+        self._memo_hits = 0
+        self._hits = 0
+        self._misses = 0
+        self._list_hits = 0
+        self._list_misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def _memo():
+        """Memo de la petición actual (vacío y desechable fuera de contexto de app)"""
+        if not has_app_context():
+            return {}
+        memo = g.get('sequence_memo')
+        if memo is None:
+            memo = g.sequence_memo = {}
+        return memo
+
+    # ---------- Secuencias individuales ----------
+
+    def get(self, id_secuencia):
+        """Secuencia cacheada (None si no existe) o MISSING si hay que leer la BD"""
+        if not self.enabled:
+            return MISSING
+        memo = self._memo()
+        if id_secuencia in memo:
+            with self._lock:
+                self._memo_hits += 1
+            return memo[id_secuencia]
+        with self._lock:
+            sequence = self._entries.get(id_secuencia, MISSING)
+            if sequence is MISSING:
+                self._misses += 1
+                return MISSING
+            self._entries.move_to_end(id_secuencia)
+            self._hits += 1
+        memo[id_secuencia] = sequence
+        return sequence
+
+    def put(self, id_secuencia, sequence, version):
+        """Guardar lo leído de la BD si no hubo escrituras desde que empezó la lectura"""
+        if not self.enabled:
+            return
+        self._memo()[id_secuencia] = sequence
+        with self._lock:
+            if version != self.version or sequence is None:
+                return
+            self._entries[id_secuencia] = sequence
+            self._entries.move_to_end(id_secuencia)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    # ---------- Listados ----------
+
+    def get_list(self, limit):
+        if not self.enabled:
+            return MISSING
+        with self._lock:
+            rows = self._lists.get(limit, MISSING)
+            if rows is MISSING:
+                self._list_misses += 1
+            else:
+                self._lists.move_to_end(limit)
+                self._list_hits += 1
+            return rows
+
+    def put_list(self, limit, rows, version):
+        if not self.enabled:
+            return
+        with self._lock:
+            if version != self.version:
+                return
+            self._lists[limit] = rows
+            while len(self._lists) > self.max_lists:
+                self._lists.popitem(last=False)
+
+    # ---------- Invalidación ----------
+
+    def invalidate(self, id_secuencia=None):
+        """Llamar tras cualquier escritura: descarta la secuencia y todos los listados"""
+        with self._lock:
+            self.version += 1
+            self._lists.clear()
+            if id_secuencia is not None:
+                self._entries.pop(id_secuencia, None)
+        self._memo().pop(id_secuencia, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'version': self.version,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'lists': len(self._lists),
+                'memo_hits': self._memo_hits,
+                'hits': self._hits,
+                'misses': self._misses,
+                'list_hits': self._list_hits,
+                'list_misses': self._list_misses,
+                'evictions': self._evictions
+            }
+
+
+sequence_cache = SequenceCache(
+    enabled=os.getenv('SEQUENCE_CACHE_ENABLED', 'true').lower() == 'true',
+    max_entries=int(os.getenv('SEQUENCE_CACHE_SIZE', 500)),
+    max_lists=int(os.getenv('SEQUENCE_LIST_CACHE_SIZE', 16))
+)
@@ -0,0 +1,136 @@
+import os
+import threading
+from dotenv import load_dotenv
+from app.config.catalog_cache import catalog_cache
+
+load_dotenv()
+
+COUNTERS = ('commands', 'obstacles_auto', 'obstacles_manual', 'sequences', 'executions')
+
+
+class StatsCounters:
+    """Contadores por dispositivo mantenidos a partir del flujo de eventos.
+    Se siembran una sola vez con COUNT agrupados y después solo se incrementan,
+    así /stats nunca transfiere filas del historial."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seed_lock = threading.Lock()
+        self._devices = {}
+        self._seeded = False
+        self.version = 0  # cambia con cada modificación (para no repetir pushes)
+
+    # ---------- Siembra ----------
+
+    def seed(self):
+        """Cargar los totales de la BD (requiere contexto de app)"""
+        # Import diferido: los modelos dependen de la configuración
+        from app.config.executor import fan_out
+        from app.models.car_model import CarModel
+        from app.models.sensor_model import SensorModel
+        from app.models.sequence_model import SequenceModel
+
+        with self._seed_lock:
+            if self._seeded:
+                return
+            results = fan_out({
+                'commands': (CarModel.count_commands_by_device, ()),
+                'obstacles': (SensorModel.count_obstacles_by_device, ()),
+                'sequences': (SequenceModel.count_sequences_by_device, ()),
+                'executions': (SequenceModel.count_executions_by_device, ())
+            })
+
+            devices = {}
+            def add(device_id, counter, total):
+                devices.setdefault(device_id, dict.fromkeys(COUNTERS, 0))[counter] += int(total)
+
+            for row in results['commands']:
+                add(row['id_dispositivo'], 'commands', row['total'])
+            for row in results['obstacles']:
+                counter = 'obstacles_manual' if row['tipo'] == 'manual' else 'obstacles_auto'
+                add(row['id_dispositivo'], counter, row['total'])
+            for row in results['sequences']:
+                add(row['id_dispositivo'], 'sequences', row['total'])
+            for row in results['executions']:
+                add(row['id_dispositivo'], 'executions', row['total'])
+
+            with self._lock:
+                self._devices = devices
+                self._seeded = True
+                self.version += 1
+
+    def ensure_seeded(self):
+        if not self._seeded:
+            self.seed()
+
+    # ---------- Actualización ----------
+
+    def _add(self, device_id, counter, delta):
+        counters = self._devices.setdefault(device_id, dict.fromkeys(COUNTERS, 0))
+        counters[counter] = max(counters[counter] + delta, 0)
+
+    def apply(self, event, device_id, payload):
+        """Actualizar los contadores con un evento publicado (ver websocket._deliver).
+        Antes de sembrar se ignoran: los COUNT ya los incluirán."""
+        kind = payload.get('type') if isinstance(payload, dict) else None
+        data = payload.get('data') if isinstance(payload, dict) else None
+        with self._lock:
+            if not self._seeded:
+                return
+            if kind in ('new_command', 'new_command_batch'):
+                self._add(device_id, 'commands', len(data) if kind == 'new_command_batch' else 1)
+            elif kind in ('new_obstacle', 'new_obstacle_batch', 'manual_obstacle_created'):
+                for obstacle in (data if kind == 'new_obstacle_batch' else [data]):
+                    counter = 'obstacles_manual' if obstacle.get('tipo') == 'manual' else 'obstacles_auto'
+                    self._add(device_id, counter, 1)
+            elif kind == 'manual_obstacle_deleted':
+                self._add(data.get('id_dispositivo', device_id), 'obstacles_manual', -1)
+            elif kind == 'sequence_created':
+                self._add(device_id, 'sequences', 1)
+            elif kind == 'sequence_deleted':
+                self._add(device_id, 'sequences', -1)
+            elif kind == 'execution_started':
+                self._add(device_id, 'executions', 1)
+            elif kind == 'device_deleted':
+                self._devices.pop(data['id_dispositivo'], None)
+            else:
+                return
+            self.version += 1
+
+    # ---------- Lectura ----------
+
+    @staticmethod
+    def _with_totals(counters):
+        result = dict(counters)
+        result['obstacles'] = counters['obstacles_auto'] + counters['obstacles_manual']
+        return result
+
+    def device(self, device_id):
+        self.ensure_seeded()
+        with self._lock:
+            counters = dict(self._devices.get(device_id) or dict.fromkeys(COUNTERS, 0))
+        return self._with_totals(counters)
+
+    def snapshot(self):
+        """Totales globales y por dispositivo"""
+        self.ensure_seeded()
+        with self._lock:
+            devices = {device_id: dict(counters) for device_id, counters in self._devices.items()}
+            version = self.version
+        totals = dict.fromkeys(COUNTERS, 0)
+        for counters in devices.values():
+            for counter in COUNTERS:
+                totals[counter] += counters[counter]
+        totals = self._with_totals(totals)
+        totals['devices'] = catalog_cache.device_count()
+        return {
+            'global': totals,
+            'devices': {device_id: self._with_totals(counters) for device_id, counters in devices.items()},
+            'version': version
+        }
+
+
+stats_counters = StatsCounters()
+
+# Intervalo del push periódico 'stats_update' (0 = desactivado)
+STATS_PUSH_INTERVAL = float(os.getenv('STATS_PUSH_INTERVAL', 0))
@@ -0,0 +1,69 @@
+import threading
+
+# Sala que recibe los eventos de todos los dispositivos (suscripción '*')
+FLEET = '*'
+
+
+class SubscriptionRegistry:
+    """Suscripciones Socket.IO con índice directo (dispositivo -> sids)
+    e inverso (sid -> dispositivos): todas las operaciones son O(1) por sala"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_device = {}
+        self._by_sid = {}
+
+    def subscribe(self, sid, device_id):
+        """Devolver el número de suscriptores del dispositivo tras suscribir"""
+        with self._lock:
+            sids = self._by_device.setdefault(device_id, set())
+            sids.add(sid)
+            self._by_sid.setdefault(sid, set()).add(device_id)
+            return len(sids)
+
+    def unsubscribe(self, sid, device_id):
+        """Devolver el número de suscriptores restantes, o None si no estaba suscrito"""
+        with self._lock:
+            sids = self._by_device.get(device_id)
+            if not sids or sid not in sids:
+                return None
+            sids.discard(sid)
+            devices = self._by_sid.get(sid)
+            if devices is not None:
+                devices.discard(device_id)
+                if not devices:
+                    del self._by_sid[sid]
+            remaining = len(sids)
+            if not remaining:
+                del self._by_device[device_id]
+            return remaining
+
+    def remove_client(self, sid):
+        """Quitar un cliente de todas sus salas; devuelve [(dispositivo, restantes)]"""
+        with self._lock:
+            devices = self._by_sid.pop(sid, set())
+            result = []
+            for device_id in devices:
+                sids = self._by_device.get(device_id)
+                if sids is None:
+                    continue
+                sids.discard(sid)
+                if not sids:
+                    del self._by_device[device_id]
+                result.append((device_id, len(sids)))
+            return result
+
+    def devices_of(self, sid):
+        with self._lock:
+            return set(self._by_sid.get(sid, ()))
+
+    def count(self, device_id):
+        with self._lock:
+            return len(self._by_device.get(device_id, ()))
+
+    def counts(self):
+        with self._lock:
+            return {device_id: len(sids) for device_id, sids in self._by_device.items()}
+
+
+subscriptions = SubscriptionRegistry()
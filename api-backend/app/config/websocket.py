@@ -1,12 +1,88 @@
 from flask_socketio import SocketIO, emit, join_room, leave_room
-from flask import request
+from socketio import packet
+from flask import request, current_app
+from datetime import datetime
+from dotenv import load_dotenv
+import os
+import threading
+from app.config.change_log import change_log
+from app.config.device_state import device_state
+from app.config.recent_events import recent_events
+from app.config.catalog_cache import catalog_cache
+from app.config.pubsub import create_pubsub
+from app.config.coalescing import coalescer
+from app.config.subscriptions import subscriptions, FLEET
+from app.config.send_queues import send_queues
+from app.config.stats_counters import stats_counters, STATS_PUSH_INTERVAL
+from app.config.monitoring_relay import monitoring_relay, STATUS_FIELDS
+from app.config.sequence_cache import sequence_cache
+from app.config.execution_index import execution_index
+from app.config.execution_engine import execution_engine
+from app.config import json_provider
 
-socketio = SocketIO(cors_allowed_origins="*", async_mode='threading')
+load_dotenv()
 
-connected_clients = {}
+# El modo de concurrencia se elige por configuración (ver run.py, que aplica el
+# monkey patching de eventlet/gevent antes de importar la app)
+socketio = SocketIO(
+    cors_allowed_origins="*",
+    async_mode=os.getenv('SOCKETIO_ASYNC_MODE', 'threading'),
+    ping_interval=float(os.getenv('SOCKETIO_PING_INTERVAL', 25)),
+    ping_timeout=float(os.getenv('SOCKETIO_PING_TIMEOUT', 20)),
+    max_http_buffer_size=int(os.getenv('SOCKETIO_MAX_BUFFER_SIZE', 1000000)),
+    json=json_provider
+)
+
+# Límite de clientes Socket.IO por proceso
+MAX_CONNECTIONS = int(os.getenv('SOCKETIO_MAX_CONNECTIONS', 10000))
+_connections_lock = threading.Lock()
+_active_connections = 0
+
+# Eventos recientes por dispositivo incluidos en el snapshot de subscribe_device
+SNAPSHOT_SIZE = int(os.getenv('DEVICE_SNAPSHOT_SIZE', 15))
+
+# Dispositivos cuyo historial se está cargando en segundo plano para los snapshots
+_warming_lock = threading.Lock()
+_warming = set()
+
+# Los suscriptores a '*' reciben los eventos de todos los dispositivos
+FLEET_ROOM = 'fleet'
+
+def device_room(device_id):
+    return FLEET_ROOM if device_id == FLEET else f'device_{device_id}'
+
+def _requested_devices(data):
+    """Normalizar device_id / device_ids del mensaje a una lista sin duplicados.
+    '*' suscribe a toda la flota."""
+    data = data or {}
+    raw = data.get('device_ids')
+    if raw is None:
+        raw = [data.get('device_id', 1)]
+    elif not isinstance(raw, list):
+        raw = [raw]
+    
+    devices = []
+    for value in raw:
+        if value == FLEET:
+            device_id = FLEET
+        else:
+            try:
+                device_id = int(value)
+            except (TypeError, ValueError):
+                continue
+        if device_id not in devices:
+            devices.append(device_id)
+    return devices
 
 @socketio.on('connect')
 def handle_connect():
+    global _active_connections
+    with _connections_lock:
+        if _active_connections >= MAX_CONNECTIONS:
+            print(f'Conexión rechazada (límite {MAX_CONNECTIONS}): {request.sid}')
+            return False
+        _active_connections += 1
+    
     print(f'Cliente conectado: {request.sid}')
     emit('connection_response', {
         'status': 'connected',
@@ -15,60 +91,361 @@ def handle_connect():
 
 @socketio.on('disconnect')
 def handle_disconnect():
+    global _active_connections
+    with _connections_lock:
+        _active_connections = max(_active_connections - 1, 0)
+    
     print(f'Cliente desconectado: {request.sid}')
-    for device_id in list(connected_clients.keys()):
-        if request.sid in connected_clients[device_id]:
-            connected_clients[device_id].remove(request.sid)
-            if not connected_clients[device_id]:
-                del connected_clients[device_id]
+    send_queues.remove(request.sid)
+    # Lo retenido por el límite de frecuencia se reenvía antes de olvidar al emisor
+    for device_id, status in monitoring_relay.remove_sender(request.sid):
+        _relay_status(device_id, status)
+    # Socket.IO ya saca al sid de sus salas; solo tocamos las suscripciones de este cliente
+    for device_id, remaining in subscriptions.remove_client(request.sid):
+        if device_id != FLEET:
+            device_state.set_subscribers(device_id, remaining)
 
 @socketio.on('subscribe_device')
 def handle_subscribe(data):
-    device_id = data.get('device_id', 1)
-    room = f'device_{device_id}'
-    join_room(room)
-    
-    if device_id not in connected_clients:
-        connected_clients[device_id] = []
-    if request.sid not in connected_clients[device_id]:
-        connected_clients[device_id].append(request.sid)
-    
-    print(f'Cliente {request.sid} suscrito a dispositivo {device_id}')
-    emit('subscription_response', {
-        'status': 'subscribed',
-        'device_id': device_id,
-        'message': f'Suscrito a actualizaciones del dispositivo {device_id}'
-    })
+    devices = _requested_devices(data)
+    for device_id in devices:
+        join_room(device_room(device_id))
+        count = subscriptions.subscribe(request.sid, device_id)
+        if device_id != FLEET:
+            device_state.set_subscribers(device_id, count)
+    
+    print(f'Cliente {request.sid} suscrito a dispositivos {devices}')
+    
+    # Snapshot opcional: el cliente queda hidratado sin llamadas REST
+    if (data or {}).get('snapshot'):
+        try:
+            emit('device_snapshot', {
+                'sync_token': change_log.current_token(),
+                'snapshots': [
+                    build_device_snapshot(device_id, (data or {}).get('snapshot_limit'))
+                    for device_id in devices if device_id != FLEET
+                ]
+            })
+        except Exception as e:
+            print(f'⚠️ Error al generar snapshot de {devices}: {e}')
+            emit('device_snapshot', {'status': 'error', 'message': f'Error al generar snapshot: {str(e)}'})
+    
+    if len(devices) == 1:
+        emit('subscription_response', {
+            'status': 'subscribed',
+            'device_id': devices[0],
+            'message': f'Suscrito a actualizaciones del dispositivo {devices[0]}'
+        })
+    else:
+        emit('subscription_response', {
+            'status': 'subscribed',
+            'device_ids': devices,
+            'message': f'Suscrito a actualizaciones de {len(devices)} dispositivos'
+        })
 
 @socketio.on('unsubscribe_device')
 def handle_unsubscribe(data):
-    device_id = data.get('device_id', 1)
-    room = f'device_{device_id}'
-    leave_room(room)
-    
-    if device_id in connected_clients and request.sid in connected_clients[device_id]:
-        connected_clients[device_id].remove(request.sid)
-        if not connected_clients[device_id]:
-            del connected_clients[device_id]
+    devices = _requested_devices(data)
+    for device_id in devices:
+        leave_room(device_room(device_id))
+        remaining = subscriptions.unsubscribe(request.sid, device_id)
+        if remaining is not None and device_id != FLEET:
+            device_state.set_subscribers(device_id, remaining)
     
-    print(f'Cliente {request.sid} desuscrito de dispositivo {device_id}')
+    print(f'Cliente {request.sid} desuscrito de dispositivos {devices}')
     emit('unsubscription_response', {
         'status': 'unsubscribed',
-        'device_id': device_id
+        'device_id': devices[0] if len(devices) == 1 else None,
+        'device_ids': devices
     })
 
+@socketio.on('monitoring_sync')
+def handle_monitoring_sync(data):
+    """Estado periódico de la app de control: se valida, se descartan repetidos,
+    las ráfagas se reducen a su último estado y se reenvía a la sala del
+    dispositivo con el estado vivo"""
+    try:
+        device_id, status = monitoring_relay.validate(data)
+    except ValueError as e:
+        monitoring_relay.reject()
+        return {'status': 'error', 'message': str(e)}
+    
+    # Solo dispositivos registrados: evita crear estado para ids arbitrarios
+    if not catalog_cache.device_exists(device_id):
+        monitoring_relay.reject()
+        return {'status': 'error', 'message': f'Dispositivo {device_id} no existe'}
+    
+    result, delay = monitoring_relay.accept(request.sid, device_id, status)
+    if delay is not None:
+        # Se reenvía el último estado retenido cuando venza el intervalo
+        socketio.start_background_task(_relay_trailing, request.sid, delay)
+    if result != 'relay':
+        return {'status': result}
+    
+    _relay_status(device_id, status)
+    return {'status': 'relayed'}
+
+def _relay_status(device_id, status):
+    """Publicar el estado de control completado con el último comando/obstáculo
+    conocidos por el servidor"""
+    state = device_state.get(device_id, allow_cold=True) or {}
+    timestamp = datetime.now()
+    message = {
+        'type': 'status_update',
+        'device_id': device_id,
+        'timestamp': timestamp,
+        'data': dict(
+            status,
+            current_device=device_id,
+            timestamp=timestamp,
+            last_command=state.get('last_command'),
+            last_obstacle=state.get('last_obstacle'),
+            current_status=state.get('current_status', 'offline')
+        )
+    }
+    pubsub.publish('monitoring_sync', device_id, message)
+
+def _relay_trailing(sid, delay):
+    socketio.sleep(delay)
+    try:
+        for device_id, status in monitoring_relay.take_trailing(sid):
+            _relay_status(device_id, status)
+    except Exception as e:
+        print(f'⚠️ Error al reenviar monitoring_sync retenido de {sid}: {e}')
+
+# ==================== PUB/SUB ENTRE WORKERS ====================
+# Los emit_* publican en el backend de pub/sub; cada worker recibe el evento
+# y lo entrega a sus propios suscriptores (y a su registro de cambios).
+pubsub = create_pubsub()
+
+# Eventos de escritura que otros workers deben aplicar a su estado en memoria
+_REMOTE_RECORDS = {
+    'new_command': 'command',
+    'new_command_batch': 'command',
+    'new_obstacle': 'obstacle',
+    'new_obstacle_batch': 'obstacle',
+    'manual_obstacle_created': 'obstacle'
+}
+
+def _parse_timestamp(value):
+    # Tras pasar por pub/sub las fechas llegan como texto ISO 8601
+    return value if isinstance(value, datetime) or value is None else datetime.fromisoformat(value)
+
+def _apply_remote_events(payload):
+    """Eventos guardados por otro worker: actualizar device_state y recent_events
+    locales (el worker de origen ya lo hizo al escribir en la BD)"""
+    kind = payload.get('type') if isinstance(payload, dict) else None
+    data = payload.get('data') if isinstance(payload, dict) else None
+    if kind == 'manual_obstacle_deleted':
+        recent_events.forget(data['id_dispositivo'])
+        return
+    record_kind = _REMOTE_RECORDS.get(kind)
+    if record_kind is None:
+        return
+    record = device_state.record_command if record_kind == 'command' else device_state.record_obstacle
+    for event in (data if kind.endswith('_batch') else [data]):
+        record(dict(event, fecha_hora=_parse_timestamp(event['fecha_hora'])))
+
+def _deliver(event, device_id, payload, local=True, position=None):
+    if event == 'execution_control':
+        # Orden interna entre workers: solo la aplica el que tiene la ejecución,
+        # que notifica el resultado a la sala del dispositivo
+        execution_engine.apply_control(payload['id_ejecucion'], payload['action'])
+        return
+    
+    # position: (epoch, secuencia) del contador compartido de redis, o None
+    if position is not None and change_log.is_gap(*position):
+        # Se perdieron eventos de pub/sub (arranque o reconexión a redis): las
+        # escrituras de otros workers pueden faltar en las cachés de este
+        device_state.invalidate_all()
+    change_log.record(event, device_id, payload, *(position or ()))
+    stats_counters.apply(event, device_id, payload)
+    
+    if not local and event in ('command_update', 'obstacle_update'):
+        _apply_remote_events(payload)
+    
+    if event == 'sequence_update':
+        # Las escrituras de otros workers también invalidan la caché local
+        sequence_cache.invalidate((payload.get('data') or {}).get('id_secuencia'))
+        if payload.get('type') == 'sequence_deleted':
+            execution_index.forget_sequence(payload['data']['id_secuencia'])
+    
+    if event == 'monitoring_sync':
+        # Cada worker guarda el estado de control en su registro
+        device_state.record_control(
+            device_id,
+            {field: payload['data'][field] for field in STATUS_FIELDS},
+            payload['timestamp']
+        )
+    
+    if event == 'device_update':
+        # Mantener coherentes las cachés locales de cada worker
+        catalog_cache.invalidate('dispositivos')
+        # Las secuencias cacheadas incluyen nombre_dispositivo
+        sequence_cache.invalidate()
+        if payload.get('type') == 'device_deleted':
+            device_state.forget(payload['data']['id_dispositivo'])
+            execution_index.forget_device(payload['data']['id_dispositivo'])
+        return
+    
+    room = device_room(device_id)
+    if coalescer.enabled:
+        coalescer.add(room, event, payload)
+    else:
+        _emit_to_room(event, payload, room)
+
+def _emit_to_room(event, payload, room):
+    if send_queues.enabled:
+        participants = list(socketio.server.manager.get_participants('/', [room, FLEET_ROOM]))
+        if not participants:
+            return
+        # Se codifica una sola vez y cada cliente recibe el mismo paquete por su cola acotada
+        encoded = socketio.server.packet_class(packet.EVENT, namespace='/', data=[event, payload]).encode()
+        for sid, eio_sid in participants:
+            send_queues.send(sid, eio_sid, event, encoded, key=room)
+        return
+    # Lista de salas: Socket.IO entrega una sola vez a quien esté en ambas
+    socketio.emit(event, payload, room=[room, FLEET_ROOM])
+
+def _send_encoded(eio_sid, encoded):
+    """Escribir en Engine.IO un paquete Socket.IO ya codificado"""
+    for part in encoded if isinstance(encoded, list) else [encoded]:
+        socketio.server.eio.send(eio_sid, part)
+
+def _transport_backlog(eio_sid):
+    """Paquetes que Engine.IO tiene aún pendientes de escribir para un cliente"""
+    socket = socketio.server.eio.sockets.get(eio_sid)
+    return socket.queue.qsize() if socket is not None else 0
+
+def _disconnect_client(sid):
+    socketio.server.disconnect(sid, namespace='/')
+
+def init_websocket(app):
+    """Arrancar las tareas de fondo (pub/sub, agrupación de eventos y colas de salida)"""
+    pubsub.start(_deliver, socketio.start_background_task)
+    coalescer.start(_emit_to_room, socketio.start_background_task, socketio.sleep)
+    send_queues.start(_send_encoded, _transport_backlog, _disconnect_client,
+                      socketio.start_background_task, socketio.sleep)
+    if STATS_PUSH_INTERVAL > 0:
+        socketio.start_background_task(_push_stats, app)
+
+def _push_stats(app):
+    """Emitir 'stats_update' periódicamente, solo si los contadores cambiaron:
+    cada sala de dispositivo recibe los suyos y la flota todos"""
+    last_version = None
+    while True:
+        socketio.sleep(STATS_PUSH_INTERVAL)
+        try:
+            if stats_counters.version == last_version:
+                continue
+            # Contexto de app: la siembra y el catálogo pueden necesitar la BD
+            with app.app_context():
+                stats = stats_counters.snapshot()
+            last_version = stats['version']
+            for device_id in subscriptions.counts():
+                if device_id == FLEET:
+                    continue
+                socketio.emit('stats_update', {
+                    'device_id': device_id,
+                    'device': stats['devices'].get(device_id) or stats_counters.device(device_id),
+                    'global': stats['global']
+                }, room=device_room(device_id))
+            if subscriptions.count(FLEET):
+                socketio.emit('stats_update', stats, room=FLEET_ROOM)
+        except Exception as e:
+            print(f'⚠️ Error al emitir estadísticas: {e}')
+
 def emit_command_update(device_id, command_data):
-    room = f'device_{device_id}'
-    socketio.emit('command_update', command_data, room=room)
+    pubsub.publish('command_update', device_id, command_data)
 
 def emit_obstacle_update(device_id, obstacle_data):
-    room = f'device_{device_id}'
-    socketio.emit('obstacle_update', obstacle_data, room=room)
+    pubsub.publish('obstacle_update', device_id, obstacle_data)
 
 def emit_sequence_update(device_id, sequence_data):
-    room = f'device_{device_id}'
-    socketio.emit('sequence_update', sequence_data, room=room)
+    pubsub.publish('sequence_update', device_id, sequence_data)
 
 def emit_execution_update(device_id, execution_data):
-    room = f'device_{device_id}'
-    socketio.emit('execution_update', execution_data, room=room)
+    pubsub.publish('execution_update', device_id, execution_data)
+
+def publish_device_update(device_data):
+    """Cambios en dispositivos: sin sala, solo registro y cachés de cada worker"""
+    pubsub.publish('device_update', None, device_data)
+
+def publish_execution_control(id_ejecucion, action):
+    """Reenviar pause/resume/cancel al worker que ejecuta la secuencia"""
+    pubsub.publish('execution_control', None, {'id_ejecucion': id_ejecucion, 'action': action}, sequenced=False)
+
+def is_multi_worker():
+    return pubsub.name != 'memory'
+
+def build_device_snapshot(device_id, limit=None):
+    """Últimos comandos y obstáculos, estado y contadores de un dispositivo,
+    servidos de memoria (recent_events y device_state) sin consultar la BD.
+    Si el historial del dispositivo aún no está en caché se marca cold=True:
+    el cliente lo pide por REST y aquí se carga en segundo plano."""
+    try:
+        limit = max(min(int(limit), SNAPSHOT_SIZE), 1) if limit is not None else SNAPSHOT_SIZE
+    except (TypeError, ValueError):
+        limit = SNAPSHOT_SIZE
+    
+    commands = recent_events.get('command', device_id, limit)
+    obstacles = recent_events.get('obstacle', device_id, limit)
+    cold = commands is None or obstacles is None
+    if cold and recent_events.enabled:
+        with _warming_lock:
+            start = device_id not in _warming
+            _warming.add(device_id)
+        if start:
+            socketio.start_background_task(_warm_device, current_app._get_current_object(), device_id)
+    
+    counters = stats_counters.device(device_id)
+    
+    state = device_state.get(device_id, allow_cold=True) or {}
+    return {
+        'device_id': device_id,
+        'cold': cold,
+        'commands': commands or [],
+        'obstacles': obstacles or [],
+        'current_status': state.get('current_status', 'offline'),
+        'last_seen': state.get('last_seen'),
+        'counters': {
+            'total_commands': counters['commands'],
+            'total_obstacles': counters['obstacles'],
+            'subscribers': state.get('subscribers', 0),
+            'active_devices': catalog_cache.device_count()
+        }
+    }
+
+def _warm_device(app, device_id):
+    """Cargar de la BD el historial reciente y el estado de un dispositivo frío"""
+    # Import diferido: los modelos dependen de la configuración
+    from app.models.car_model import CarModel
+    from app.models.sensor_model import SensorModel
+    
+    try:
+        with app.app_context():
+            commands = CarModel.get_recent_commands(device_id, recent_events.capacity)
+            obstacles = SensorModel.get_recent_obstacles(device_id, recent_events.capacity)
+            if device_state.get(device_id) is None:
+                device_state.warm(device_id, commands[0] if commands else None, obstacles[0] if obstacles else None)
+    except Exception as e:
+        print(f'⚠️ No se pudo cargar el historial del dispositivo {device_id}: {e}')
+    finally:
+        with _warming_lock:
+            _warming.discard(device_id)
+
+def get_subscriber_count(device_id):
+    """Suscriptores en vivo de un dispositivo en este worker (sin contar la flota)"""
+    return subscriptions.count(device_id)
+
+def get_connection_stats():
+    return {
+        'async_mode': socketio.async_mode,
+        'active_connections': _active_connections,
+        'max_connections': MAX_CONNECTIONS,
+        'fleet_subscribers': subscriptions.count(FLEET),
+        'pubsub': pubsub.stats(),
+        'coalescing': coalescer.stats(),
+        'send_queues': send_queues.stats(),
+        'monitoring_sync': monitoring_relay.stats()
+    }
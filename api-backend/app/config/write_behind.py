@@ -0,0 +1,346 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class WriteBehindFullError(Exception):
+    """La cola de escritura diferida está llena"""
+    pass
+
+
+class WriteBehindUnavailableError(Exception):
+    """El hilo escritor no está en marcha: hay que guardar de forma síncrona"""
+    pass
+
+
+_STOP = object()
+
+# Errores de MySQL que indican BD caída o saturada (no un problema de la fila):
+# conexión rechazada/perdida, demasiadas conexiones, servidor apagándose,
+# conexión terminada, espera de lock agotada o deadlock
+_TRANSIENT_ERROR_CODES = {1040, 1053, 1205, 1213, 1927, 2002, 2003, 2006, 2013, 2055}
+
+
+def _is_transient(error):
+    """Los errores transitorios se reintentan; el resto se atribuye a la fila"""
+    import pymysql
+    from app.config.database import PoolTimeoutError
+
+    if isinstance(error, (PoolTimeoutError, pymysql.err.InterfaceError, OSError)):
+        return True
+    if isinstance(error, pymysql.err.OperationalError):
+        return bool(error.args) and error.args[0] in _TRANSIENT_ERROR_CODES
+    return False
+
+
+class WriteBehindQueue:
+    """Cola acotada de escritura diferida con group-commit para las tablas de historial.
+    Un hilo escritor agrupa los eventos por tamaño o por tiempo y los guarda en una
+    sola transacción; después emite los pushes con las filas ya insertadas.
+    Si la BD no está disponible, el lote se reintenta con espera exponencial
+    hasta que vuelve: mientras tanto la cola se llena y los productores reciben
+    503, pero ningún evento ya aceptado se pierde."""
+
+    def __init__(self, enabled=False, max_queue=10000, batch_size=500, flush_interval=0.02,
+                 full_policy='reject', block_timeout=1.0, retry_initial=0.1, retry_max=5.0):
+        self.enabled = enabled
+        self.batch_size = max(batch_size, 1)
+        self.flush_interval = flush_interval
+        self.full_policy = full_policy
+        self.block_timeout = block_timeout
+        self.retry_initial = retry_initial
+        self.retry_max = max(retry_max, retry_initial)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._app = None
+        self._thread = None
+        self._stopping = threading.Event()
+        self._stats_lock = threading.Lock()
+
+        # Estadísticas
+        self._enqueued = 0
+        self._rejected = 0
+        self._flushes = 0
+        self._rows_written = 0
+        self._failed_rows = 0
+        self._split_retries = 0
+        self._retries = 0
+        self._retrying_rows = 0
+        self._writer_errors = 0
+        self._max_depth = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+        self._max_delay_ms = 0.0
+
+    # ---------- Ciclo de vida ----------
+
+    def start(self, app):
+        if not self.enabled or self._thread is not None:
+            return
+        self._app = app
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout=10.0):
+        """Vaciar la cola y detener el hilo escritor"""
+        if self._thread is None:
+            return
+        # El hilo escritor consulta la bandera; el centinela solo lo despierta
+        # antes (si la cola está llena no se espera a que haya hueco)
+        self._stopping.set()
+        try:
+            self._queue.put_nowait(_STOP)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self._thread = None
+
+    # ---------- Productores ----------
+
+    def _put(self, item):
+        if not self.enabled or self._thread is None or not self._thread.is_alive():
+            raise WriteBehindUnavailableError('La escritura diferida no está activa')
+        try:
+            if self.full_policy == 'block':
+                self._queue.put(item, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(item)
+        except queue.Full:
+            with self._stats_lock:
+                self._rejected += 1
+            raise WriteBehindFullError('Cola de escritura llena, reintente más tarde')
+
+        with self._stats_lock:
+            self._enqueued += 1
+            depth = self._queue.qsize()
+            if depth > self._max_depth:
+                self._max_depth = depth
+
+    def submit_command(self, id_dispositivo, status_operacion, fecha_hora):
+        self._put(('command', (id_dispositivo, status_operacion, fecha_hora), time.monotonic()))
+
+    def submit_obstacle(self, id_dispositivo, status_obstaculo, ubicacion, descripcion, tipo, fecha_hora):
+        self._put(('obstacle', (id_dispositivo, status_obstaculo, ubicacion, descripcion, tipo, fecha_hora), time.monotonic()))
+
+    # ---------- Hilo escritor ----------
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                # Espera acotada para notar la bandera de parada aunque no llegue el centinela
+                item = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+
+            # Acumular hasta batch_size filas o hasta que venza la ventana
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self._stopping.set()
+                    break
+                batch.append(item)
+
+            self._flush(batch)
+
+        # Drenar lo que quede en la cola antes de salir
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                continue
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        if batch:
+            self._flush(batch)
+
+    def _insert(self, db, batch):
+        """Guardar un lote en una sola transacción; relanza el error si falla"""
+        from app.models.car_model import CarModel
+        from app.models.sensor_model import SensorModel
+
+        commands = [row for kind, row, _ in batch if kind == 'command']
+        obstacles = [row for kind, row, _ in batch if kind == 'obstacle']
+        try:
+            with db.cursor() as cursor:
+                db.begin()
+                command_events = CarModel.insert_commands(cursor, commands) if commands else []
+                obstacle_events = SensorModel.insert_obstacles(cursor, obstacles) if obstacles else []
+                db.commit()
+            return command_events, obstacle_events
+        except Exception:
+            db.rollback()
+            raise
+
+    def _write(self, db, batch):
+        """Insertar el lote; si una fila es inválida se parte en mitades para
+        aislarla sin descartar el resto. Devuelve (comandos, obstáculos, pendientes):
+        pendientes son las filas sin escribir por un error transitorio"""
+        try:
+            command_events, obstacle_events = self._insert(db, batch)
+            return command_events, obstacle_events, []
+        except Exception as e:
+            if _is_transient(e):
+                print(f'⚠️ BD no disponible para la escritura diferida ({len(batch)} filas en espera): {e}')
+                return [], [], batch
+            if len(batch) == 1:
+                with self._stats_lock:
+                    self._failed_rows += 1
+                print(f'❌ Error en escritura diferida (1 fila descartada): {e}')
+                return [], [], []
+            with self._stats_lock:
+                self._split_retries += 1
+        middle = len(batch) // 2
+        first_commands, first_obstacles, pending = self._write(db, batch[:middle])
+        if pending:
+            # La BD cayó a mitad: la segunda mitad ni se intenta
+            return first_commands, first_obstacles, pending + batch[middle:]
+        second_commands, second_obstacles, pending = self._write(db, batch[middle:])
+        return first_commands + second_commands, first_obstacles + second_obstacles, pending
+
+    def _flush(self, batch):
+        """Escribir el lote reintentando mientras la BD no esté disponible.
+        Nunca lanza: un error aquí no debe terminar el hilo escritor"""
+        delay = self.retry_initial
+        while batch:
+            try:
+                with self._app.app_context():
+                    batch = self._flush_batch(batch)
+            except Exception as e:
+                # Error tras confirmar el INSERT (p. ej. al emitir): reintentar duplicaría filas
+                with self._stats_lock:
+                    self._writer_errors += 1
+                print(f'❌ Error en el hilo de escritura diferida: {e}')
+                batch = []
+
+            with self._stats_lock:
+                self._retrying_rows = len(batch)
+            if not batch:
+                break
+            if self._stopping.is_set():
+                # Apagado con la BD caída: no hay dónde conservar las filas
+                with self._stats_lock:
+                    self._failed_rows += len(batch)
+                    self._retrying_rows = 0
+                print(f'❌ Escritura diferida detenida sin BD ({len(batch)} filas descartadas)')
+                break
+
+            with self._stats_lock:
+                self._retries += 1
+            # Sin consumir la cola mientras tanto: sigue acotada y los productores reciben 503
+            self._stopping.wait(delay)
+            delay = min(delay * 2, self.retry_max)
+
+    def _flush_batch(self, batch):
+        """Escribir y notificar un lote; devuelve las filas que hay que reintentar"""
+        # Import diferido: los modelos dependen de la configuración
+        from app.config.database import get_db_connection, discard_db_connection
+        from app.config.websocket import emit_command_update, emit_obstacle_update
+        from app.config.device_state import device_state
+
+        oldest = min(enqueued_at for _, _, enqueued_at in batch)
+        started = time.monotonic()
+
+        try:
+            db = get_db_connection()
+        except Exception as e:
+            if not _is_transient(e):
+                raise
+            print(f'⚠️ Sin conexión para la escritura diferida ({len(batch)} filas en espera): {e}')
+            return batch
+
+        command_events, obstacle_events, pending = self._write(db, batch)
+        written = len(command_events) + len(obstacle_events)
+        if pending:
+            # La conexión quedó en estado dudoso: no vuelve al pool
+            discard_db_connection()
+
+        finished = time.monotonic()
+        with self._stats_lock:
+            self._flushes += 1
+            self._rows_written += written
+            self._last_flush_ms = (finished - started) * 1000
+            self._total_flush_ms += self._last_flush_ms
+            self._max_flush_ms = max(self._max_flush_ms, self._last_flush_ms)
+            self._max_delay_ms = max(self._max_delay_ms, (finished - oldest) * 1000)
+
+        device_state.record_commands(command_events)
+        device_state.record_obstacles(obstacle_events)
+
+        # Pushes con las filas ya confirmadas: uno por evento o un lote por dispositivo
+        for events, emit_fn, single_type, batch_type in (
+            (command_events, emit_command_update, 'new_command', 'new_command_batch'),
+            (obstacle_events, emit_obstacle_update, 'new_obstacle', 'new_obstacle_batch')
+        ):
+            grouped = {}
+            for event in events:
+                grouped.setdefault(event['id_dispositivo'], []).append(event)
+            for id_dispositivo, device_events in grouped.items():
+                if len(device_events) == 1:
+                    emit_fn(id_dispositivo, {'type': single_type, 'data': device_events[0]})
+                else:
+                    emit_fn(id_dispositivo, {
+                        'type': batch_type,
+                        'data': device_events
+                    })
+
+        return pending
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'enabled': self.enabled,
+                'running': self._thread is not None and self._thread.is_alive(),
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self._max_depth,
+                'capacity': self._queue.maxsize,
+                'full_policy': self.full_policy,
+                'enqueued': self._enqueued,
+                'rejected': self._rejected,
+                'flushes': self._flushes,
+                'rows_written': self._rows_written,
+                'failed_rows': self._failed_rows,
+                'split_retries': self._split_retries,
+                'retries': self._retries,
+                'retrying_rows': self._retrying_rows,
+                'writer_errors': self._writer_errors,
+                'last_flush_ms': round(self._last_flush_ms, 3),
+                'avg_flush_ms': round(self._total_flush_ms / self._flushes, 3) if self._flushes else 0.0,
+                'max_flush_ms': round(self._max_flush_ms, 3),
+                'max_enqueue_to_commit_ms': round(self._max_delay_ms, 3)
+            }
+
+
+write_behind = WriteBehindQueue(
+    enabled=os.getenv('WRITE_BEHIND_ENABLED', 'false').lower() == 'true',
+    max_queue=int(os.getenv('WRITE_BEHIND_MAX_QUEUE', 10000)),
+    batch_size=int(os.getenv('WRITE_BEHIND_BATCH_SIZE', 500)),
+    flush_interval=float(os.getenv('WRITE_BEHIND_FLUSH_MS', 20)) / 1000,
+    full_policy=os.getenv('WRITE_BEHIND_FULL_POLICY', 'reject'),
+    block_timeout=float(os.getenv('WRITE_BEHIND_BLOCK_TIMEOUT', 1)),
+    retry_max=float(os.getenv('WRITE_BEHIND_RETRY_MAX_MS', 5000)) / 1000
+)
+
+def init_write_behind(app):
+    write_behind.start(app)
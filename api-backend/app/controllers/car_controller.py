@@ -1,5 +1,18 @@
 from flask import jsonify, request, make_response
+from datetime import datetime
 from app.models.car_model import CarModel
+from app.config.catalog_cache import catalog_cache
+from app.config.websocket import emit_command_update, publish_device_update
+from app.config.write_behind import write_behind, WriteBehindFullError, WriteBehindUnavailableError
+from app.config.device_state import device_state
+from app.controllers.helpers import (
+    BATCH_MAX_ITEMS,
+    parse_event_timestamp,
+    extract_batch_items,
+    group_events_by_device,
+    parse_page_args,
+    page_cursors
+)
 
 class CarController:
     @staticmethod
@@ -13,25 +26,42 @@ class CarController:
                     'message': 'status_operacion es requerido'
                 }), 400)
             
-            id_dispositivo = data.get('id_dispositivo', 1)
-            status_operacion = data.get('status_operacion')
+            try:
+                id_dispositivo = int(data.get('id_dispositivo', 1))
+            except (TypeError, ValueError):
+                return make_response(jsonify({
+                    'status': 'error',
+                    'message': 'id_dispositivo inválido'
+                }), 400)
             
-            operations = CarModel.get_operations_catalog()
-            valid_ops = [op['status_operacion'] for op in operations]
+            status_operacion = data.get('status_operacion')
             
-            if status_operacion not in valid_ops:
+            if not catalog_cache.is_valid_operation(status_operacion):
+                valid_ops = sorted(catalog_cache.operation_codes())
                 return make_response(jsonify({
                     'status': 'error',
                     'message': f'Operación inválida. Operaciones válidas: {valid_ops}'
                 }), 400)
             
-            id_evento = CarModel.save_command(id_dispositivo, status_operacion)
+            if write_behind.enabled:
+                response = CarController._enqueue_command(id_dispositivo, status_operacion)
+                if response is not None:
+                    return response
+                # Hilo escritor detenido: se guarda de forma síncrona
+            
+            command = CarModel.save_command(id_dispositivo, status_operacion)
+            
+            # Notificar a los clientes suscritos con la fila recién insertada
+            emit_command_update(id_dispositivo, {
+                'type': 'new_command',
+                'data': command
+            })
             
             return make_response(jsonify({
                 'status': 'success',
                 'message': 'Comando enviado correctamente',
                 'data': {
-                    'id_evento': id_evento,
+                    'id_evento': command['id_evento'],
                     'id_dispositivo': id_dispositivo,
                     'status_operacion': status_operacion
                 }
@@ -43,17 +73,151 @@ class CarController:
                 'message': f'Error al enviar comando: {str(e)}'
             }), 500)
 
+    @staticmethod
+    def _enqueue_command(id_dispositivo, status_operacion):
+        """Modo escritura diferida: encolar y responder sin esperar al INSERT.
+        Devuelve None si el hilo escritor no está activo."""
+        # Una FK inválida haría fallar el lote completo: validamos antes de encolar
+        if not catalog_cache.device_exists(id_dispositivo):
+            return make_response(jsonify({
+                'status': 'error',
+                'message': f'Dispositivo {id_dispositivo} no existe'
+            }), 400)
+        
+        try:
+            write_behind.submit_command(id_dispositivo, status_operacion, datetime.now())
+        except WriteBehindFullError as e:
+            return make_response(jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 503)
+        except WriteBehindUnavailableError:
+            return None
+        
+        # El push se emite desde el escritor cuando la fila queda confirmada
+        return make_response(jsonify({
+            'status': 'success',
+            'message': 'Comando encolado correctamente',
+            'data': {
+                'id_evento': None,
+                'id_dispositivo': id_dispositivo,
+                'status_operacion': status_operacion
+            }
+        }), 202)
+
+    @staticmethod
+    def send_commands_batch():
+        try:
+            items = extract_batch_items(request.get_json(silent=True), 'commands')
+            body, status_code = CarController.ingest_commands(items)
+            return make_response(jsonify(body), status_code)
+            
+        except Exception as e:
+            return make_response(jsonify({
+                'status': 'error',
+                'message': f'Error al enviar comandos: {str(e)}'
+            }), 500)
+
+    @staticmethod
+    def ingest_commands(items):
+        """Validar y guardar una lista de comandos (HTTP batch o Socket.IO).
+        Devuelve (cuerpo, código HTTP) con el resultado de cada elemento."""
+        if not items:
+            return {
+                'status': 'error',
+                'message': 'Se requiere una lista de comandos'
+            }, 400
+        
+        if len(items) > BATCH_MAX_ITEMS:
+            return {
+                'status': 'error',
+                'message': f'Máximo {BATCH_MAX_ITEMS} comandos por petición'
+            }, 413
+        
+        # Validar todos los elementos en una sola pasada
+        results = [None] * len(items)
+        pending = []  # (indice, id_dispositivo, status_operacion, fecha_hora)
+        for index, item in enumerate(items):
+            if not isinstance(item, dict) or 'status_operacion' not in item:
+                results[index] = {'index': index, 'status': 'error', 'message': 'status_operacion es requerido'}
+                continue
+            
+            status_operacion = item.get('status_operacion')
+            if not catalog_cache.is_valid_operation(status_operacion):
+                results[index] = {'index': index, 'status': 'error', 'message': f'Operación inválida: {status_operacion}'}
+                continue
+            
+            try:
+                id_dispositivo = int(item.get('id_dispositivo', 1))
+                fecha_hora = parse_event_timestamp(item.get('timestamp'))
+            except (TypeError, ValueError, OverflowError, OSError):
+                results[index] = {'index': index, 'status': 'error', 'message': 'id_dispositivo o timestamp inválido'}
+                continue
+            
+            pending.append((index, id_dispositivo, status_operacion, fecha_hora))
+        
+        # Verificar los dispositivos contra la caché de catálogos
+        valid = []
+        for index, id_dispositivo, status_operacion, fecha_hora in pending:
+            if not catalog_cache.device_exists(id_dispositivo):
+                results[index] = {'index': index, 'status': 'error', 'message': f'Dispositivo {id_dispositivo} no existe'}
+            else:
+                valid.append((index, id_dispositivo, status_operacion, fecha_hora))
+        
+        commands = CarModel.save_commands_batch([v[1:] for v in valid])
+        
+        for (index, *_), command in zip(valid, commands):
+            results[index] = {'index': index, 'status': 'success', 'data': command}
+        
+        # Un único push por sala de dispositivo (evento simple si solo hay uno)
+        for id_dispositivo, device_commands in group_events_by_device(commands).items():
+            if len(device_commands) == 1:
+                emit_command_update(id_dispositivo, {'type': 'new_command', 'data': device_commands[0]})
+            else:
+                emit_command_update(id_dispositivo, {
+                    'type': 'new_command_batch',
+                    'data': device_commands
+                })
+        
+        inserted = len(commands)
+        failed = len(items) - inserted
+        if failed == 0:
+            status_code = 201
+        elif inserted > 0:
+            status_code = 207
+        else:
+            status_code = 400
+        
+        return {
+            'status': 'success' if inserted else 'error',
+            'message': f'{inserted} comandos registrados, {failed} rechazados',
+            'data': {
+                'total': len(items),
+                'inserted': inserted,
+                'failed': failed,
+                'results': results
+            }
+        }, status_code
+
     @staticmethod
     def get_recent_commands():
         try:
             id_dispositivo = request.args.get('device_id', 1, type=int)
-            limit = request.args.get('limit', 10, type=int)
             
-            commands = CarModel.get_recent_commands(id_dispositivo, limit)
+            try:
+                limit, before, after = parse_page_args()
+            except ValueError as e:
+                return make_response(jsonify({
+                    'status': 'error',
+                    'message': str(e)
+                }), 400)
+            
+            commands = CarModel.get_recent_commands(id_dispositivo, limit, before, after)
             
             return make_response(jsonify({
                 'status': 'success',
-                'data': commands
+                'data': commands,
+                'pagination': page_cursors(commands, limit, after)
             }), 200)
             
         except Exception as e:
@@ -65,7 +229,7 @@ class CarController:
     @staticmethod
     def get_operations_catalog():
         try:
-            operations = CarModel.get_operations_catalog()
+            operations = catalog_cache.get_operations()
             return make_response(jsonify({
                 'status': 'success',
                 'data': operations
@@ -112,6 +276,11 @@ class CarController:
                 nombre_dispositivo, 
                 descripcion
             )
+            catalog_cache.invalidate('dispositivos')
+            publish_device_update({
+                'type': 'device_created',
+                'data': {'id_dispositivo': device_id, 'nombre_dispositivo': nombre_dispositivo}
+            })
             
             return make_response(jsonify({
                 'status': 'success',
@@ -147,8 +316,16 @@ class CarController:
                 nombre_dispositivo, 
                 descripcion
             )
+            catalog_cache.invalidate('dispositivos')
             
             if success:
+                publish_device_update({
+                    'type': 'device_updated',
+                    'data': {
+                        'id_dispositivo': device_id,
+                        'nombre_dispositivo': catalog_cache.device_name(device_id)
+                    }
+                })
                 return make_response(jsonify({
                     'status': 'success',
                     'message': 'Dispositivo actualizado correctamente'
@@ -169,8 +346,14 @@ class CarController:
     def delete_device(device_id):
         try:
             success = CarModel.delete_device(device_id)
+            catalog_cache.invalidate('dispositivos')
             
             if success:
+                device_state.forget(device_id)
+                publish_device_update({
+                    'type': 'device_deleted',
+                    'data': {'id_dispositivo': device_id}
+                })
                 return make_response(jsonify({
                     'status': 'success',
                     'message': 'Dispositivo eliminado correctamente'
@@ -0,0 +1,86 @@
+import hmac
+import os
+from datetime import datetime
+from flask import request
+from dotenv import load_dotenv
+from app.models.pagination import encode_cursor, decode_cursor
+
+load_dotenv()
+
+# Máximo de eventos aceptados en una sola petición batch
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 500))
+
+# Tamaño máximo de página en los historiales
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 500))
+
+# Token de los endpoints de administración (vacío = solo desde la propia máquina)
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+
+def is_admin_request():
+    """Comprobar la cabecera X-Admin-Token; sin ADMIN_TOKEN configurado solo
+    se aceptan peticiones locales (127.0.0.1 / ::1)"""
+    if ADMIN_TOKEN:
+        token = request.headers.get('X-Admin-Token', '')
+        return hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8'))
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+def parse_event_timestamp(value):
+    """Convertir el timestamp enviado por el dispositivo a datetime.
+    Acepta ISO 8601, 'YYYY-mm-dd HH:MM:SS' o epoch en segundos/milisegundos.
+    Si no se envía, se usa la hora actual del servidor."""
+    if value is None or value == '':
+        return datetime.now()
+    if isinstance(value, bool):
+        raise ValueError('timestamp inválido')
+    if isinstance(value, (int, float)):
+        # Los dispositivos suelen enviar milisegundos
+        seconds = value / 1000 if value > 1e11 else value
+        return datetime.fromtimestamp(seconds)
+    if isinstance(value, str):
+        parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+        if parsed.tzinfo is not None:
+            # La BD guarda hora local sin zona
+            parsed = parsed.astimezone().replace(tzinfo=None)
+        return parsed
+    raise ValueError('timestamp inválido')
+
+def extract_batch_items(data, key):
+    """Aceptar tanto una lista directa como {key: [...]}"""
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict) and isinstance(data.get(key), list):
+        return data[key]
+    return None
+
+def group_events_by_device(events):
+    """Agrupar eventos por id_dispositivo conservando el orden de llegada"""
+    grouped = {}
+    for event in events:
+        grouped.setdefault(event['id_dispositivo'], []).append(event)
+    return grouped
+
+def parse_page_args(default_limit=10):
+    """Leer limit y los cursores before/after de la query string.
+    Lanza ValueError si un cursor no es válido."""
+    limit = request.args.get('limit', default_limit, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    before = request.args.get('before')
+    after = request.args.get('after')
+    if before and after:
+        raise ValueError('Use before o after, no ambos')
+    return (
+        limit,
+        decode_cursor(before) if before else None,
+        decode_cursor(after) if after else None
+    )
+
+def page_cursors(rows, limit, after=None):
+    """Cursores de la respuesta: next_cursor pide filas más antiguas (?before=)
+    y prev_cursor filas más recientes (?after=), útil para sondear novedades"""
+    if after is not None:
+        # Al avanzar hacia lo reciente siempre quedan filas más antiguas
+        next_cursor = encode_cursor(rows[-1]) if rows else None
+    else:
+        next_cursor = encode_cursor(rows[-1]) if len(rows) >= limit else None
+    prev_cursor = encode_cursor(rows[0]) if rows else request.args.get('after')
+    return {'next_cursor': next_cursor, 'prev_cursor': prev_cursor}
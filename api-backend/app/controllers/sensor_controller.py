@@ -1,6 +1,20 @@
 from flask import jsonify, request, make_response
+from datetime import datetime
 from app.models.sensor_model import SensorModel
+from app.config.catalog_cache import catalog_cache
 from app.config.websocket import emit_obstacle_update
+from app.config.write_behind import write_behind, WriteBehindFullError, WriteBehindUnavailableError
+from app.controllers.helpers import (
+    BATCH_MAX_ITEMS,
+    parse_event_timestamp,
+    extract_batch_items,
+    group_events_by_device,
+    parse_page_args,
+    page_cursors
+)
+
+UBICACIONES_VALIDAS = ['frente', 'atras', 'izquierda', 'derecha', 'retroceso']
+TIPOS_VALIDOS = ['automatico', 'manual']
 
 class SensorController:
     @staticmethod
@@ -14,25 +28,42 @@ class SensorController:
                     'message': 'status_obstaculo es requerido'
                 }), 400)
             
-            id_dispositivo = data.get('id_dispositivo', 1)
-            status_obstaculo = data.get('status_obstaculo')
+            try:
+                id_dispositivo = int(data.get('id_dispositivo', 1))
+            except (TypeError, ValueError):
+                return make_response(jsonify({
+                    'status': 'error',
+                    'message': 'id_dispositivo inválido'
+                }), 400)
             
-            obstacles = SensorModel.get_obstacles_catalog()
-            valid_obs = [obs['status_obstaculo'] for obs in obstacles]
+            status_obstaculo = data.get('status_obstaculo')
             
-            if status_obstaculo not in valid_obs:
+            if not catalog_cache.is_valid_obstacle(status_obstaculo):
+                valid_obs = sorted(catalog_cache.obstacle_codes())
                 return make_response(jsonify({
                     'status': 'error',
                     'message': f'Obstáculo inválido. Obstáculos válidos: {valid_obs}'
                 }), 400)
             
-            id_evento = SensorModel.save_obstacle(id_dispositivo, status_obstaculo)
+            if write_behind.enabled:
+                response = SensorController._enqueue_obstacle(id_dispositivo, status_obstaculo)
+                if response is not None:
+                    return response
+                # Hilo escritor detenido: se guarda de forma síncrona
+            
+            obstacle = SensorModel.save_obstacle(id_dispositivo, status_obstaculo)
+            
+            # Notificar a los clientes suscritos con la fila recién insertada
+            emit_obstacle_update(id_dispositivo, {
+                'type': 'new_obstacle',
+                'data': obstacle
+            })
             
             return make_response(jsonify({
                 'status': 'success',
                 'message': 'Obstáculo registrado correctamente',
                 'data': {
-                    'id_evento': id_evento,
+                    'id_evento': obstacle['id_evento'],
                     'id_dispositivo': id_dispositivo,
                     'status_obstaculo': status_obstaculo
                 }
@@ -44,17 +75,167 @@ class SensorController:
                 'message': f'Error al reportar obstáculo: {str(e)}'
             }), 500)
 
+    @staticmethod
+    def _enqueue_obstacle(id_dispositivo, status_obstaculo):
+        """Modo escritura diferida: encolar y responder sin esperar al INSERT.
+        Devuelve None si el hilo escritor no está activo."""
+        # Una FK inválida haría fallar el lote completo: validamos antes de encolar
+        if not catalog_cache.device_exists(id_dispositivo):
+            return make_response(jsonify({
+                'status': 'error',
+                'message': f'Dispositivo {id_dispositivo} no existe'
+            }), 400)
+        
+        try:
+            write_behind.submit_obstacle(id_dispositivo, status_obstaculo, 'frente', '', 'automatico', datetime.now())
+        except WriteBehindFullError as e:
+            return make_response(jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 503)
+        except WriteBehindUnavailableError:
+            return None
+        
+        # El push se emite desde el escritor cuando la fila queda confirmada
+        return make_response(jsonify({
+            'status': 'success',
+            'message': 'Obstáculo encolado correctamente',
+            'data': {
+                'id_evento': None,
+                'id_dispositivo': id_dispositivo,
+                'status_obstaculo': status_obstaculo
+            }
+        }), 202)
+
+    @staticmethod
+    def report_obstacles_batch():
+        try:
+            items = extract_batch_items(request.get_json(silent=True), 'obstacles')
+            body, status_code = SensorController.ingest_obstacles(items)
+            return make_response(jsonify(body), status_code)
+            
+        except Exception as e:
+            return make_response(jsonify({
+                'status': 'error',
+                'message': f'Error al reportar obstáculos: {str(e)}'
+            }), 500)
+
+    @staticmethod
+    def ingest_obstacles(items):
+        """Validar y guardar una lista de obstáculos (HTTP batch o Socket.IO).
+        Devuelve (cuerpo, código HTTP) con el resultado de cada elemento."""
+        if not items:
+            return {
+                'status': 'error',
+                'message': 'Se requiere una lista de obstáculos'
+            }, 400
+        
+        if len(items) > BATCH_MAX_ITEMS:
+            return {
+                'status': 'error',
+                'message': f'Máximo {BATCH_MAX_ITEMS} obstáculos por petición'
+            }, 413
+        
+        # Validar todos los elementos en una sola pasada
+        results = [None] * len(items)
+        pending = []  # (indice, id_dispositivo, status_obstaculo, ubicacion, descripcion, tipo, fecha_hora)
+        for index, item in enumerate(items):
+            if not isinstance(item, dict) or 'status_obstaculo' not in item:
+                results[index] = {'index': index, 'status': 'error', 'message': 'status_obstaculo es requerido'}
+                continue
+            
+            status_obstaculo = item.get('status_obstaculo')
+            if not catalog_cache.is_valid_obstacle(status_obstaculo):
+                results[index] = {'index': index, 'status': 'error', 'message': f'Obstáculo inválido: {status_obstaculo}'}
+                continue
+            
+            tipo = item.get('tipo', 'automatico')
+            if tipo not in TIPOS_VALIDOS:
+                results[index] = {'index': index, 'status': 'error', 'message': f'Tipo inválido: {tipo}'}
+                continue
+            
+            # Los obstáculos manuales deben indicar la ubicación explícitamente
+            if tipo == 'manual' and 'ubicacion' not in item:
+                results[index] = {'index': index, 'status': 'error', 'message': 'ubicacion es requerida para obstáculos manuales'}
+                continue
+            
+            ubicacion = item.get('ubicacion', 'frente')
+            if ubicacion not in UBICACIONES_VALIDAS:
+                results[index] = {'index': index, 'status': 'error', 'message': f'Ubicación inválida: {ubicacion}'}
+                continue
+            
+            try:
+                id_dispositivo = int(item.get('id_dispositivo', 1))
+                fecha_hora = parse_event_timestamp(item.get('timestamp'))
+            except (TypeError, ValueError, OverflowError, OSError):
+                results[index] = {'index': index, 'status': 'error', 'message': 'id_dispositivo o timestamp inválido'}
+                continue
+            
+            descripcion = item.get('descripcion') or ''
+            pending.append((index, id_dispositivo, status_obstaculo, ubicacion, descripcion, tipo, fecha_hora))
+        
+        # Verificar los dispositivos contra la caché de catálogos
+        valid = []
+        for row in pending:
+            if not catalog_cache.device_exists(row[1]):
+                results[row[0]] = {'index': row[0], 'status': 'error', 'message': f'Dispositivo {row[1]} no existe'}
+            else:
+                valid.append(row)
+        
+        obstacles = SensorModel.save_obstacles_batch([v[1:] for v in valid])
+        
+        for (index, *_), obstacle in zip(valid, obstacles):
+            results[index] = {'index': index, 'status': 'success', 'data': obstacle}
+        
+        # Un único push por sala de dispositivo (evento simple si solo hay uno)
+        for id_dispositivo, device_obstacles in group_events_by_device(obstacles).items():
+            if len(device_obstacles) == 1:
+                emit_obstacle_update(id_dispositivo, {'type': 'new_obstacle', 'data': device_obstacles[0]})
+            else:
+                emit_obstacle_update(id_dispositivo, {
+                    'type': 'new_obstacle_batch',
+                    'data': device_obstacles
+                })
+        
+        inserted = len(obstacles)
+        failed = len(items) - inserted
+        if failed == 0:
+            status_code = 201
+        elif inserted > 0:
+            status_code = 207
+        else:
+            status_code = 400
+        
+        return {
+            'status': 'success' if inserted else 'error',
+            'message': f'{inserted} obstáculos registrados, {failed} rechazados',
+            'data': {
+                'total': len(items),
+                'inserted': inserted,
+                'failed': failed,
+                'results': results
+            }
+        }, status_code
+
     @staticmethod
     def get_recent_obstacles():
         try:
             id_dispositivo = request.args.get('device_id', 1, type=int)
-            limit = request.args.get('limit', 10, type=int)
             
-            obstacles = SensorModel.get_recent_obstacles(id_dispositivo, limit)
+            try:
+                limit, before, after = parse_page_args()
+            except ValueError as e:
+                return make_response(jsonify({
+                    'status': 'error',
+                    'message': str(e)
+                }), 400)
+            
+            obstacles = SensorModel.get_recent_obstacles(id_dispositivo, limit, before, after)
             
             return make_response(jsonify({
                 'status': 'success',
-                'data': obstacles
+                'data': obstacles,
+                'pagination': page_cursors(obstacles, limit, after)
             }), 200)
             
         except Exception as e:
@@ -66,7 +247,7 @@ class SensorController:
     @staticmethod
     def get_obstacles_catalog():
         try:
-            obstacles = SensorModel.get_obstacles_catalog()
+            obstacles = catalog_cache.get_obstacles()
             return make_response(jsonify({
                 'status': 'success',
                 'data': obstacles
@@ -90,54 +271,51 @@ class SensorController:
                     'message': 'status_obstaculo y ubicacion son requeridos'
                 }), 400)
             
-            id_dispositivo = data.get('id_dispositivo', 1)
+            try:
+                id_dispositivo = int(data.get('id_dispositivo', 1))
+            except (TypeError, ValueError):
+                return make_response(jsonify({
+                    'status': 'error',
+                    'message': 'id_dispositivo inválido'
+                }), 400)
+            
             status_obstaculo = data.get('status_obstaculo')
             ubicacion = data.get('ubicacion')  # 'frente', 'atras', 'izquierda', 'derecha', 'retroceso'
             descripcion = data.get('descripcion', '')
             
             # Validar ubicación
-            ubicaciones_validas = ['frente', 'atras', 'izquierda', 'derecha', 'retroceso']
-            if ubicacion not in ubicaciones_validas:
+            if ubicacion not in UBICACIONES_VALIDAS:
                 return make_response(jsonify({
                     'status': 'error',
-                    'message': f'Ubicación inválida. Ubicaciones válidas: {ubicaciones_validas}'
+                    'message': f'Ubicación inválida. Ubicaciones válidas: {UBICACIONES_VALIDAS}'
                 }), 400)
             
             # Validar tipo de obstáculo
-            obstacles = SensorModel.get_obstacles_catalog()
-            valid_obs = [obs['status_obstaculo'] for obs in obstacles]
-            
-            if status_obstaculo not in valid_obs:
+            if not catalog_cache.is_valid_obstacle(status_obstaculo):
+                valid_obs = sorted(catalog_cache.obstacle_codes())
                 return make_response(jsonify({
                     'status': 'error',
                     'message': f'Obstáculo inválido. Obstáculos válidos: {valid_obs}'
                 }), 400)
             
-            obstacle_id = SensorModel.save_manual_obstacle(
+            obstacle = SensorModel.save_manual_obstacle(
                 id_dispositivo, 
                 status_obstaculo, 
                 ubicacion, 
                 descripcion
             )
             
-            # Notificar via WebSocket
+            # Notificar via WebSocket (un único push con la fila completa)
             emit_obstacle_update(id_dispositivo, {
                 'type': 'manual_obstacle_created',
-                'data': {
-                    'id_evento': obstacle_id,
-                    'id_dispositivo': id_dispositivo,
-                    'status_obstaculo': status_obstaculo,
-                    'ubicacion': ubicacion,
-                    'descripcion': descripcion,
-                    'tipo': 'manual'
-                }
+                'data': obstacle
             })
             
             return make_response(jsonify({
                 'status': 'success',
                 'message': 'Obstáculo manual registrado correctamente',
                 'data': {
-                    'id_evento': obstacle_id,
+                    'id_evento': obstacle['id_evento'],
                     'id_dispositivo': id_dispositivo,
                     'status_obstaculo': status_obstaculo,
                     'ubicacion': ubicacion,
@@ -155,13 +333,21 @@ class SensorController:
     def get_manual_obstacles():
         try:
             id_dispositivo = request.args.get('device_id', 1, type=int)
-            limit = request.args.get('limit', 10, type=int)
             
-            obstacles = SensorModel.get_manual_obstacles(id_dispositivo, limit)
+            try:
+                limit, before, after = parse_page_args()
+            except ValueError as e:
+                return make_response(jsonify({
+                    'status': 'error',
+                    'message': str(e)
+                }), 400)
+            
+            obstacles = SensorModel.get_manual_obstacles(id_dispositivo, limit, before, after)
             
             return make_response(jsonify({
                 'status': 'success',
-                'data': obstacles
+                'data': obstacles,
+                'pagination': page_cursors(obstacles, limit, after)
             }), 200)
             
         except Exception as e:
@@ -173,12 +359,13 @@ class SensorController:
     @staticmethod
     def delete_manual_obstacle(obstacle_id):
         try:
-            success = SensorModel.delete_manual_obstacle(obstacle_id)
+            id_dispositivo = SensorModel.delete_manual_obstacle(obstacle_id)
             
-            if success:
+            if id_dispositivo:
                 return make_response(jsonify({
                     'status': 'success',
-                    'message': 'Obstáculo manual eliminado correctamente'
+                    'message': 'Obstáculo manual eliminado correctamente',
+                    'data': {'id_evento': obstacle_id, 'id_dispositivo': id_dispositivo}
                 }), 200)
             else:
                 return make_response(jsonify({
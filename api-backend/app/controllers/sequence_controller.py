@@ -1,7 +1,13 @@
 from flask import jsonify, request, make_response
 from app.models.sequence_model import SequenceModel
+from app.config.execution_engine import execution_engine
+from app.config.execution_index import execution_index
+from app.config.websocket import emit_execution_update, publish_execution_control, is_multi_worker
+from app.controllers.helpers import extract_batch_items, BATCH_MAX_ITEMS
 import json
 
+EXECUTION_STATES = ['pendiente', 'progreso', 'completado', 'cancelado', 'fallido']
+
 class SequenceController:
     @staticmethod
     def create_sequence():
@@ -206,16 +212,51 @@ class SequenceController:
                     'message': 'Secuencia no encontrada'
                 }), 404)
             
-            id_ejecucion = SequenceModel.execute_sequence(id_secuencia)
+            data = request.get_json(silent=True) or {}
+            server_side = bool(data.get('server_side', False))
+            interval = None
+            
+            if server_side:
+                if not execution_engine.enabled:
+                    return make_response(jsonify({
+                        'status': 'error',
+                        'message': 'La ejecución en el servidor no está activada'
+                    }), 400)
+                if 'interval_ms' in data:
+                    try:
+                        interval = int(data['interval_ms']) / 1000
+                    except (TypeError, ValueError):
+                        interval = 0
+                    if interval < 0.05:
+                        return make_response(jsonify({
+                            'status': 'error',
+                            'message': 'interval_ms debe ser un entero mayor o igual a 50'
+                        }), 400)
+            
+            id_ejecucion = SequenceModel.execute_sequence(id_secuencia, sequence['id_dispositivo'])
+            
+            response_data = {
+                'id_ejecucion': id_ejecucion,
+                'id_secuencia': id_secuencia,
+                'operaciones': sequence['operaciones'],
+                'server_side': server_side
+            }
+            
+            if server_side:
+                # El servidor despacha cada paso a la sala del dispositivo
+                execution = execution_engine.submit(
+                    id_ejecucion,
+                    id_secuencia,
+                    sequence['id_dispositivo'],
+                    sequence['operaciones'],
+                    interval
+                )
+                response_data['intervalo_ms'] = execution['intervalo_ms']
             
             return make_response(jsonify({
                 'status': 'success',
-                'message': 'Secuencia lista para ejecutar',
-                'data': {
-                    'id_ejecucion': id_ejecucion,
-                    'id_secuencia': id_secuencia,
-                    'operaciones': sequence['operaciones']
-                }
+                'message': 'Secuencia en ejecución' if server_side else 'Secuencia lista para ejecutar',
+                'data': response_data
             }), 200)
             
         except Exception as e:
@@ -235,11 +276,10 @@ class SequenceController:
                     'message': 'id_ejecucion y estado son requeridos'
                 }), 400)
             
-            valid_states = ['pendiente', 'progreso', 'completado', 'cancelado', 'fallido']
-            if data['estado'] not in valid_states:
+            if data['estado'] not in EXECUTION_STATES:
                 return make_response(jsonify({
                     'status': 'error',
-                    'message': f'Estado inválido. Estados válidos: {valid_states}'
+                    'message': f'Estado inválido. Estados válidos: {EXECUTION_STATES}'
                 }), 400)
             
             success = SequenceModel.update_execution_status(
@@ -262,4 +302,159 @@ class SequenceController:
             return make_response(jsonify({
                 'status': 'error',
                 'message': f'Error al actualizar estado: {str(e)}'
+            }), 500)
+
+    @staticmethod
+    def update_execution_statuses():
+        """Aplicar muchas transiciones {id_ejecucion, estado} en un solo UPDATE
+        y notificar cada una a la sala de su dispositivo"""
+        try:
+            items = extract_batch_items(request.get_json(silent=True), 'updates')
+            
+            if not items:
+                return make_response(jsonify({
+                    'status': 'error',
+                    'message': 'Se requiere una lista de actualizaciones'
+                }), 400)
+            
+            if len(items) > BATCH_MAX_ITEMS:
+                return make_response(jsonify({
+                    'status': 'error',
+                    'message': f'Máximo {BATCH_MAX_ITEMS} actualizaciones por petición'
+                }), 413)
+            
+            results = [None] * len(items)
+            pending = []  # (indice, id_ejecucion, estado)
+            for index, item in enumerate(items):
+                if not isinstance(item, dict) or 'id_ejecucion' not in item or 'estado' not in item:
+                    results[index] = {'index': index, 'status': 'error', 'message': 'id_ejecucion y estado son requeridos'}
+                    continue
+                if item['estado'] not in EXECUTION_STATES:
+                    results[index] = {'index': index, 'status': 'error', 'message': f'Estado inválido: {item["estado"]}'}
+                    continue
+                try:
+                    id_ejecucion = int(item['id_ejecucion'])
+                except (TypeError, ValueError):
+                    results[index] = {'index': index, 'status': 'error', 'message': 'id_ejecucion inválido'}
+                    continue
+                pending.append((index, id_ejecucion, item['estado']))
+            
+            # Dispositivo de cada ejecución desde el índice (una consulta para los que falten)
+            targets = execution_index.resolve({id_ejecucion for _, id_ejecucion, _ in pending})
+            
+            estados = {}  # si una ejecución se repite, gana la última transición
+            for index, id_ejecucion, estado in pending:
+                if id_ejecucion not in targets:
+                    results[index] = {'index': index, 'status': 'error', 'message': f'Ejecución {id_ejecucion} no encontrada'}
+                    continue
+                estados[id_ejecucion] = estado
+                results[index] = {'index': index, 'status': 'success', 'data': {'id_ejecucion': id_ejecucion, 'estado': estado}}
+            
+            SequenceModel.update_execution_statuses(estados)
+            
+            for id_ejecucion, estado in estados.items():
+                id_secuencia, id_dispositivo = targets[id_ejecucion]
+                emit_execution_update(id_dispositivo, {
+                    'type': 'execution_status_updated',
+                    'data': {
+                        'id_ejecucion': id_ejecucion,
+                        'id_secuencia': id_secuencia,
+                        'estado': estado
+                    }
+                })
+            
+            updated = sum(1 for result in results if result['status'] == 'success')
+            failed = len(items) - updated
+            if failed == 0:
+                status_code = 200
+            elif updated > 0:
+                status_code = 207
+            else:
+                status_code = 400
+            
+            return make_response(jsonify({
+                'status': 'success' if updated else 'error',
+                'message': f'{updated} estados actualizados, {failed} rechazados',
+                'data': {
+                    'total': len(items),
+                    'updated': updated,
+                    'failed': failed,
+                    'results': results
+                }
+            }), status_code)
+            
+        except Exception as e:
+            return make_response(jsonify({
+                'status': 'error',
+                'message': f'Error al actualizar estados: {str(e)}'
+            }), 500)
+
+    @staticmethod
+    def control_execution(id_ejecucion, action):
+        """Pausar, reanudar o cancelar una ejecución dirigida por el servidor"""
+        try:
+            execution = execution_engine.apply_control(id_ejecucion, action)
+            
+            if execution is None:
+                if execution_engine.get(id_ejecucion) is None:
+                    # No está en este worker: puede estar ejecutándose en otro
+                    row = SequenceModel.get_execution(id_ejecucion)
+                    if row and row['estado'] in ('pendiente', 'progreso') and is_multi_worker():
+                        publish_execution_control(id_ejecucion, action)
+                        return make_response(jsonify({
+                            'status': 'success',
+                            'message': 'Orden enviada al worker que ejecuta la secuencia',
+                            'data': {'id_ejecucion': id_ejecucion, 'action': action}
+                        }), 202)
+                    return make_response(jsonify({
+                        'status': 'error',
+                        'message': 'Ejecución no encontrada o ya finalizada'
+                    }), 404)
+                return make_response(jsonify({
+                    'status': 'error',
+                    'message': f'No se puede aplicar {action} a la ejecución en su estado actual',
+                    'data': execution_engine.get(id_ejecucion)
+                }), 409)
+            
+            return make_response(jsonify({
+                'status': 'success',
+                'message': 'Estado actualizado correctamente',
+                'data': execution
+            }), 200)
+            
+        except Exception as e:
+            return make_response(jsonify({
+                'status': 'error',
+                'message': f'Error al controlar la ejecución: {str(e)}'
+            }), 500)
+
+    @staticmethod
+    def get_execution(id_ejecucion):
+        try:
+            execution = execution_engine.get(id_ejecucion)
+            
+            if execution is not None:
+                return make_response(jsonify({
+                    'status': 'success',
+                    'data': execution
+                }), 200)
+            
+            # Terminada o en otro worker: el estado persistido en la BD
+            row = SequenceModel.get_execution(id_ejecucion)
+            if not row:
+                return make_response(jsonify({
+                    'status': 'error',
+                    'message': 'Ejecución no encontrada'
+                }), 404)
+            
+            row['source'] = 'database'
+            return make_response(jsonify({
+                'status': 'success',
+                'data': row
+            }), 200)
+            
+        except Exception as e:
+            return make_response(jsonify({
+                'status': 'error',
+                'message': str(e)
             }), 500)
\ No newline at end of file
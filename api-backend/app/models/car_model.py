@@ -1,9 +1,28 @@
 from app.config.database import get_db_connection
+from app.config.catalog_cache import catalog_cache
+from app.config.device_state import device_state
+from app.config.recent_events import recent_events
+from app.models.pagination import keyset_condition
 from datetime import datetime
 
 class CarModel:
+    @staticmethod
+    def build_command_event(id_evento, id_dispositivo, status_operacion, fecha_hora):
+        """Construir la fila completa del evento sin releerla de la BD"""
+        return {
+            'id_evento': id_evento,
+            'id_dispositivo': id_dispositivo,
+            'status_operacion': status_operacion,
+            'fecha_hora': fecha_hora,
+            'status_texto': catalog_cache.operation_text(status_operacion),
+            'nombre_dispositivo': catalog_cache.device_name(id_dispositivo)
+        }
+
     @staticmethod
     def save_command(id_dispositivo, status_operacion):
+        """Guardar un comando y devolver el evento ya hidratado"""
+        # DATETIME guarda segundos: truncamos para que el push coincida con la fila
+        fecha_hora = datetime.now().replace(microsecond=0)
         db = get_db_connection()
         try:
             with db.cursor() as cursor:
@@ -11,28 +30,106 @@ class CarModel:
                 INSERT INTO historial_operaciones (id_dispositivo, status_operacion, fecha_hora)
                 VALUES (%s, %s, %s)
                 """
-                cursor.execute(sql, (id_dispositivo, status_operacion, datetime.now()))
+                cursor.execute(sql, (id_dispositivo, status_operacion, fecha_hora))
                 db.commit()
-                return cursor.lastrowid
+                event = CarModel.build_command_event(cursor.lastrowid, id_dispositivo, status_operacion, fecha_hora)
+                device_state.record_command(event)
+                return event
         except Exception as e:
             db.rollback()
             raise e
 
     @staticmethod
-    def get_recent_commands(id_dispositivo=1, limit=10):
+    def insert_commands(cursor, commands):
+        """INSERT multi-fila sobre un cursor ya abierto (sin commit) y devolver los eventos.
+        commands: lista de tuplas (id_dispositivo, status_operacion, fecha_hora)"""
+        commands = [(d, op, fecha.replace(microsecond=0)) for d, op, fecha in commands]
+        placeholders = ', '.join(['(%s, %s, %s)'] * len(commands))
+        sql = f"""
+        INSERT INTO historial_operaciones (id_dispositivo, status_operacion, fecha_hora)
+        VALUES {placeholders}
+        """
+        params = [value for command in commands for value in command]
+        cursor.execute(sql, params)
+        first_id = cursor.lastrowid
+        # InnoDB asigna ids consecutivos a las filas de un mismo INSERT multi-fila
+        return [
+            CarModel.build_command_event(first_id + offset, *command)
+            for offset, command in enumerate(commands)
+        ]
+
+    @staticmethod
+    def save_commands_batch(commands):
+        """Guardar varios comandos en una sola transacción y devolver los eventos"""
+        if not commands:
+            return []
         db = get_db_connection()
         try:
             with db.cursor() as cursor:
-                sql = """
+                db.begin()
+                events = CarModel.insert_commands(cursor, commands)
+                db.commit()
+                device_state.record_commands(events)
+                return events
+        except Exception as e:
+            db.rollback()
+            raise e
+
+    @staticmethod
+    def get_recent_commands(id_dispositivo=1, limit=10, before=None, after=None):
+        """before/after: cursor (fecha_hora, id_evento) ya decodificado.
+        La primera página sale de recent_events si cabe en su capacidad."""
+        if recent_events.enabled and before is None and after is None and limit <= recent_events.capacity:
+            cached = recent_events.get('command', id_dispositivo, limit)
+            if cached is not None:
+                return cached
+            # Fallo: leer la capacidad completa para cargar el buffer
+            recent_events.begin_warm(id_dispositivo)
+            rows = CarModel._select_recent_commands(id_dispositivo, recent_events.capacity)
+            recent_events.warm('command', id_dispositivo, rows)
+            return rows[:limit]
+        return CarModel._select_recent_commands(id_dispositivo, limit, before, after)
+
+    @staticmethod
+    def _select_recent_commands(id_dispositivo, limit, before=None, after=None):
+        db = get_db_connection()
+        try:
+            with db.cursor() as cursor:
+                conditions = ['ho.id_dispositivo = %s']
+                params = [id_dispositivo]
+                keyset, keyset_params, order = keyset_condition('ho', before, after)
+                if keyset:
+                    conditions.append(keyset)
+                    params.extend(keyset_params)
+                params.append(limit)
+                
+                sql = f"""
                 SELECT ho.*, o.status_texto, d.nombre_dispositivo
                 FROM historial_operaciones ho
                 JOIN operaciones o ON ho.status_operacion = o.status_operacion
                 JOIN dispositivo d ON ho.id_dispositivo = d.id_dispositivo
-                WHERE ho.id_dispositivo = %s
-                ORDER BY ho.fecha_hora DESC 
+                WHERE {' AND '.join(conditions)}
+                ORDER BY ho.fecha_hora {order}, ho.id_evento {order}
                 LIMIT %s
                 """
-                cursor.execute(sql, (id_dispositivo, limit))
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+                # Las páginas hacia adelante se leen en ASC pero se devuelven en DESC
+                return list(reversed(rows)) if order == 'ASC' else rows
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    def count_commands_by_device():
+        db = get_db_connection()
+        try:
+            with db.cursor() as cursor:
+                sql = """
+                SELECT id_dispositivo, COUNT(*) AS total
+                FROM historial_operaciones
+                GROUP BY id_dispositivo
+                """
+                cursor.execute(sql)
                 return cursor.fetchall()
         except Exception as e:
             raise e
@@ -0,0 +1,36 @@
+import base64
+from datetime import datetime
+
+# Paginación por cursor (keyset) sobre (fecha_hora, id_evento).
+# Requiere un índice (id_dispositivo, fecha_hora, id_evento) para que la página N
+# cueste lo mismo que la primera.
+
+CURSOR_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def encode_cursor(row):
+    """Generar un cursor opaco a partir de una fila del historial"""
+    raw = f"{row['fecha_hora'].strftime(CURSOR_DATE_FORMAT)}|{row['id_evento']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(token):
+    """Devolver (fecha_hora, id_evento); ValueError si el cursor no es válido"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        fecha, id_evento = raw.split('|')
+        return datetime.strptime(fecha, CURSOR_DATE_FORMAT), int(id_evento)
+    except Exception:
+        raise ValueError('cursor inválido')
+
+def keyset_condition(alias, before=None, after=None):
+    """Devolver (condición SQL, parámetros, orden) para la página pedida.
+    before: filas más antiguas que el cursor; after: filas más recientes."""
+    if before is not None:
+        fecha, id_evento = before
+        condition = f"({alias}.fecha_hora < %s OR ({alias}.fecha_hora = %s AND {alias}.id_evento < %s))"
+        return condition, [fecha, fecha, id_evento], 'DESC'
+    if after is not None:
+        fecha, id_evento = after
+        condition = f"({alias}.fecha_hora > %s OR ({alias}.fecha_hora = %s AND {alias}.id_evento > %s))"
+        return condition, [fecha, fecha, id_evento], 'ASC'
+    return None, [], 'DESC'
@@ -1,9 +1,31 @@
 from app.config.database import get_db_connection
+from app.config.catalog_cache import catalog_cache
+from app.config.device_state import device_state
+from app.config.recent_events import recent_events
+from app.models.pagination import keyset_condition
 from datetime import datetime
 
 class SensorModel:
+    @staticmethod
+    def build_obstacle_event(id_evento, id_dispositivo, status_obstaculo, ubicacion, descripcion, tipo, fecha_hora):
+        """Construir la fila completa del evento sin releerla de la BD"""
+        return {
+            'id_evento': id_evento,
+            'id_dispositivo': id_dispositivo,
+            'status_obstaculo': status_obstaculo,
+            'ubicacion': ubicacion,
+            'descripcion': descripcion,
+            'tipo': tipo,
+            'fecha_hora': fecha_hora,
+            'status_texto': catalog_cache.obstacle_text(status_obstaculo),
+            'nombre_dispositivo': catalog_cache.device_name(id_dispositivo)
+        }
+
     @staticmethod
     def save_obstacle(id_dispositivo, status_obstaculo, ubicacion='frente', descripcion='', tipo='automatico'):
+        """Guardar un obstáculo y devolver el evento ya hidratado"""
+        # DATETIME guarda segundos: truncamos para que el push coincida con la fila
+        fecha_hora = datetime.now().replace(microsecond=0)
         db = get_db_connection()
         try:
             with db.cursor() as cursor:
@@ -12,9 +34,50 @@ class SensorModel:
                 (id_dispositivo, status_obstaculo, ubicacion, descripcion, tipo, fecha_hora)
                 VALUES (%s, %s, %s, %s, %s, %s)
                 """
-                cursor.execute(sql, (id_dispositivo, status_obstaculo, ubicacion, descripcion, tipo, datetime.now()))
+                cursor.execute(sql, (id_dispositivo, status_obstaculo, ubicacion, descripcion, tipo, fecha_hora))
                 db.commit()
-                return cursor.lastrowid
+                event = SensorModel.build_obstacle_event(
+                    cursor.lastrowid, id_dispositivo, status_obstaculo, ubicacion, descripcion, tipo, fecha_hora
+                )
+                device_state.record_obstacle(event)
+                return event
+        except Exception as e:
+            db.rollback()
+            raise e
+
+    @staticmethod
+    def insert_obstacles(cursor, obstacles):
+        """INSERT multi-fila sobre un cursor ya abierto (sin commit) y devolver los eventos.
+        obstacles: lista de tuplas (id_dispositivo, status_obstaculo, ubicacion, descripcion, tipo, fecha_hora)"""
+        obstacles = [obstacle[:5] + (obstacle[5].replace(microsecond=0),) for obstacle in obstacles]
+        placeholders = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(obstacles))
+        sql = f"""
+        INSERT INTO historial_obstaculos 
+        (id_dispositivo, status_obstaculo, ubicacion, descripcion, tipo, fecha_hora)
+        VALUES {placeholders}
+        """
+        params = [value for obstacle in obstacles for value in obstacle]
+        cursor.execute(sql, params)
+        first_id = cursor.lastrowid
+        # InnoDB asigna ids consecutivos a las filas de un mismo INSERT multi-fila
+        return [
+            SensorModel.build_obstacle_event(first_id + offset, *obstacle)
+            for offset, obstacle in enumerate(obstacles)
+        ]
+
+    @staticmethod
+    def save_obstacles_batch(obstacles):
+        """Guardar varios obstáculos en una sola transacción y devolver los eventos"""
+        if not obstacles:
+            return []
+        db = get_db_connection()
+        try:
+            with db.cursor() as cursor:
+                db.begin()
+                events = SensorModel.insert_obstacles(cursor, obstacles)
+                db.commit()
+                device_state.record_obstacles(events)
+                return events
         except Exception as e:
             db.rollback()
             raise e
@@ -31,40 +94,91 @@ class SensorModel:
         )
 
     @staticmethod
-    def get_recent_obstacles(id_dispositivo=1, limit=10):
+    def get_recent_obstacles(id_dispositivo=1, limit=10, before=None, after=None):
+        """before/after: cursor (fecha_hora, id_evento) ya decodificado.
+        La primera página sale de recent_events si cabe en su capacidad."""
+        if recent_events.enabled and before is None and after is None and limit <= recent_events.capacity:
+            cached = recent_events.get('obstacle', id_dispositivo, limit)
+            if cached is not None:
+                return cached
+            # Fallo: leer la capacidad completa para cargar el buffer
+            recent_events.begin_warm(id_dispositivo)
+            rows = SensorModel._select_recent_obstacles(id_dispositivo, recent_events.capacity)
+            recent_events.warm('obstacle', id_dispositivo, rows)
+            return rows[:limit]
+        return SensorModel._select_recent_obstacles(id_dispositivo, limit, before, after)
+
+    @staticmethod
+    def _select_recent_obstacles(id_dispositivo, limit, before=None, after=None):
         db = get_db_connection()
         try:
             with db.cursor() as cursor:
-                sql = """
+                conditions = ['ho.id_dispositivo = %s']
+                params = [id_dispositivo]
+                keyset, keyset_params, order = keyset_condition('ho', before, after)
+                if keyset:
+                    conditions.append(keyset)
+                    params.extend(keyset_params)
+                params.append(limit)
+                
+                sql = f"""
                 SELECT ho.*, obs.status_texto, d.nombre_dispositivo
                 FROM historial_obstaculos ho
                 JOIN obstaculos obs ON ho.status_obstaculo = obs.status_obstaculo
                 JOIN dispositivo d ON ho.id_dispositivo = d.id_dispositivo
-                WHERE ho.id_dispositivo = %s
-                ORDER BY ho.fecha_hora DESC 
+                WHERE {' AND '.join(conditions)}
+                ORDER BY ho.fecha_hora {order}, ho.id_evento {order}
                 LIMIT %s
                 """
-                cursor.execute(sql, (id_dispositivo, limit))
-                return cursor.fetchall()
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+                # Las páginas hacia adelante se leen en ASC pero se devuelven en DESC
+                return list(reversed(rows)) if order == 'ASC' else rows
         except Exception as e:
             raise e
 
     @staticmethod
-    def get_manual_obstacles(id_dispositivo=1, limit=10):
+    def count_obstacles_by_device():
         db = get_db_connection()
         try:
             with db.cursor() as cursor:
                 sql = """
+                SELECT id_dispositivo, tipo, COUNT(*) AS total
+                FROM historial_obstaculos
+                GROUP BY id_dispositivo, tipo
+                """
+                cursor.execute(sql)
+                return cursor.fetchall()
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    def get_manual_obstacles(id_dispositivo=1, limit=10, before=None, after=None):
+        """before/after: cursor (fecha_hora, id_evento) ya decodificado"""
+        db = get_db_connection()
+        try:
+            with db.cursor() as cursor:
+                conditions = ['ho.id_dispositivo = %s', "ho.tipo = 'manual'"]
+                params = [id_dispositivo]
+                keyset, keyset_params, order = keyset_condition('ho', before, after)
+                if keyset:
+                    conditions.append(keyset)
+                    params.extend(keyset_params)
+                params.append(limit)
+                
+                sql = f"""
                 SELECT ho.*, obs.status_texto, d.nombre_dispositivo
                 FROM historial_obstaculos ho
                 JOIN obstaculos obs ON ho.status_obstaculo = obs.status_obstaculo
                 JOIN dispositivo d ON ho.id_dispositivo = d.id_dispositivo
-                WHERE ho.id_dispositivo = %s AND ho.tipo = 'manual'
-                ORDER BY ho.fecha_hora DESC 
+                WHERE {' AND '.join(conditions)}
+                ORDER BY ho.fecha_hora {order}, ho.id_evento {order}
                 LIMIT %s
                 """
-                cursor.execute(sql, (id_dispositivo, limit))
-                return cursor.fetchall()
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+                # Las páginas hacia adelante se leen en ASC pero se devuelven en DESC
+                return list(reversed(rows)) if order == 'ASC' else rows
         except Exception as e:
             raise e
 
@@ -86,18 +200,23 @@ class SensorModel:
             with db.cursor() as cursor:
                 # Verificar si el obstáculo existe y es manual
                 sql_check = """
-                SELECT id_evento FROM historial_obstaculos 
+                SELECT id_evento, id_dispositivo FROM historial_obstaculos 
                 WHERE id_evento = %s AND tipo = 'manual'
                 """
                 cursor.execute(sql_check, (obstacle_id,))
-                if not cursor.fetchone():
+                obstacle = cursor.fetchone()
+                if not obstacle:
                     return False
                 
                 # Eliminar el obstáculo manual
                 sql_delete = "DELETE FROM historial_obstaculos WHERE id_evento = %s"
                 cursor.execute(sql_delete, (obstacle_id,))
+                deleted = cursor.rowcount > 0
                 db.commit()
-                return cursor.rowcount > 0
+                # El historial en memoria se recargará de la BD (el resto del estado se conserva)
+                recent_events.forget(obstacle['id_dispositivo'])
+                # Se devuelve el dispositivo para notificar a su sala
+                return obstacle['id_dispositivo'] if deleted else False
                 
         except Exception as e:
             db.rollback()
@@ -0,0 +1,362 @@
+from app.config.database import get_db_connection
+from app.config.sequence_cache import sequence_cache, MISSING
+from app.config.execution_index import execution_index
+from datetime import datetime
+
+class SequenceModel:
+    @staticmethod
+    def _insert_operations(cursor, id_secuencia, operations):
+        """INSERT multi-fila de pasos. operations: lista de (orden, status_operacion)"""
+        if not operations:
+            return
+        placeholders = ', '.join(['(%s, %s, %s)'] * len(operations))
+        sql = f"""
+        INSERT INTO secuencia_operaciones (id_secuencia, status_operacion, orden)
+        VALUES {placeholders}
+        """
+        params = [value for orden, status_operacion in operations for value in (id_secuencia, status_operacion, orden)]
+        cursor.execute(sql, params)
+
+    @staticmethod
+    def diff_operations(stored, movimientos):
+        """Comparar los pasos guardados ({orden: status_operacion}) con la nueva lista.
+        Devuelve (insertados, eliminados, cambiados) por posición."""
+        inserted = []
+        changed = []
+        for orden, status_operacion in enumerate(movimientos, start=1):
+            if orden not in stored:
+                inserted.append((orden, status_operacion))
+            elif stored[orden] != status_operacion:
+                changed.append((orden, status_operacion))
+        removed = [orden for orden in stored if orden > len(movimientos)]
+        return inserted, removed, changed
+
+    @staticmethod
+    def create_sequence(id_dispositivo, nombre_secuencia, movimientos):
+        db = get_db_connection()
+        try:
+            with db.cursor() as cursor:
+                db.begin()
+                # Insertar en secuencias_demo
+                sql = """
+                INSERT INTO secuencias_demo (id_dispositivo, nombre_secuencia, fecha_creacion)
+                VALUES (%s, %s, %s)
+                """
+                cursor.execute(sql, (id_dispositivo, nombre_secuencia, datetime.now()))
+                id_secuencia = cursor.lastrowid
+                
+                # Todas las operaciones en un solo INSERT
+                SequenceModel._insert_operations(
+                    cursor, id_secuencia, list(enumerate(movimientos, start=1))
+                )
+                
+                db.commit()
+                sequence_cache.invalidate()
+                return id_secuencia
+        except Exception as e:
+            db.rollback()
+            raise e
+
+    @staticmethod
+    def get_sequences(limit=20):
+        """Listado servido desde la caché mientras no cambie ninguna secuencia"""
+        cached = sequence_cache.get_list(limit)
+        if cached is not MISSING:
+            return cached
+        version = sequence_cache.version
+        sequences = SequenceModel._select_sequences(limit)
+        sequence_cache.put_list(limit, sequences, version)
+        return sequences
+
+    @staticmethod
+    def _select_sequences(limit):
+        db = get_db_connection()
+        try:
+            with db.cursor() as cursor:
+                sql = """
+                SELECT 
+                    sd.id_secuencia,
+                    sd.id_dispositivo,
+                    sd.nombre_secuencia,
+                    sd.fecha_creacion,
+                    d.nombre_dispositivo,
+                    GROUP_CONCAT(so.status_operacion ORDER BY so.orden) as operaciones,
+                    COUNT(so.id_secuencia_operaciones) as total_movimientos
+                FROM secuencias_demo sd
+                JOIN dispositivo d ON sd.id_dispositivo = d.id_dispositivo
+                LEFT JOIN secuencia_operaciones so ON sd.id_secuencia = so.id_secuencia
+                GROUP BY sd.id_secuencia, sd.id_dispositivo, sd.nombre_secuencia, sd.fecha_creacion, d.nombre_dispositivo
+                ORDER BY sd.fecha_creacion DESC
+                LIMIT %s
+                """
+                cursor.execute(sql, (limit,))
+                sequences = cursor.fetchall()
+                
+                # Convertir a formato compatible con el frontend
+                formatted_sequences = []
+                for seq in sequences:
+                    formatted_seq = {
+                        'id_secuencia': seq['id_secuencia'],
+                        'id_dispositivo': seq['id_dispositivo'],
+                        'nombre_secuencia': seq['nombre_secuencia'],
+                        'fecha_creacion': seq['fecha_creacion'],
+                        'nombre_dispositivo': seq['nombre_dispositivo'],
+                        'operaciones': seq['operaciones'] if seq['operaciones'] else '',
+                        'total_movimientos': seq['total_movimientos']
+                    }
+                    formatted_sequences.append(formatted_seq)
+                
+                return formatted_sequences
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    def count_sequences_by_device():
+        db = get_db_connection()
+        try:
+            with db.cursor() as cursor:
+                sql = """
+                SELECT id_dispositivo, COUNT(*) AS total
+                FROM secuencias_demo
+                GROUP BY id_dispositivo
+                """
+                cursor.execute(sql)
+                return cursor.fetchall()
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    def count_executions_by_device():
+        db = get_db_connection()
+        try:
+            with db.cursor() as cursor:
+                sql = """
+                SELECT sd.id_dispositivo, COUNT(*) AS total
+                FROM ejecucion_secuencias es
+                JOIN secuencias_demo sd ON es.id_secuencia = sd.id_secuencia
+                GROUP BY sd.id_dispositivo
+                """
+                cursor.execute(sql)
+                return cursor.fetchall()
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    def get_sequence_by_id(id_secuencia):
+        """Secuencia con sus operaciones: memo de la petición, LRU y por último la BD"""
+        cached = sequence_cache.get(id_secuencia)
+        if cached is not MISSING:
+            return cached
+        version = sequence_cache.version
+        sequence = SequenceModel._select_sequence_by_id(id_secuencia)
+        sequence_cache.put(id_secuencia, sequence, version)
+        return sequence
+
+    @staticmethod
+    def _select_sequence_by_id(id_secuencia):
+        db = get_db_connection()
+        try:
+            with db.cursor() as cursor:
+                # Obtener información básica de la secuencia
+                sql = """
+                SELECT 
+                    sd.id_secuencia,
+                    sd.id_dispositivo,
+                    sd.nombre_secuencia,
+                    sd.fecha_creacion,
+                    d.nombre_dispositivo
+                FROM secuencias_demo sd
+                JOIN dispositivo d ON sd.id_dispositivo = d.id_dispositivo
+                WHERE sd.id_secuencia = %s
+                """
+                cursor.execute(sql, (id_secuencia,))
+                sequence = cursor.fetchone()
+                
+                if not sequence:
+                    return None
+                
+                # Obtener operaciones como array
+                sql_ops = """
+                SELECT so.orden, o.status_operacion, o.status_texto
+                FROM secuencia_operaciones so
+                JOIN operaciones o ON so.status_operacion = o.status_operacion
+                WHERE so.id_secuencia = %s
+                ORDER BY so.orden
+                """
+                cursor.execute(sql_ops, (id_secuencia,))
+                operations = cursor.fetchall()
+                
+                # Convertir operaciones a formato compatible
+                operations_array = [op['status_operacion'] for op in operations]
+                operations_text = [op['status_texto'] for op in operations]
+                
+                sequence['operaciones'] = operations_array
+                sequence['operaciones_texto'] = operations_text
+                sequence['operaciones_detalle'] = operations
+                
+                return sequence
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    def update_sequence(id_secuencia, nombre_secuencia=None, movimientos=None):
+        db = get_db_connection()
+        try:
+            with db.cursor() as cursor:
+                db.begin()
+                # Actualizar nombre si se proporciona
+                if nombre_secuencia:
+                    sql = "UPDATE secuencias_demo SET nombre_secuencia = %s WHERE id_secuencia = %s"
+                    cursor.execute(sql, (nombre_secuencia, id_secuencia))
+                
+                # Actualizar movimientos si se proporcionan: solo las posiciones que cambian
+                if movimientos is not None:
+                    sql_select = """
+                    SELECT orden, status_operacion FROM secuencia_operaciones
+                    WHERE id_secuencia = %s
+                    FOR UPDATE
+                    """
+                    cursor.execute(sql_select, (id_secuencia,))
+                    stored = {row['orden']: row['status_operacion'] for row in cursor.fetchall()}
+                    inserted, removed, changed = SequenceModel.diff_operations(stored, movimientos)
+                    
+                    if removed:
+                        sql_delete = "DELETE FROM secuencia_operaciones WHERE id_secuencia = %s AND orden > %s"
+                        cursor.execute(sql_delete, (id_secuencia, len(movimientos)))
+                    
+                    if changed:
+                        # Un solo UPDATE con CASE para todas las posiciones cambiadas
+                        cases = ' '.join(['WHEN %s THEN %s'] * len(changed))
+                        placeholders = ', '.join(['%s'] * len(changed))
+                        sql_update = f"""
+                        UPDATE secuencia_operaciones
+                        SET status_operacion = CASE orden {cases} END
+                        WHERE id_secuencia = %s AND orden IN ({placeholders})
+                        """
+                        params = [value for orden, status_operacion in changed for value in (orden, status_operacion)]
+                        params.append(id_secuencia)
+                        params.extend(orden for orden, _ in changed)
+                        cursor.execute(sql_update, params)
+                    
+                    SequenceModel._insert_operations(cursor, id_secuencia, inserted)
+                
+                db.commit()
+                sequence_cache.invalidate(id_secuencia)
+                return True
+        except Exception as e:
+            db.rollback()
+            raise e
+
+    @staticmethod
+    def delete_sequence(id_secuencia):
+        db = get_db_connection()
+        try:
+            with db.cursor() as cursor:
+                # Eliminar operaciones primero (restricción de clave foránea)
+                sql_ops = "DELETE FROM secuencia_operaciones WHERE id_secuencia = %s"
+                cursor.execute(sql_ops, (id_secuencia,))
+                
+                # Eliminar la secuencia
+                sql = "DELETE FROM secuencias_demo WHERE id_secuencia = %s"
+                cursor.execute(sql, (id_secuencia,))
+                deleted = cursor.rowcount > 0
+                
+                db.commit()
+                sequence_cache.invalidate(id_secuencia)
+                return deleted
+        except Exception as e:
+            db.rollback()
+            raise e
+
+    @staticmethod
+    def execute_sequence(id_secuencia, id_dispositivo=None):
+        db = get_db_connection()
+        try:
+            with db.cursor() as cursor:
+                sql = """
+                INSERT INTO ejecucion_secuencias (id_secuencia, fecha_ejecucion, estado)
+                VALUES (%s, %s, %s)
+                """
+                cursor.execute(sql, (id_secuencia, datetime.now(), 'pendiente'))
+                db.commit()
+                id_ejecucion = cursor.lastrowid
+                if id_dispositivo is not None:
+                    execution_index.put(id_ejecucion, id_secuencia, id_dispositivo)
+                return id_ejecucion
+        except Exception as e:
+            db.rollback()
+            raise e
+
+    @staticmethod
+    def get_execution(id_ejecucion):
+        """Fila de una ejecución con el dispositivo de su secuencia"""
+        db = get_db_connection()
+        try:
+            with db.cursor() as cursor:
+                sql = """
+                SELECT es.id_ejecucion, es.id_secuencia, sd.id_dispositivo, es.estado, es.fecha_ejecucion
+                FROM ejecucion_secuencias es
+                JOIN secuencias_demo sd ON es.id_secuencia = sd.id_secuencia
+                WHERE es.id_ejecucion = %s
+                """
+                cursor.execute(sql, (id_ejecucion,))
+                return cursor.fetchone()
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    def get_execution_targets(ids):
+        """Secuencia y dispositivo de varias ejecuciones (reconstrucción del índice)"""
+        if not ids:
+            return []
+        db = get_db_connection()
+        try:
+            with db.cursor() as cursor:
+                placeholders = ', '.join(['%s'] * len(ids))
+                sql = f"""
+                SELECT es.id_ejecucion, es.id_secuencia, sd.id_dispositivo
+                FROM ejecucion_secuencias es
+                JOIN secuencias_demo sd ON es.id_secuencia = sd.id_secuencia
+                WHERE es.id_ejecucion IN ({placeholders})
+                """
+                cursor.execute(sql, list(ids))
+                return cursor.fetchall()
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    def update_execution_status(id_ejecucion, estado):
+        db = get_db_connection()
+        try:
+            with db.cursor() as cursor:
+                sql = "UPDATE ejecucion_secuencias SET estado = %s WHERE id_ejecucion = %s"
+                cursor.execute(sql, (estado, id_ejecucion))
+                db.commit()
+                return True
+        except Exception as e:
+            db.rollback()
+            raise e
+
+    @staticmethod
+    def update_execution_statuses(estados):
+        """Actualizar varias ejecuciones en un solo UPDATE. estados: {id_ejecucion: estado}"""
+        if not estados:
+            return 0
+        db = get_db_connection()
+        try:
+            with db.cursor() as cursor:
+                ids = list(estados)
+                cases = ' '.join(['WHEN %s THEN %s'] * len(ids))
+                placeholders = ', '.join(['%s'] * len(ids))
+                sql = f"""
+                UPDATE ejecucion_secuencias
+                SET estado = CASE id_ejecucion {cases} END
+                WHERE id_ejecucion IN ({placeholders})
+                """
+                params = [value for id_ejecucion in ids for value in (id_ejecucion, estados[id_ejecucion])]
+                cursor.execute(sql, params + ids)
+                db.commit()
+                return cursor.rowcount
+        except Exception as e:
+            db.rollback()
+            raise e
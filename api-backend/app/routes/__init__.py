@@ -1,3 +1,5 @@
 from .api_routes import api_bp
+# Registra los eventos Socket.IO de ingesta (report_command / report_obstacle)
+from . import socket_routes
 
 __all__ = ['api_bp']
\ No newline at end of file
@@ -3,35 +3,31 @@ from app.controllers.car_controller import CarController
 from app.controllers.sensor_controller import SensorController
 from app.controllers.sequence_controller import SequenceController
 from app.config.websocket import (
-    emit_command_update, 
     emit_obstacle_update, 
     emit_sequence_update,
-    emit_execution_update
+    emit_execution_update,
+    get_connection_stats,
+    get_subscriber_count
 )
 from app.models.car_model import CarModel
 from app.models.sensor_model import SensorModel
 from app.models.sequence_model import SequenceModel
+from app.config.database import get_pool_stats
+from app.config.catalog_cache import catalog_cache
+from app.config.write_behind import write_behind
+from app.config.change_log import change_log
+from app.config.executor import fan_out, QueryTimeoutError
+from app.config.device_state import device_state
+from app.config.recent_events import recent_events
+from app.config.stats_counters import stats_counters
+from app.config.sequence_cache import sequence_cache
+from app.config.execution_engine import execution_engine
+from app.config.execution_index import execution_index
+from app.controllers.helpers import is_admin_request
 from datetime import datetime
 
 api_bp = Blueprint('api', __name__)
 
-# Función auxiliar para convertir datetime a string
-def serialize_datetime(data):
-    """Convierte objetos datetime a string para JSON"""
-    if isinstance(data, dict):
-        result = {}
-        for key, value in data.items():
-            if isinstance(value, datetime):
-                result[key] = value.strftime('%Y-%m-%d %H:%M:%S')
-            elif isinstance(value, dict):
-                result[key] = serialize_datetime(value)
-            elif isinstance(value, list):
-                result[key] = [serialize_datetime(item) if isinstance(item, dict) else item for item in value]
-            else:
-                result[key] = value
-        return result
-    return data
-
 # ==================== HEALTH CHECK ====================
 @api_bp.route('/health', methods=['GET'])
 def health_check():
@@ -40,7 +36,53 @@ def health_check():
         'status': 'healthy',
         'service': 'IoT Car Backend',
         'version': '1.0.0',
-        'database': 'IoT'
+        'database': 'IoT',
+        'db_pool': get_pool_stats(),
+        'write_behind': write_behind.stats(),
+        'recent_events': recent_events.stats(),
+        'sequence_cache': sequence_cache.stats(),
+        'execution_engine': execution_engine.stats(),
+        'execution_index': execution_index.stats(),
+        'websocket': get_connection_stats()
+    })
+
+@api_bp.route('/stats', methods=['GET'])
+def get_stats():
+    """Totales globales y por dispositivo (contadores en memoria, sin leer filas)"""
+    try:
+        stats = stats_counters.snapshot()
+        device_id = request.args.get('device_id', type=int)
+        if device_id is not None:
+            stats = {
+                'device_id': device_id,
+                'device': stats['devices'].get(device_id) or stats_counters.device(device_id),
+                'global': stats['global'],
+                'version': stats['version']
+            }
+        return jsonify({
+            'status': 'success',
+            'data': stats
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Error al obtener estadísticas: {str(e)}'
+        }), 500
+
+@api_bp.route('/cache/catalog/invalidate', methods=['POST'])
+def invalidate_catalog_cache():
+    """Invalidar la caché de catálogos (operaciones/obstáculos)"""
+    if not is_admin_request():
+        return jsonify({
+            'status': 'error',
+            'message': 'No autorizado'
+        }), 403
+    
+    data = request.get_json(silent=True) or {}
+    catalog_cache.invalidate(data.get('catalog'))
+    return jsonify({
+        'status': 'success',
+        'message': 'Caché de catálogos invalidada'
     })
 
 # ==================== COMANDOS/CONTROL ====================
@@ -52,25 +94,13 @@ def get_commands():
 @api_bp.route('/commands', methods=['POST'])
 def send_command():
     """Enviar comando al carrito (con notificación push)"""
-    response = CarController.send_command()
-    
-    # Si el comando fue exitoso, notificar a clientes suscritos
-    if response.status_code == 201:
-        data = request.get_json()
-        id_dispositivo = data.get('id_dispositivo', 1)
-        
-        # Obtener el último comando para enviar datos completos
-        commands = CarModel.get_recent_commands(id_dispositivo, 1)
-        if commands:
-            # Convertir datetime a string
-            command_data = serialize_datetime(commands[0])
-            
-            emit_command_update(id_dispositivo, {
-                'type': 'new_command',
-                'data': command_data
-            })
-    
-    return response
+    # El controlador emite el evento completo devuelto por el INSERT
+    return CarController.send_command()
+
+@api_bp.route('/commands/batch', methods=['POST'])
+def send_commands_batch():
+    """Enviar varios comandos en una sola petición (un push agrupado por dispositivo)"""
+    return CarController.send_commands_batch()
 
 @api_bp.route('/operations', methods=['GET'])
 def get_operations():
@@ -86,25 +116,13 @@ def get_obstacles():
 @api_bp.route('/obstacles', methods=['POST'])
 def report_obstacle():
     """Reportar obstáculo detectado (con notificación push)"""
-    response = SensorController.report_obstacle()
-    
-    # Si el obstáculo fue registrado, notificar a clientes suscritos
-    if response.status_code == 201:
-        data = request.get_json()
-        id_dispositivo = data.get('id_dispositivo', 1)
-        
-        # Obtener el último obstáculo para enviar datos completos
-        obstacles = SensorModel.get_recent_obstacles(id_dispositivo, 1)
-        if obstacles:
-            # Convertir datetime a string
-            obstacle_data = serialize_datetime(obstacles[0])
-            
-            emit_obstacle_update(id_dispositivo, {
-                'type': 'new_obstacle',
-                'data': obstacle_data
-            })
-    
-    return response
+    # El controlador emite el evento completo devuelto por el INSERT
+    return SensorController.report_obstacle()
+
+@api_bp.route('/obstacles/batch', methods=['POST'])
+def report_obstacles_batch():
+    """Reportar varios obstáculos en una sola petición (un push agrupado por dispositivo)"""
+    return SensorController.report_obstacles_batch()
 
 @api_bp.route('/obstacles/catalog', methods=['GET'])
 def get_obstacles_catalog():
@@ -114,26 +132,8 @@ def get_obstacles_catalog():
 # ==================== OBSTÁCULOS MANUALES ====================
 @api_bp.route('/obstacles/manual', methods=['POST'])
 def create_manual_obstacle():
-    """Crear obstáculo manual"""
-    response = SensorController.create_manual_obstacle()
-    
-    # Si el obstáculo fue creado exitosamente, notificar a clientes suscritos
-    if response.status_code == 201:
-        data = request.get_json()
-        id_dispositivo = data.get('id_dispositivo', 1)
-        
-        # Obtener el último obstáculo manual para enviar datos completos
-        obstacles = SensorModel.get_recent_obstacles(id_dispositivo, 1)
-        if obstacles:
-            # Convertir datetime a string
-            obstacle_data = serialize_datetime(obstacles[0])
-            
-            emit_obstacle_update(id_dispositivo, {
-                'type': 'manual_obstacle_created',
-                'data': obstacle_data
-            })
-    
-    return response
+    """Crear obstáculo manual (con notificación push)"""
+    return SensorController.create_manual_obstacle()
 
 @api_bp.route('/obstacles/manual', methods=['GET'])
 def get_manual_obstacles():
@@ -149,9 +149,10 @@ def delete_manual_obstacle(obstacle_id):
     if response.status_code == 200:
         response_data = response.get_json()
         if response_data.get('status') == 'success':
-            emit_obstacle_update(1, {  # Notificar a todos los dispositivos
+            deleted = response_data['data']
+            emit_obstacle_update(deleted['id_dispositivo'], {
                 'type': 'manual_obstacle_deleted',
-                'data': {'id_evento': obstacle_id}
+                'data': deleted
             })
     
     return response
@@ -197,11 +198,9 @@ def update_sequence(id_secuencia):
         sequence = SequenceModel.get_sequence_by_id(id_secuencia)
         if sequence:
             id_dispositivo = sequence['id_dispositivo']
-            # Convertir datetime
-            sequence_data = serialize_datetime(sequence)
             emit_sequence_update(id_dispositivo, {
                 'type': 'sequence_updated',
-                'data': sequence_data
+                'data': sequence
             })
     
     return response
@@ -255,15 +254,52 @@ def update_execution_status():
     
     if response_data.get('status') == 'success':
         data = request.get_json()
-        # Aquí necesitarías obtener el id_dispositivo de la ejecución
-        # Por ahora notificaremos a todos
-        emit_execution_update(1, {
-            'type': 'execution_status_updated',
-            'data': data
-        })
+        # Sala del dispositivo de la ejecución (índice en memoria, BD si falta).
+        # El estado ya está guardado: un fallo aquí solo omite la notificación.
+        try:
+            id_ejecucion = int(data['id_ejecucion'])
+            target = execution_index.get(id_ejecucion)
+        except Exception as e:
+            print(f'⚠️ No se pudo notificar la ejecución {data.get("id_ejecucion")}: {e}')
+            target = None
+        if target:
+            id_secuencia, id_dispositivo = target
+            emit_execution_update(id_dispositivo, {
+                'type': 'execution_status_updated',
+                'data': {
+                    'id_ejecucion': id_ejecucion,
+                    'id_secuencia': id_secuencia,
+                    'estado': data['estado']
+                }
+            })
     
     return response
 
+@api_bp.route('/sequences/execution/status/batch', methods=['PUT'])
+def update_execution_statuses():
+    """Actualizar varios estados de ejecución en un solo UPDATE (con notificación push)"""
+    return SequenceController.update_execution_statuses()
+
+@api_bp.route('/sequences/execution/<int:id_ejecucion>', methods=['GET'])
+def get_execution(id_ejecucion):
+    """Estado de una ejecución dirigida por el servidor"""
+    return SequenceController.get_execution(id_ejecucion)
+
+@api_bp.route('/sequences/execution/<int:id_ejecucion>/pause', methods=['POST'])
+def pause_execution(id_ejecucion):
+    """Pausar una ejecución (el motor notifica a la sala del dispositivo)"""
+    return SequenceController.control_execution(id_ejecucion, 'pause')
+
+@api_bp.route('/sequences/execution/<int:id_ejecucion>/resume', methods=['POST'])
+def resume_execution(id_ejecucion):
+    """Reanudar una ejecución pausada"""
+    return SequenceController.control_execution(id_ejecucion, 'resume')
+
+@api_bp.route('/sequences/execution/<int:id_ejecucion>/cancel', methods=['POST'])
+def cancel_execution(id_ejecucion):
+    """Cancelar una ejecución en curso"""
+    return SequenceController.control_execution(id_ejecucion, 'cancel')
+
 # ==================== DISPOSITIVOS ====================
 @api_bp.route('/devices', methods=['GET'])
 def get_devices():
@@ -290,16 +326,34 @@ def delete_device(device_id):
 def get_device_status(device_id):
     """Obtener el último estado de un dispositivo"""
     try:
-        # Obtener el último comando
-        last_command = CarModel.get_recent_commands(device_id, 1)
-        # Obtener el último obstáculo
-        last_obstacle = SensorModel.get_recent_obstacles(device_id, 1)
+        state = device_state.get(device_id)
+        source = 'memory'
+        
+        # Fallo en frío: leer de la BD una sola vez y cargar el registro
+        if state is None:
+            results = fan_out({
+                'last_command': (CarModel.get_recent_commands, (device_id, 1)),
+                'last_obstacle': (SensorModel.get_recent_obstacles, (device_id, 1))
+            })
+            last_command = results['last_command']
+            last_obstacle = results['last_obstacle']
+            device_state.warm(
+                device_id,
+                last_command[0] if last_command else None,
+                last_obstacle[0] if last_obstacle else None
+            )
+            state = device_state.get(device_id)
+            source = 'database'
         
         status_data = {
-            'last_command': last_command[0] if last_command else None,
-            'last_obstacle': last_obstacle[0] if last_obstacle else None,
-            'current_status': 'online',  # Podrías determinar esto basado en conexiones activas
-            'timestamp': datetime.now().isoformat()
+            'last_command': state['last_command'],
+            'last_obstacle': state['last_obstacle'],
+            'current_status': state['current_status'],
+            'last_seen': state['last_seen'],
+            'subscribers': state['subscribers'],
+            'control': state['control'],
+            'source': source,
+            'timestamp': datetime.now()
         }
         
         return jsonify({
@@ -307,37 +361,92 @@ def get_device_status(device_id):
             'data': status_data
         }), 200
         
+    except QueryTimeoutError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 504
+        
     except Exception as e:
         return jsonify({
             'status': 'error',
             'message': f'Error al obtener estado: {str(e)}'
         }), 500
 
+@api_bp.route('/devices/<int:device_id>/subscribers', methods=['GET'])
+def get_device_subscribers(device_id):
+    """Número de clientes Socket.IO suscritos al dispositivo"""
+    return jsonify({
+        'status': 'success',
+        'data': {
+            'id_dispositivo': device_id,
+            'subscribers': get_subscriber_count(device_id)
+        }
+    }), 200
+
 # ==================== SINCROnIZACIÓN ====================
 @api_bp.route('/sync/status', methods=['GET'])
 def get_sync_status():
-    """Obtener estado completo para sincronización"""
+    """Obtener estado para sincronización (completo o incremental con ?since=token)"""
     try:
         device_id = request.args.get('device_id', 1, type=int)
+        since = request.args.get('since')
+        
+        # Sincronización incremental: solo los eventos posteriores al token
+        if since:
+            events, sync_token = change_log.changes_since(
+                since, device_id, global_events=('sequence_update', 'device_update')
+            )
+            if events is not None:
+                return jsonify({
+                    'status': 'success',
+                    'data': {
+                        'full': False,
+                        'changed': bool(events),
+                        'events': events,
+                        'sync_token': sync_token,
+                        'system_status': 'online',
+                        'timestamp': datetime.now()
+                    }
+                }), 200
+            # Token desconocido o demasiado antiguo: enviar estado completo
         
-        # Obtener datos actualizados
-        devices = CarModel.get_devices()
-        commands = CarModel.get_recent_commands(device_id, 20)
-        obstacles = SensorModel.get_recent_obstacles(device_id, 20)
-        sequences = SequenceModel.get_sequences(10)
+        # El token se toma antes de consultar: lo escrito durante las consultas
+        # llegará también en el siguiente delta (duplicado, nunca perdido)
+        sync_token = change_log.current_token()
+        
+        # Obtener datos actualizados (consultas independientes en paralelo)
+        results = fan_out({
+            'devices': (CarModel.get_devices, ()),
+            'commands': (CarModel.get_recent_commands, (device_id, 20)),
+            'obstacles': (SensorModel.get_recent_obstacles, (device_id, 20)),
+            'sequences': (SequenceModel.get_sequences, (10,))
+        })
+        devices = results['devices']
+        commands = results['commands']
+        obstacles = results['obstacles']
+        sequences = results['sequences']
         
         return jsonify({
             'status': 'success',
             'data': {
+                'full': True,
                 'devices': devices,
                 'recent_commands': commands,
                 'recent_obstacles': obstacles,
                 'sequences': sequences,
+                'sync_token': sync_token,
                 'system_status': 'online',
-                'timestamp': datetime.now().isoformat()
+                'timestamp': datetime.now()
             }
         }), 200
         
+    except QueryTimeoutError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 504
+        
     except Exception as e:
         return jsonify({
             'status': 'error',
@@ -349,10 +458,18 @@ def get_sync_status():
 def commands_options():
     return '', 204
 
+@api_bp.route('/commands/batch', methods=['OPTIONS'])
+def commands_batch_options():
+    return '', 204
+
 @api_bp.route('/obstacles', methods=['OPTIONS'])
 def obstacles_options():
     return '', 204
 
+@api_bp.route('/obstacles/batch', methods=['OPTIONS'])
+def obstacles_batch_options():
+    return '', 204
+
 @api_bp.route('/obstacles/manual', methods=['OPTIONS'])
 def manual_obstacles_options():
     return '', 204
@@ -369,6 +486,14 @@ def sequence_options(id_secuencia):
 def execute_options(id_secuencia):
     return '', 204
 
+@api_bp.route('/sequences/execution/status/batch', methods=['OPTIONS'])
+def execution_status_batch_options():
+    return '', 204
+
+@api_bp.route('/sequences/execution/<int:id_ejecucion>/<action>', methods=['OPTIONS'])
+def execution_control_options(id_ejecucion, action):
+    return '', 204
+
 @api_bp.route('/sync/status', methods=['OPTIONS'])
 def sync_status_options():
     return '', 204
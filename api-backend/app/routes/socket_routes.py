@@ -0,0 +1,38 @@
+from flask import request
+from app.config.websocket import socketio
+from app.controllers.car_controller import CarController
+from app.controllers.sensor_controller import SensorController
+from app.controllers.helpers import extract_batch_items
+
+# ==================== INGESTA DESDE DISPOSITIVOS ====================
+# Los carros pueden reportar por la misma conexión Socket.IO en lugar de un POST
+# por evento. Cada mensaje admite un evento, una lista o {'commands'/'obstacles': [...]};
+# la respuesta llega en el callback (ack) con el mismo cuerpo que el endpoint batch.
+
+def _ingest(data, key, ingest):
+    if isinstance(data, dict) and key not in data:
+        items = [data]
+    else:
+        items = extract_batch_items(data, key)
+
+    try:
+        body, status_code = ingest(items)
+    except Exception as e:
+        print(f'❌ Error en ingesta Socket.IO de {request.sid}: {e}')
+        body, status_code = {
+            'status': 'error',
+            'message': f'Error al registrar eventos: {str(e)}'
+        }, 500
+
+    body['code'] = status_code
+    return body
+
+@socketio.on('report_command')
+def handle_report_command(data):
+    """Uno o varios comandos del dispositivo"""
+    return _ingest(data, 'commands', CarController.ingest_commands)
+
+@socketio.on('report_obstacle')
+def handle_report_obstacle(data):
+    """Uno o varios obstáculos detectados por el dispositivo"""
+    return _ingest(data, 'obstacles', SensorController.ingest_obstacles)
@@ -0,0 +1,100 @@
+"""Micro-benchmark de la serialización JSON de eventos.
+
+Compara el camino anterior (serialize_datetime + json.dumps) con el proveedor
+de app/config/json_provider.py y muestra el coste por fila.
+
+    python bench_json.py [filas] [repeticiones]
+"""
+import json
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+from app.config import json_provider
+
+
+def legacy_serialize_datetime(data):
+    """Copia del serialize_datetime que tenía app/routes/api_routes.py (referencia)"""
+    if isinstance(data, dict):
+        result = {}
+        for key, value in data.items():
+            if isinstance(value, datetime):
+                result[key] = value.strftime('%Y-%m-%d %H:%M:%S')
+            elif isinstance(value, dict):
+                result[key] = legacy_serialize_datetime(value)
+            elif isinstance(value, list):
+                result[key] = [legacy_serialize_datetime(item) if isinstance(item, dict) else item for item in value]
+            else:
+                result[key] = value
+        return result
+    return data
+
+
+UBICACIONES = ('frente', 'atras', 'izquierda', 'derecha', 'retroceso')
+
+
+def make_rows(count):
+    """Filas con la forma del JOIN del historial (ho.*, status_texto, nombre_dispositivo)"""
+    base = datetime(2024, 5, 1, 13, 45, 10)
+    rows = []
+    for i in range(count):
+        if i % 2:
+            rows.append({
+                'id_evento': i,
+                'id_dispositivo': i % 10,
+                'status_operacion': 1,
+                'fecha_hora': base + timedelta(seconds=i),
+                'status_texto': 'Adelante',
+                'nombre_dispositivo': f'Carrito {i % 10}'
+            })
+        else:
+            rows.append({
+                'id_evento': i,
+                'id_dispositivo': i % 10,
+                'status_obstaculo': 3,
+                'ubicacion': UBICACIONES[i % len(UBICACIONES)],
+                'descripcion': '',
+                'tipo': 'manual' if i % 10 == 0 else 'automatico',
+                'fecha_hora': base + timedelta(seconds=i),
+                'status_texto': 'Obstáculo al frente',
+                'nombre_dispositivo': f'Carrito {i % 10}'
+            })
+    return rows
+
+
+def legacy(payload):
+    return json.dumps(legacy_serialize_datetime(payload), separators=(',', ':'))
+
+
+def current(payload):
+    return json_provider.dumps(payload)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    number = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    events = make_rows(rows)
+
+    print(f'Backend JSON: {json_provider.JSON_BACKEND}')
+    print(f'Filas por evento: {rows}, repeticiones: {number}\n')
+
+    cases = [
+        ('evento simple', {'type': 'new_command', 'data': events[1]}, 1),
+        ('evento batch', {'type': 'new_obstacle_batch', 'data': events}, rows)
+    ]
+    for name, payload, row_count in cases:
+        results = {}
+        for label, fn in (('serialize_datetime + json', legacy), (json_provider.JSON_BACKEND, current)):
+            best = min(timeit.repeat(lambda: fn(payload), number=number, repeat=5))
+            results[label] = best / number / row_count * 1e6
+        legacy_cost, current_cost = results.values()
+        print(f'{name}:')
+        for label, cost in results.items():
+            print(f'  {label:<28} {cost:8.3f} µs/fila')
+        print(f'  mejora                       {legacy_cost / current_cost:8.1f}x\n')
+
+    print('Ejemplo:', current({'data': events[0]}))
+
+
+if __name__ == '__main__':
+    main()
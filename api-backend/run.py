@@ -1,8 +1,42 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Modo de concurrencia: 'threading' (desarrollo), 'eventlet' o 'gevent' (producción).
+# En los modos cooperativos hay que parchear la stdlib ANTES de importar la app:
+# así los sockets de PyMySQL, los locks del pool y los hilos de fondo pasan a ser
+# cooperativos y una consulta lenta no bloquea al resto de clientes.
+ASYNC_MODE = os.getenv('SOCKETIO_ASYNC_MODE', 'threading')
+
+if ASYNC_MODE == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+elif ASYNC_MODE == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+
 from app import create_app, socketio
 
 # Creamos la app Flask desde la función fábrica
 app = create_app()
 
 if __name__ == "__main__":
-    print("🚀 Servidor corriendo en http://0.0.0.0:5500 (usando gevent y SocketIO)")
-    socketio.run(app, host="0.0.0.0", port=5500, debug=True, allow_unsafe_werkzeug=True)
+    host = os.getenv('HOST', '0.0.0.0')
+    port = int(os.getenv('PORT', 5500))
+    debug = os.getenv('FLASK_DEBUG', 'false').lower() == 'true'
+
+    print(f"🚀 Servidor corriendo en http://{host}:{port} (usando {ASYNC_MODE} y SocketIO)")
+    if ASYNC_MODE == 'threading':
+        # Servidor de desarrollo de Werkzeug: un hilo del SO por cliente
+        socketio.run(app, host=host, port=port, debug=debug, allow_unsafe_werkzeug=True)
+    else:
+        # Servidor WSGI cooperativo con un tope de conexiones simultáneas
+        max_connections = int(os.getenv('SOCKETIO_MAX_CONNECTIONS', 10000))
+        if ASYNC_MODE == 'eventlet':
+            server_options = {'max_size': max_connections}
+        else:
+            from gevent.pool import Pool
+            server_options = {'spawn': Pool(max_connections)}
+        socketio.run(app, host=host, port=port, debug=debug, use_reloader=False,
+                     log_output=debug, **server_options)
@@ -0,0 +1,80 @@
+from app.config.change_log import ChangeLog
+
+
+def test_token_returns_only_newer_events():
+    log = ChangeLog()
+    log.record('command_update', 1, {'n': 1})
+    token = log.current_token()
+    log.record('command_update', 1, {'n': 2})
+    log.record('obstacle_update', 1, {'n': 3})
+
+    events, new_token = log.changes_since(token)
+
+    assert [e['payload']['n'] for e in events] == [2, 3]
+    assert new_token == log.current_token()
+    assert log.changes_since(new_token) == ([], new_token)
+
+
+def test_events_are_filtered_by_device_except_global_ones():
+    log = ChangeLog()
+    token = log.current_token()
+    log.record('command_update', 1, {})
+    log.record('command_update', 2, {})
+    log.record('device_update', 2, {})
+    log.record('sequence_update', None, {})
+
+    events, _ = log.changes_since(token, device_id=1, global_events=('device_update',))
+
+    assert [(e['event'], e['device_id']) for e in events] == [
+        ('command_update', 1),
+        ('device_update', 2),
+        ('sequence_update', None)
+    ]
+
+
+def test_unknown_or_foreign_token_forces_full_sync():
+    log = ChangeLog()
+    log.record('command_update', 1, {})
+
+    assert log.changes_since(None)[0] is None
+    assert log.changes_since('basura')[0] is None
+    assert log.changes_since('otroepoch-1')[0] is None
+    # Secuencia futura: el token viene de un estado que este proceso no conoce
+    assert log.changes_since(f'{log.epoch}-99')[0] is None
+
+
+def test_token_older_than_buffer_forces_full_sync():
+    log = ChangeLog(max_entries=3)
+    token = log.current_token()
+    for n in range(5):
+        log.record('command_update', 1, {'n': n})
+
+    assert log.changes_since(token)[0] is None
+    # El evento justo anterior al más antiguo conservado todavía es válido
+    events, _ = log.changes_since(f'{log.epoch}-2')
+    assert [e['payload']['n'] for e in events] == [2, 3, 4]
+
+
+def test_shared_sequence_adopts_epoch_and_detects_gaps():
+    log = ChangeLog()
+    log.record('command_update', 1, {}, epoch='abc', seq=10)
+    log.record('command_update', 1, {}, epoch='abc', seq=11)
+
+    assert log.current_token() == 'abc-11'
+    # Lo anterior al primer evento recibido puede faltar
+    assert log.changes_since('abc-8')[0] is None
+    assert len(log.changes_since('abc-9')[0]) == 2
+
+    # Hueco por reconexión: los tokens anteriores al hueco ya no son fiables
+    log.record('command_update', 1, {}, epoch='abc', seq=15)
+    assert log.changes_since('abc-11')[0] is None
+    assert len(log.changes_since('abc-14')[0]) == 1
+
+
+def test_new_shared_epoch_discards_previous_entries():
+    log = ChangeLog()
+    log.record('command_update', 1, {}, epoch='abc', seq=1)
+    log.record('command_update', 1, {}, epoch='def', seq=1)
+
+    assert log.changes_since('abc-1')[0] is None
+    assert log.current_token() == 'def-1'
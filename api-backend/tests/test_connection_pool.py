@@ -0,0 +1,156 @@
+import threading
+import time
+
+import pytest
+
+from app.config.database import ConnectionPool, PoolTimeoutError
+
+
+class FakeConnection:
+    """Conexión mínima con la interfaz de PyMySQL que usa el pool"""
+
+    def __init__(self):
+        self.open = True
+        self.in_transaction = False
+        self.rollbacks = 0
+        self.fail_rollback = False
+
+    def get_transaction_status(self):
+        return self.in_transaction
+
+    def rollback(self):
+        if self.fail_rollback:
+            raise ConnectionError('conexión perdida')
+        self.in_transaction = False
+        self.rollbacks += 1
+
+    def ping(self, reconnect=False):
+        if not self.open:
+            raise ConnectionError('conexión cerrada')
+
+    def close(self):
+        self.open = False
+
+
+class FakePool(ConnectionPool):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.opened = []
+
+    def _connect(self):
+        conn = FakeConnection()
+        self.opened.append(conn)
+        return conn
+
+
+def wait_for(condition, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_acquire_times_out_when_pool_is_full():
+    pool = FakePool(min_size=0, max_size=1, timeout=0.05)
+    pool.acquire()
+
+    started = time.monotonic()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+
+    assert time.monotonic() - started >= 0.05
+    stats = pool.stats()
+    assert stats['timeouts'] == 1
+    assert stats['in_use'] == 1
+
+
+def test_waiter_receives_released_connection():
+    pool = FakePool(min_size=0, max_size=1, timeout=1)
+    conn = pool.acquire()
+    threading.Timer(0.05, pool.release, args=(conn,)).start()
+
+    assert pool.acquire() is conn
+    stats = pool.stats()
+    assert stats['waits'] == 1
+    assert stats['total_created'] == 1
+
+
+def test_idle_connections_are_reused_lifo():
+    pool = FakePool(min_size=0, max_size=2)
+    first, second = pool.acquire(), pool.acquire()
+    pool.release(first)
+    pool.release(second)
+
+    assert pool.acquire() is second
+
+
+def test_connection_past_max_lifetime_is_recycled():
+    pool = FakePool(min_size=0, max_size=1, max_lifetime=0.05)
+    old = pool.acquire()
+    pool.release(old)
+    time.sleep(0.06)
+
+    new = pool.acquire()
+    assert new is not old
+    assert not old.open
+    assert pool.stats()['total_recycled'] == 1
+
+
+def test_dead_idle_connection_is_replaced_on_checkout():
+    pool = FakePool(min_size=0, max_size=1, ping_interval=0)
+    old = pool.acquire()
+    pool.release(old)
+    old.open = False
+
+    assert pool.acquire() is not old
+    assert pool.stats()['total_recycled'] == 1
+
+
+def test_release_rolls_back_open_transaction():
+    pool = FakePool(min_size=0, max_size=1)
+    conn = pool.acquire()
+    conn.in_transaction = True
+    pool.release(conn)
+
+    assert conn.rollbacks == 1
+    assert pool.acquire() is conn
+    assert pool.stats()['rollbacks'] == 1
+
+
+def test_release_discards_connection_when_rollback_fails():
+    pool = FakePool(min_size=0, max_size=1)
+    conn = pool.acquire()
+    conn.in_transaction = True
+    conn.fail_rollback = True
+    pool.release(conn)
+
+    assert not conn.open
+    assert pool.acquire() is not conn
+
+
+def test_warm_up_opens_min_size():
+    pool = FakePool(min_size=3, max_size=5)
+    pool.warm_up()
+
+    stats = pool.stats()
+    assert stats['idle'] == 3
+    assert stats['total_created'] == 3
+
+
+def test_min_size_is_restored_after_discard():
+    pool = FakePool(min_size=2, max_size=4)
+    pool.warm_up()
+    conn = pool.acquire()
+    pool.release(conn, discard=True)
+
+    assert wait_for(lambda: pool.stats()['idle'] == 2)
+    assert pool.stats()['total_created'] == 3
+
+
+def test_min_size_never_exceeds_max_size():
+    pool = FakePool(min_size=5, max_size=2)
+    pool.warm_up()
+
+    assert pool.stats()['idle'] == 2
@@ -0,0 +1,130 @@
+import time
+
+import pytest
+from flask import Flask
+
+from app.config.execution_engine import ExecutionEngine
+from app.models.sequence_model import SequenceModel
+
+
+class FakeEngine(ExecutionEngine):
+    """Motor sin Socket.IO: guarda los eventos emitidos y se avanza a mano
+    llamando a _dispatch_due"""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('step_interval', 0.01)
+        super().__init__(enabled=True, **kwargs)
+        self.events = []
+        self._app = Flask(__name__)
+
+    def _emit(self, id_dispositivo, payload):
+        self.events.append((id_dispositivo, payload))
+
+    def run_for(self, seconds):
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            self._dispatch_due()
+            time.sleep(0.005)
+
+    def steps(self):
+        return [p['data']['status_operacion'] for _, p in self.events if p['type'] == 'execution_step']
+
+
+@pytest.fixture
+def saved(monkeypatch):
+    """Estados escritos en la BD por _flush_states"""
+    writes = []
+    monkeypatch.setattr(SequenceModel, 'update_execution_statuses',
+                        staticmethod(lambda pending: writes.append(dict(pending))))
+    return writes
+
+
+def test_steps_are_dispatched_in_order_then_completed(saved):
+    engine = FakeEngine()
+    engine.submit(1, 10, 3, [1, 2, 3])
+
+    engine.run_for(0.1)
+
+    assert engine.steps() == [1, 2, 3]
+    assert engine.get(1) is None
+    assert engine.stats()['completed'] == 1
+    engine._flush_states()
+    assert saved == [{1: 'completado'}]
+
+
+def test_pause_and_resume_continue_from_the_same_step(saved):
+    engine = FakeEngine(step_interval=0.02)
+    engine.submit(1, 10, 3, [1, 2, 3, 4])
+    engine.run_for(0.03)
+    assert engine.pause(1)['estado'] == 'pausado'
+    dispatched = engine.steps()
+
+    engine.run_for(0.08)
+    assert engine.steps() == dispatched
+
+    assert engine.resume(1)['estado'] == 'progreso'
+    engine.run_for(0.15)
+    assert engine.steps() == [1, 2, 3, 4]
+    assert engine.get(1) is None
+
+
+def test_pause_expires_after_max_pause(saved):
+    engine = FakeEngine(step_interval=0.02, max_pause=0.03)
+    engine.submit(1, 10, 3, [1, 2, 3])
+    engine.pause(1)
+
+    engine.run_for(0.06)
+
+    assert engine.get(1) is None
+    assert engine.resume(1) is None
+    assert engine.stats()['expired_pauses'] == 1
+    engine._flush_states()
+    assert saved == [{1: 'cancelado'}]
+
+
+def test_pause_and_resume_reject_invalid_states(saved):
+    engine = FakeEngine(step_interval=1)
+    engine.submit(1, 10, 3, [1])
+
+    assert engine.resume(1) is None
+    assert engine.pause(1) is not None
+    assert engine.pause(1) is None
+    assert engine.apply_control(2, 'pause') is None
+
+
+def test_cancel_stops_dispatching(saved):
+    engine = FakeEngine(step_interval=0.02)
+    engine.submit(1, 10, 3, [1, 2, 3])
+
+    assert engine.apply_control(1, 'cancel')['estado'] == 'cancelado'
+    engine.run_for(0.1)
+
+    assert engine.steps() == []
+    assert engine.cancel(1) is None
+
+
+def test_failed_flush_keeps_states_for_the_next_cycle(monkeypatch):
+    engine = FakeEngine()
+    engine.submit(1, 10, 3, [1])
+    engine.cancel(1)
+
+    def fail(pending):
+        raise RuntimeError('BD caída')
+    monkeypatch.setattr(SequenceModel, 'update_execution_statuses', staticmethod(fail))
+    engine._flush_states()
+
+    assert engine.stats()['write_errors'] == 1
+    assert engine.stats()['pending_state_writes'] == 1
+
+
+def test_shutdown_cancels_active_executions_and_flushes(saved):
+    engine = FakeEngine(step_interval=1)
+    engine.submit(1, 10, 3, [1, 2])
+    engine.submit(2, 11, 4, [1])
+    engine.pause(2)
+
+    engine.shutdown()
+
+    assert engine.stats()['active'] == 0
+    assert engine.stats()['timers'] == 0
+    assert saved == [{1: 'cancelado', 2: 'cancelado'}]
@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config.catalog_cache import catalog_cache
+from app.config.recent_events import RecentEventsCache, RingBuffer, CommandRecord
+
+BASE = datetime(2024, 5, 1, 12, 0, 0)
+
+
+def command(id_evento, id_dispositivo=1, seconds=None):
+    return {
+        'id_evento': id_evento,
+        'id_dispositivo': id_dispositivo,
+        'status_operacion': 1,
+        'fecha_hora': BASE + timedelta(seconds=id_evento if seconds is None else seconds)
+    }
+
+
+@pytest.fixture(autouse=True)
+def catalogs(monkeypatch):
+    # Los textos de cada fila salen del catálogo: sin BD en los tests
+    monkeypatch.setattr(catalog_cache, '_loaders', {
+        'operaciones': lambda: {1: 'Adelante'},
+        'obstaculos': lambda: {1: 'Obstáculo adelante'},
+        'dispositivos': lambda: {1: 'Carrito 1', 2: 'Carrito 2', 3: 'Carrito 3'}
+    })
+    catalog_cache.invalidate()
+    yield
+    catalog_cache.invalidate()
+
+
+def ids(rows):
+    return [row['id_evento'] for row in rows]
+
+
+def test_ring_buffer_keeps_newest_in_order():
+    ring = RingBuffer(3)
+    for id_evento in range(1, 6):
+        ring.push(CommandRecord(command(id_evento)))
+
+    assert [r.id_evento for r in ring.newest_first()] == [5, 4, 3]
+    assert [r.id_evento for r in ring.newest_first(2)] == [5, 4]
+
+
+def test_ring_buffer_reorders_late_events():
+    ring = RingBuffer(3)
+    ring.push(CommandRecord(command(1)))
+    ring.push(CommandRecord(command(3)))
+    ring.push(CommandRecord(command(2)))
+
+    assert [r.id_evento for r in ring.newest_first()] == [3, 2, 1]
+
+
+def test_cold_device_is_a_miss_until_warmed():
+    cache = RecentEventsCache(capacity=5)
+
+    assert cache.get('command', 1, 3) is None
+    cache.begin_warm(1)
+    cache.warm('command', 1, [command(2), command(1)])
+
+    assert ids(cache.get('command', 1, 3)) == [2, 1]
+    assert cache.stats()['misses'] == 1
+    assert cache.stats()['hits'] == 1
+
+
+def test_writes_during_warm_up_are_merged():
+    cache = RecentEventsCache(capacity=3)
+    cache.begin_warm(1)
+    # Llega una escritura mientras se lee la BD (puede estar también en la lectura)
+    cache.record('command', command(4))
+    cache.warm('command', 1, [command(3), command(2), command(1)])
+
+    assert ids(cache.get('command', 1, 3)) == [4, 3, 2]
+
+
+def test_writes_to_uncached_devices_are_ignored():
+    cache = RecentEventsCache(capacity=3)
+    cache.record('command', command(1, id_dispositivo=2))
+
+    assert cache.stats()['devices'] == 0
+
+
+def test_complete_history_serves_any_limit():
+    cache = RecentEventsCache(capacity=5)
+    cache.begin_warm(1)
+    cache.warm('command', 1, [command(1), command(2)])
+
+    # La BD devolvió menos filas que la capacidad: no hay más historial
+    assert ids(cache.get('command', 1, 5)) == [2, 1]
+
+
+def test_partial_history_misses_beyond_cached_rows():
+    cache = RecentEventsCache(capacity=2)
+    cache.begin_warm(1)
+    cache.warm('command', 1, [command(3), command(2)])
+    cache.record('command', command(4))
+
+    assert ids(cache.get('command', 1, 2)) == [4, 3]
+    # La BD devolvió tantas filas como la capacidad: puede haber más historial
+    assert cache.get('command', 1, 3) is None
+
+
+def test_least_recently_used_device_is_evicted():
+    cache = RecentEventsCache(capacity=2, max_devices=2)
+    for device_id in (1, 2):
+        cache.begin_warm(device_id)
+        cache.warm('command', device_id, [command(device_id, id_dispositivo=device_id)])
+    # Leer el 1 lo convierte en el más reciente: sale el 2
+    cache.get('command', 1, 1)
+    cache.begin_warm(3)
+
+    assert cache.get('command', 2, 1) is None
+    assert cache.get('command', 1, 1) is not None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_clear_forces_reload():
+    cache = RecentEventsCache(capacity=2)
+    cache.begin_warm(1)
+    cache.warm('command', 1, [command(1)])
+    cache.clear()
+
+    assert cache.get('command', 1, 1) is None
+
+
+def test_disabled_cache_never_serves():
+    cache = RecentEventsCache(enabled=False, capacity=2)
+    cache.begin_warm(1)
+    cache.warm('command', 1, [command(1)])
+
+    assert cache.get('command', 1, 1) is None
@@ -0,0 +1,53 @@
+from app.models.sequence_model import SequenceModel
+
+
+def test_identical_sequence_has_no_changes():
+    stored = {1: 1, 2: 2, 3: 3}
+
+    assert SequenceModel.diff_operations(stored, [1, 2, 3]) == ([], [], [])
+
+
+def test_changed_steps_are_reported_by_position():
+    stored = {1: 1, 2: 2, 3: 3}
+
+    inserted, removed, changed = SequenceModel.diff_operations(stored, [1, 5, 3])
+
+    assert inserted == []
+    assert removed == []
+    assert changed == [(2, 5)]
+
+
+def test_longer_sequence_inserts_new_positions():
+    stored = {1: 1, 2: 2}
+
+    inserted, removed, changed = SequenceModel.diff_operations(stored, [1, 2, 4, 5])
+
+    assert inserted == [(3, 4), (4, 5)]
+    assert removed == []
+    assert changed == []
+
+
+def test_shorter_sequence_removes_trailing_positions():
+    stored = {1: 1, 2: 2, 3: 3, 4: 4}
+
+    inserted, removed, changed = SequenceModel.diff_operations(stored, [1, 6])
+
+    assert inserted == []
+    assert sorted(removed) == [3, 4]
+    assert changed == [(2, 6)]
+
+
+def test_empty_stored_sequence_inserts_everything():
+    inserted, removed, changed = SequenceModel.diff_operations({}, [3, 1])
+
+    assert inserted == [(1, 3), (2, 1)]
+    assert removed == []
+    assert changed == []
+
+
+def test_empty_new_sequence_removes_everything():
+    inserted, removed, changed = SequenceModel.diff_operations({1: 1, 2: 2}, [])
+
+    assert inserted == []
+    assert sorted(removed) == [1, 2]
+    assert changed == []
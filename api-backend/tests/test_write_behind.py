@@ -0,0 +1,121 @@
+import time
+
+import pymysql
+import pytest
+from flask import Flask
+
+from app.config.write_behind import (
+    WriteBehindQueue,
+    WriteBehindFullError,
+    WriteBehindUnavailableError
+)
+
+
+def command(id_dispositivo, status_operacion=1):
+    return ('command', (id_dispositivo, status_operacion, None), time.monotonic())
+
+
+class FakeInsertQueue(WriteBehindQueue):
+    """Sustituye el INSERT real: las filas del dispositivo 0 violan la FK y
+    db_down (o down_after intentos) simula la BD caída"""
+
+    def __init__(self, **kwargs):
+        super().__init__(enabled=True, **kwargs)
+        self.db_down = False
+        self.down_after = None
+        self.inserts = 0
+
+    def _insert(self, db, batch):
+        self.inserts += 1
+        if self.down_after is not None and self.inserts > self.down_after:
+            self.db_down = True
+        if self.db_down:
+            raise pymysql.err.OperationalError(2003, "Can't connect to MySQL server")
+        if any(row[0] == 0 for _, row, _ in batch):
+            raise pymysql.err.IntegrityError(1452, 'Cannot add or update a child row')
+        return [{'id_dispositivo': row[0]} for _, row, _ in batch], []
+
+
+def test_invalid_row_is_isolated_without_dropping_the_rest():
+    wb = FakeInsertQueue()
+    batch = [command(1), command(0), command(2), command(3)]
+
+    commands, obstacles, pending = wb._write(None, batch)
+
+    assert [c['id_dispositivo'] for c in commands] == [1, 2, 3]
+    assert pending == []
+    assert wb.stats()['failed_rows'] == 1
+
+
+def test_transient_error_keeps_rows_pending():
+    wb = FakeInsertQueue()
+    wb.db_down = True
+    batch = [command(1), command(2)]
+
+    commands, obstacles, pending = wb._write(None, batch)
+
+    assert commands == []
+    assert pending == batch
+    # Un error de conexión no se atribuye a las filas: no se parte el lote
+    assert wb.inserts == 1
+    assert wb.stats()['failed_rows'] == 0
+
+
+def test_outage_during_split_returns_unwritten_rows():
+    wb = FakeInsertQueue()
+    # Intentos: lote completo, [1, 0], [1] confirmado y la BD cae antes de [0]
+    wb.down_after = 3
+    batch = [command(1), command(0), command(2), command(3)]
+
+    commands, obstacles, pending = wb._write(None, batch)
+
+    assert [c['id_dispositivo'] for c in commands] == [1]
+    assert pending == batch[1:]
+
+
+def test_flush_retries_until_database_is_back():
+    wb = WriteBehindQueue(enabled=True, retry_initial=0.001, retry_max=0.002)
+    wb._app = Flask(__name__)
+    batch = [command(1), command(2)]
+    attempts = []
+
+    def flush_batch(rows):
+        attempts.append(list(rows))
+        return rows if len(attempts) < 3 else []
+
+    wb._flush_batch = flush_batch
+    wb._flush(batch)
+
+    assert attempts == [batch, batch, batch]
+    stats = wb.stats()
+    assert stats['retries'] == 2
+    assert stats['retrying_rows'] == 0
+    assert stats['failed_rows'] == 0
+
+
+def test_rows_are_only_dropped_when_stopping_during_outage():
+    wb = WriteBehindQueue(enabled=True, retry_initial=0.001)
+    wb._app = Flask(__name__)
+    wb._flush_batch = lambda rows: rows
+    wb._stopping.set()
+
+    wb._flush([command(1), command(2)])
+
+    assert wb.stats()['failed_rows'] == 2
+
+
+def test_put_requires_running_writer():
+    wb = WriteBehindQueue(enabled=True)
+
+    with pytest.raises(WriteBehindUnavailableError):
+        wb.submit_command(1, 1, None)
+
+
+def test_full_queue_rejects_new_rows():
+    wb = WriteBehindQueue(enabled=True, max_queue=1)
+    wb._thread = type('AliveThread', (), {'is_alive': lambda self: True})()
+
+    wb.submit_command(1, 1, None)
+    with pytest.raises(WriteBehindFullError):
+        wb.submit_command(1, 2, None)
+    assert wb.stats()['rejected'] == 1
@@ -22,6 +22,8 @@ class CarMonitoringApp {
         this.currentCarStatus = 'desconectado';
         this.statusUpdateTime = null;
         this.isDemoRunning = false;
+        this.snapshotReceived = false;
+        this.restFallbackLoaded = false;
         
         this.initializeApp();
     }
@@ -191,8 +193,8 @@ class CarMonitoringApp {
                 this.currentCarStatus = 'connected';
                 this.renderCurrentStatus();
                 
-                // Suscribirse al dispositivo actual
-                this.socket.emit('subscribe_device', { device_id: this.currentDevice });
+                // Suscribirse al dispositivo actual pidiendo el snapshot de estado
+                this.socket.emit('subscribe_device', { device_id: this.currentDevice, snapshot: true });
                 
                 // Configurar sincronización de estado
                 this.setupStatusSync();
@@ -216,6 +218,9 @@ class CarMonitoringApp {
                 // Actualizar estado del carro
                 this.currentCarStatus = 'error';
                 this.renderCurrentStatus();
+                
+                // Sin Socket.IO no llega el snapshot: cargar historial y contadores por REST
+                this.loadRestFallback();
             });
 
             // ==================== ESCUCHAR EVENTOS DEL APP CONTROL ====================
@@ -229,6 +234,14 @@ class CarMonitoringApp {
                     this.handleCommandUpdate(data.data);
                     this.updateLastMovement(data.data); // Actualizar último movimiento
                 }
+
+                // Lote de comandos agrupado por el servidor
+                if (data.type === 'new_command_batch' && Array.isArray(data.data)) {
+                    data.data.forEach((command) => this.handleCommandUpdate(command));
+                    if (data.data.length > 0) {
+                        this.updateLastMovement(data.data[data.data.length - 1]);
+                    }
+                }
             });
 
             // Obstáculos
@@ -240,6 +253,14 @@ class CarMonitoringApp {
                     this.handleObstacleUpdate(data.data);
                     this.updateLastObstacle(data.data); // Actualizar último obstáculo
                 }
+
+                // Lote de obstáculos agrupado por el servidor
+                if (data.type === 'new_obstacle_batch' && Array.isArray(data.data)) {
+                    data.data.forEach((obstacle) => this.handleObstacleUpdate(obstacle));
+                    if (data.data.length > 0) {
+                        this.updateLastObstacle(data.data[data.data.length - 1]);
+                    }
+                }
             });
 
             // Secuencias
@@ -269,6 +290,13 @@ class CarMonitoringApp {
                 }
             });
 
+            // Frames agrupados por el servidor: reenviar cada evento a su manejador
+            this.socket.on('batch_update', (batch) => {
+                (batch.events || []).forEach(({ event, data }) => {
+                    this.socket.listeners(event).forEach((handler) => handler(data));
+                });
+            });
+
             // Sincronización de estado con app control
             this.socket.on('monitoring_sync', (data) => {
                 if (data.type === 'status_update') {
@@ -285,6 +313,14 @@ class CarMonitoringApp {
                 this.addRealTimeMessage(`✅ ${data.message}`, 'system');
             });
 
+            this.socket.on('device_snapshot', (data) => {
+                this.applySnapshot(data);
+            });
+
+            this.socket.on('stats_update', (data) => {
+                this.applyStats(data);
+            });
+
         } catch (error) {
             console.error('Socket.IO connection error:', error);
             this.showNotification('Error al conectar Socket.IO', 'danger');
@@ -365,11 +401,11 @@ class CarMonitoringApp {
             // Cambiar suscripción en WebSocket
             if (this.socket && this.socket.connected) {
                 this.socket.emit('unsubscribe_device', { device_id: oldDevice });
-                this.socket.emit('subscribe_device', { device_id: this.currentDevice });
+                this.socket.emit('subscribe_device', { device_id: this.currentDevice, snapshot: true });
+            } else {
+                this.loadMovementsHistory();
+                this.loadObstaclesHistory();
             }
-            
-            this.loadMovementsHistory();
-            this.loadObstaclesHistory();
             this.showNotification(`Cambiado a: ${e.target.options[e.target.selectedIndex].text}`, 'info');
             
             // Resetear estado al cambiar dispositivo
@@ -384,13 +420,64 @@ class CarMonitoringApp {
     }
 
     async loadInitialData() {
+        // El historial y los contadores llegan en el snapshot de subscribe_device;
+        // si no llega a tiempo se cargan por REST
+        setTimeout(() => {
+            if (!this.snapshotReceived) {
+                this.loadRestFallback();
+            }
+        }, 5000);
         await this.checkApiStatus();
-        await this.loadMovementsHistory();
-        await this.loadObstaclesHistory();
-        await this.loadStats();
         this.renderCurrentStatus(); // Renderizar estado inicial
     }
 
+    loadRestFallback() {
+        if (this.snapshotReceived || this.restFallbackLoaded) {
+            return;
+        }
+        this.restFallbackLoaded = true;
+        this.loadMovementsHistory();
+        this.loadObstaclesHistory();
+        this.loadStats();
+    }
+
+    applySnapshot(data) {
+        this.snapshotReceived = true;
+        const snapshot = (data.snapshots || []).find((item) => item.device_id === this.currentDevice);
+        if (data.status === 'error' || !snapshot || snapshot.cold) {
+            // Sin snapshot o dispositivo aún sin historial en memoria: cargar por REST
+            this.loadMovementsHistory();
+            this.loadObstaclesHistory();
+            this.loadStats();
+            return;
+        }
+
+        this.displayMovementsHistory(snapshot.commands.slice(0, 15));
+        this.displayObstaclesHistory(snapshot.obstacles.slice(0, 10));
+
+        const lastCommand = snapshot.commands[0];
+        const lastObstacle = snapshot.obstacles[0];
+        this.lastMovement = lastCommand ? {
+            operation: lastCommand.status_operacion,
+            text: this.getOperationText(lastCommand.status_operacion),
+            device: lastCommand.id_dispositivo,
+            timestamp: new Date(lastCommand.fecha_hora)
+        } : null;
+        this.lastObstacle = lastObstacle ? {
+            type: lastObstacle.status_obstaculo,
+            text: this.getObstacleText(lastObstacle.status_obstaculo),
+            device: lastObstacle.id_dispositivo,
+            timestamp: new Date(lastObstacle.fecha_hora)
+        } : null;
+
+        this.stats.totalMovements = snapshot.counters.total_commands;
+        this.stats.totalObstacles = snapshot.counters.total_obstacles;
+        this.stats.activeDevices = snapshot.counters.active_devices;
+
+        this.renderCurrentStatus();
+        this.updateStats();
+    }
+
     async checkApiStatus() {
         try {
             const response = await fetch(`${this.apiBaseUrl}/api/health`);
@@ -443,26 +530,28 @@ class CarMonitoringApp {
 
     async loadStats() {
         try {
-            const [movementsRes, obstaclesRes, devicesRes] = await Promise.all([
-                fetch(`${this.apiBaseUrl}/api/commands`),
-                fetch(`${this.apiBaseUrl}/api/obstacles`),
-                fetch(`${this.apiBaseUrl}/api/devices`)
-            ]);
-
-            const movements = await movementsRes.json();
-            const obstacles = await obstaclesRes.json();
-            const devices = await devicesRes.json();
-
-            this.stats.totalMovements = movements.data?.length || 0;
-            this.stats.totalObstacles = obstacles.data?.length || 0;
-            this.stats.activeDevices = devices.data?.length || 0;
-            
-            this.updateStats();
+            // Contadores mantenidos por el servidor: no se descargan listas completas
+            const response = await fetch(`${this.apiBaseUrl}/api/stats?device_id=${this.currentDevice}`);
+            const stats = await response.json();
+
+            if (stats.status === 'success') {
+                this.applyStats(stats.data);
+            }
         } catch (error) {
             console.error('Error loading stats:', error);
         }
     }
 
+    applyStats(stats) {
+        if (stats.device_id !== this.currentDevice) return;
+
+        this.stats.totalMovements = stats.device.commands;
+        this.stats.totalObstacles = stats.device.obstacles;
+        this.stats.activeDevices = stats.global.devices;
+        
+        this.updateStats();
+    }
+
     displayMovementsHistory(movements) {
         const container = document.getElementById('movementsHistory');
         
@@ -918,6 +918,13 @@ class CarControlApp {
                 }
             });
 
+            // Frames agrupados por el servidor: reenviar cada evento a su manejador
+            this.socket.on('batch_update', (batch) => {
+                (batch.events || []).forEach(({ event, data }) => {
+                    this.socket.listeners(event).forEach((handler) => handler(data));
+                });
+            });
+
             this.socket.on('sequence_update', (data) => {
                 if (data.type === 'sequence_created' || data.type === 'sequence_updated' || data.type === 'sequence_deleted') {
                     this.loadSequences();